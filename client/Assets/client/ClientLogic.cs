@@ -5,6 +5,8 @@ using System.Collections;
 using System.Collections.Generic;
 using TMPro;
 using System;
+using System.IO;
+using Unity.Collections;
 
 
 public class ClientLogic : MonoBehaviour
@@ -32,6 +34,13 @@ public class ClientLogic : MonoBehaviour
     private float sendInterval = 0.5f;
 
     private Vector3[] UIScreenCorners = new Vector3[4];
+
+    // Wire format negotiated with the server, see server/protocol.py
+    private const string BinaryProtocol = "binary-v1";
+    private static readonly byte[] BinaryMagic = { (byte)'N', (byte)'T', (byte)'T', (byte)'F' };
+    private const byte BinaryVersion = 1;
+    private bool useBinaryProtocol = false;
+    private uint frameId = 0;
     [SerializeField] private bool flipColors = false;
 
     public Dictionary<string, GameObject> anchors = new Dictionary<string, GameObject>();
@@ -50,9 +59,10 @@ public class ClientLogic : MonoBehaviour
 
     void Start()
     {
+        connection.OnConnected += SendHello;
+        connection.OnServerMessage += HandleServerMessage;
         StartWebSocket();
         SpawnUI();
-        connection.OnServerMessage += HandleServerMessage;
         // redDot = Instantiate(redDot, new Vector3(0, 0, 0), Quaternion.identity);
     }
 
@@ -85,7 +95,7 @@ public class ClientLogic : MonoBehaviour
 
             if (depthTexture != null)
             {
-                depthImageBytes = depthTexture.EncodeToJPG();
+                depthImageBytes = EncodeDepthTexture(depthTexture);
             }
 
             SendDataAsync();
@@ -171,8 +181,26 @@ public class ClientLogic : MonoBehaviour
         dangerSource.text = dangerData.danger_source;
     }
 
+    private async void SendHello()
+    {
+        HelloMessage hello = new HelloMessage
+        {
+            type = "hello",
+            protocols = new string[] { BinaryProtocol, "json" },
+        };
+        await connection.SendTextAsync(JsonUtility.ToJson(hello));
+    }
+
     private void HandleServerMessage(string message)
     {
+        HelloAckMessage helloAck = JsonUtility.FromJson<HelloAckMessage>(message);
+        if (helloAck != null && helloAck.type == "hello_ack")
+        {
+            useBinaryProtocol = helloAck.protocol == BinaryProtocol;
+            Debug.Log("Negotiated protocol: " + helloAck.protocol);
+            return;
+        }
+
         FrameDataMessage frameData = JsonUtility.FromJson<FrameDataMessage>(message);
         if (frameData == null || frameData.type != "frame_data")
         {
@@ -316,15 +344,18 @@ public class ClientLogic : MonoBehaviour
 
     private async void SendDataAsync()
     {
-        if (colorImageBytes != null && colorImage.texture is Texture2D colorTex)
-        {
-            await SendImageDataAsync("color", colorImageBytes, colorTex.width, colorTex.height);
-        }
+        frameId++;
 
+        // Depth goes first so the server already has it when the color frame with the same id arrives
         if (depthImageBytes != null && depthImage.texture is Texture2D depthTex)
         {
             await SendImageDataAsync("depth", depthImageBytes, depthTex.width, depthTex.height);
         }
+
+        if (colorImageBytes != null && colorImage.texture is Texture2D colorTex)
+        {
+            await SendImageDataAsync("color", colorImageBytes, colorTex.width, colorTex.height);
+        }
     }
 
     private async Task SendImageDataAsync(string imageType, byte[] imageBytes, int imageWidth, int imageHeight)
@@ -332,6 +363,13 @@ public class ClientLogic : MonoBehaviour
         Vector3 pos = playerCamera.transform.position;
 
         Matrix4x4 invMat = (playerCamera.projectionMatrix * playerCamera.worldToCameraMatrix).inverse;
+
+        if (useBinaryProtocol)
+        {
+            await connection.SendWebSocketMessageAsync(EncodeBinaryMessage(imageType, imageBytes, pos, invMat));
+            return;
+        }
+
         ImageDataMessage dataObject = new ImageDataMessage
         {
             type = imageType,
@@ -340,12 +378,79 @@ public class ClientLogic : MonoBehaviour
             imageData = System.Convert.ToBase64String(imageBytes),
             UIScreenCorners = UIScreenCorners,
             flipColors = flipColors,
+            frameId = frameId,
+            timestamp = DateTimeOffset.UtcNow.ToUnixTimeMilliseconds() / 1000.0,
         };
 
         string jsonString = JsonUtility.ToJson(dataObject);
         await connection.SendTextAsync(jsonString);
     }
 
+    // Device depth is sent as a lossless 16-bit PNG in millimetres (DEVICE_DEPTH_SCALE on the server)
+    private byte[] EncodeDepthTexture(Texture2D depthTexture)
+    {
+        if (depthTexture.format == TextureFormat.R16)
+        {
+            return depthTexture.EncodeToPNG();
+        }
+
+        if (depthTexture.format != TextureFormat.RFloat)
+        {
+            return null;
+        }
+
+        NativeArray<float> meters = depthTexture.GetPixelData<float>(0);
+        ushort[] millimeters = new ushort[meters.Length];
+        for (int i = 0; i < meters.Length; i++)
+        {
+            float value = meters[i];
+            millimeters[i] = float.IsNaN(value) ? (ushort)0 : (ushort)Mathf.Clamp(value * 1000f, 0f, 65535f);
+        }
+
+        Texture2D encodedTexture = new Texture2D(depthTexture.width, depthTexture.height, TextureFormat.R16, false);
+        encodedTexture.SetPixelData(millimeters, 0);
+        encodedTexture.Apply(false);
+        byte[] pngBytes = encodedTexture.EncodeToPNG();
+        Destroy(encodedTexture);
+        return pngBytes;
+    }
+
+    // Layout must match HEADER_FORMAT in server/protocol.py (little-endian, 128 byte header)
+    private byte[] EncodeBinaryMessage(string imageType, byte[] imageBytes, Vector3 pos, Matrix4x4 invMat)
+    {
+        using (MemoryStream stream = new MemoryStream(128 + imageBytes.Length))
+        using (BinaryWriter writer = new BinaryWriter(stream))
+        {
+            writer.Write(BinaryMagic);
+            writer.Write(BinaryVersion);
+            writer.Write((byte)(imageType == "depth" ? 1 : 0));
+            writer.Write((ushort)(flipColors ? 1 : 0));
+            writer.Write(frameId);
+            writer.Write(DateTimeOffset.UtcNow.ToUnixTimeMilliseconds() / 1000.0);
+
+            writer.Write(pos.x);
+            writer.Write(pos.y);
+            writer.Write(pos.z);
+
+            for (int row = 0; row < 4; row++)
+            {
+                for (int col = 0; col < 4; col++)
+                {
+                    writer.Write(invMat[row, col]);
+                }
+            }
+
+            for (int i = 0; i < UIScreenCorners.Length; i++)
+            {
+                writer.Write(UIScreenCorners[i].x);
+                writer.Write(UIScreenCorners[i].y);
+            }
+
+            writer.Write(imageBytes);
+            return stream.ToArray();
+        }
+    }
+
     private void SpawnUI()
     {
         if (playerCamera != null)
@@ -441,6 +546,20 @@ public class ClientLogic : MonoBehaviour
         public List<ObjectData> objects;
     }
 
+    [System.Serializable]
+    public class HelloMessage
+    {
+        public string type;
+        public string[] protocols;
+    }
+
+    [System.Serializable]
+    public class HelloAckMessage
+    {
+        public string type;
+        public string protocol;
+    }
+
     [System.Serializable]
     public class DangerDataMessage
     {
@@ -489,5 +608,7 @@ public class ClientLogic : MonoBehaviour
         public float cy;
         public Vector3[] UIScreenCorners;
         public bool flipColors;
+        public uint frameId;
+        public double timestamp;
     }
 }
@@ -15,6 +15,9 @@ public class Connection : MonoBehaviour
     // Event to notify when a message is received from the server
     public event Action<string> OnServerMessage;
 
+    // Event to notify when the WebSocket connection is open
+    public event Action OnConnected;
+
     // StartConnection function to initialize and start the WebSocket connection
     public async void StartConnection()
     {
@@ -23,6 +26,7 @@ public class Connection : MonoBehaviour
         websocket.OnOpen += () =>
         {
             Debug.Log("Connection open!");
+            OnConnected?.Invoke();
         };
 
         websocket.OnError += (e) =>
@@ -0,0 +1,52 @@
+"""
+Time per DINOv2 attention layer for each backend, at the token counts of the depth
+model's inputs. Without xFormers, "math" is what the model used to run.
+
+Run from the server folder:
+    python -m benchmarks.attention_bench [--encoder vits]
+"""
+import argparse
+import time
+
+import torch
+
+from metric_depth.depth_anything_v2.dinov2_layers import attention
+from metric_depth.depth_anything_v2.dinov2_layers.attention import MemEffAttention
+
+ENCODER_DIMS = {'vits': (384, 6), 'vitb': (768, 12), 'vitl': (1024, 16)}
+# Network inputs: square, 16:9 at 518, and 16:9 at twice that
+INPUTS = ((518, 518), (518, 924), (1036, 1848))
+
+
+@torch.no_grad()
+def time_layer(layer, x, repeats):
+    layer(x)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        layer(x)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--encoder', default='vits', choices=list(ENCODER_DIMS))
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    dim, heads = ENCODER_DIMS[args.encoder]
+    layer = MemEffAttention(dim, heads, qkv_bias=True).to(device).eval()
+
+    print(f"{args.encoder} attention on {device}, {torch.get_num_threads()} threads, ms per layer")
+    print(f"{'input':>10} {'tokens':>7} " + " ".join(f"{b:>9}" for b in ("math", "sdpa", "chunked")) + "  math N x N MB")
+    for height, width in INPUTS:
+        tokens = (height // 14) * (width // 14) + 1
+        x = torch.randn(1, tokens, dim, device=device)
+        times = []
+        for backend in ("math", "sdpa", "chunked"):
+            attention.set_attention_backend(backend)
+            times.append(time_layer(layer, x, args.repeats))
+        # The attention matrix only the math backend materializes, chunked holds chunk x N of it
+        matrix_mb = heads * tokens * tokens * x.element_size() / 1e6
+        print(f"{height:>4}x{width:<5} {tokens:>7} " + " ".join(f"{t:9.1f}" for t in times) + f"  {matrix_mb:13.0f}")
+    attention.set_attention_backend("auto")
@@ -0,0 +1,42 @@
+"""
+Runs the startup CPU self-benchmark for vits and vitb and reports every candidate
+configuration and the one the server would pick. Uses randomly initialized weights,
+which cost the same as the trained checkpoints.
+
+Run from the server folder:
+    python -m benchmarks.cpu_depth_bench [--frame-height 540] [--frame-width 960] [--compile]
+"""
+import argparse
+
+import torch
+
+from depth_runtime import autotune_cpu_model, cpu_supports_bf16
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2, input_shape
+from benchmarks.depth_batching_bench import MODEL_CONFIGS
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frame-height', type=int, default=540)
+    parser.add_argument('--frame-width', type=int, default=960)
+    parser.add_argument('--input-size', type=int, default=518)
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--compile', action='store_true')
+    args = parser.parse_args()
+
+    shape = input_shape(args.frame_height, args.frame_width, args.input_size)
+    print(f"network input {shape}, {args.threads} threads, bf16 supported: {cpu_supports_bf16()}")
+    for encoder in ('vits', 'vitb'):
+        model = DepthAnythingV2(**MODEL_CONFIGS[encoder], max_depth=20).eval()
+        _, candidates = autotune_cpu_model(
+            model, shape, args.threads,
+            allow_compile=args.compile, repeats=args.repeats,
+        )
+        for c in candidates:
+            marker = "*" if c["chosen"] else " "
+            print(
+                f"{marker} {encoder} threads {c['threads']:>2} channels_last {c['channels_last']!s:<5} "
+                f"bf16 {c['bf16']!s:<5} compiled {c['compiled']!s:<5} {c['latency_ms']:8.1f} ms/frame  "
+                f"rel. error {c['relative_error']:.4f}"
+            )
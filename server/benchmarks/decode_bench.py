@@ -0,0 +1,69 @@
+"""
+Decode cost per 1920x1080 color frame: the original PIL path, a full cv2.imdecode, and
+the reduced-scale decode, each alone and followed by the cubic resize the depth model
+does to its 518 input. Allocated bytes are the tracemalloc peak of one frame.
+
+Run from the server folder:
+    python -m benchmarks.decode_bench
+"""
+import io
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import protocol
+from benchmarks.protocol_bench import make_frame_jpeg
+
+DEPTH_INPUT_SIZE = 518
+REPEATS = 30
+
+
+def decode_pil(frame):
+    image = Image.open(io.BytesIO(frame.payload()))
+    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+
+def decode_full(frame):
+    return protocol.decode_image(frame)
+
+
+def decode_reduced(frame):
+    return protocol.decode_image(frame, DEPTH_INPUT_SIZE)
+
+
+def to_depth_input(image):
+    # Same lower-bound, multiple-of-14 size DepthAnythingV2.image2tensor resizes to
+    h, w = image.shape[:2]
+    scale = DEPTH_INPUT_SIZE / min(h, w)
+    size = (int(np.ceil(w * scale / 14) * 14), int(np.ceil(h * scale / 14) * 14))
+    return cv2.resize(image, size, interpolation=cv2.INTER_CUBIC)
+
+
+def measure(fn, frame):
+    fn(frame)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(frame)
+    elapsed_ms = (time.perf_counter() - start) / REPEATS * 1000
+
+    tracemalloc.start()
+    fn(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_ms, peak
+
+
+if __name__ == "__main__":
+    frame = protocol.FrameMessage("color", 0, None, None, None, None, False, make_frame_jpeg())
+
+    for name, decode in (("PIL", decode_pil), ("cv2 full", decode_full), ("cv2 reduced", decode_reduced)):
+        shape = decode(frame).shape
+        decode_ms, decode_bytes = measure(decode, frame)
+        total_ms, total_bytes = measure(lambda f: to_depth_input(decode(f)), frame)
+        print(
+            f"{name:<12} {shape[1]}x{shape[0]:<5} decode {decode_ms:6.1f} ms {decode_bytes / 1e6:5.1f} MB"
+            f"  |  + depth resize {total_ms:6.1f} ms {total_bytes / 1e6:5.1f} MB"
+        )
@@ -0,0 +1,54 @@
+"""
+Depth frames/s with cross-connection micro-batching versus one forward per frame.
+Uses randomly initialized weights, which cost the same as the trained checkpoint.
+
+Run from the server folder:
+    python -m benchmarks.depth_batching_bench [--encoder vits] [--clients 4] [--input-size 518]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+from depth_batching import DepthBatcher
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+
+MODEL_CONFIGS = {
+    'vits': {'encoder': 'vits', 'features': 64, 'out_channels': [48, 96, 192, 384]},
+    'vitb': {'encoder': 'vitb', 'features': 128, 'out_channels': [96, 192, 384, 768]},
+}
+
+
+def frames_per_second(service, frames, clients, input_size):
+    def client(frame):
+        return service.infer_image(frame, input_size)
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, frames[:clients]))  # warm up
+        start = time.perf_counter()
+        list(pool.map(client, frames))
+        return len(frames) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--encoder', default='vits', choices=list(MODEL_CONFIGS))
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--frames', type=int, default=16)
+    parser.add_argument('--input-size', type=int, default=518)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    model = DepthAnythingV2(**MODEL_CONFIGS[args.encoder], max_depth=20).to(device).eval()
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(args.frames)]
+
+    print(f"{args.encoder} on {device}, {args.clients} clients, input size {args.input_size}")
+    for max_batch in (1, 2, 4, 8):
+        service = DepthBatcher(model, max_batch=max_batch, max_wait_ms=args.max_wait_ms)
+        fps = frames_per_second(service, frames, args.clients, args.input_size)
+        print(f"max_batch {max_batch}: {fps:6.2f} frames/s, mean batch {service.stats()['mean_batch_size']:.2f}")
+        service.close()
@@ -0,0 +1,58 @@
+"""
+Cost per frame, after the depth model's forward, of upsampling the prediction to the
+frame and taking box means there, versus keeping it at the network resolution in a
+DepthMap and taking the box means on it.
+
+Run from the server folder:
+    python -m benchmarks.depth_map_bench
+"""
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from depth_map import DepthMap
+from depth_statistics import box_depths
+from metric_depth.depth_anything_v2.dpt import input_shape
+
+REPEATS = 20
+
+
+def make_boxes(count, height, width, seed=0):
+    rng = np.random.default_rng(seed)
+    xy = rng.integers(0, [width // 2, height // 2], (count, 2))
+    return np.concatenate([xy, xy + rng.integers(20, min(height, width) // 2, (count, 2))], axis=1)
+
+
+def upsampled(depth, frame_shape, boxes):
+    frame_depth = F.interpolate(depth[:, None], frame_shape, mode="bilinear", align_corners=True)[0, 0].cpu().numpy()
+    return box_depths(frame_depth, boxes)
+
+
+def network_resolution(depth, frame_shape, boxes):
+    return box_depths(DepthMap(depth[0].cpu().numpy(), frame_shape), boxes)
+
+
+def time_per_frame(fn, *args):
+    fn(*args)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(*args)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+if __name__ == "__main__":
+    print(f"{'frame':>10} {'network':>9} {'boxes':>5}  {'upsampled':>10} {'DepthMap':>9}  {'mean error':>10}")
+    for frame_shape in ((540, 960), (1080, 1920), (1440, 2560)):
+        height, width = input_shape(*frame_shape, 518)
+        depth = torch.rand(1, height, width) * 10 + 1
+        for count in (1, 10, 50):
+            boxes = make_boxes(count, *frame_shape)
+            reference = upsampled(depth, frame_shape, boxes)
+            error = np.abs(network_resolution(depth, frame_shape, boxes) - reference).mean() / reference.mean()
+            print(
+                f"{frame_shape[0]:>4}x{frame_shape[1]:<5} {height:>4}x{width:<4} {count:>5}"
+                f"  {time_per_frame(upsampled, depth, frame_shape, boxes):7.2f} ms"
+                f" {time_per_frame(network_resolution, depth, frame_shape, boxes):6.2f} ms  {error:10.4f}"
+            )
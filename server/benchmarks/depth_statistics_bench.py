@@ -0,0 +1,64 @@
+"""
+Cost per frame of the depth of every detection box: np.nanmean / np.nanmedian over
+each box slice, building a DepthStatistics index once and querying all boxes, and
+box_depths, which picks one of the two from the total box area.
+Boxes are large and overlapping, like a crowded scene close to the camera.
+
+Run from the server folder:
+    python -m benchmarks.depth_statistics_bench
+"""
+import time
+
+import numpy as np
+
+from depth_statistics import DepthStatistics, box_depths
+
+HEIGHT, WIDTH = 1080, 1920
+REPEATS = 10
+
+
+def make_frame(count, seed=0):
+    rng = np.random.default_rng(seed)
+    depth = rng.uniform(0.5, 20.0, (HEIGHT, WIDTH)).astype(np.float32)
+    xy = rng.integers(0, [WIDTH - 600, HEIGHT - 600], (count, 2))
+    boxes = np.concatenate([xy, xy + rng.integers(50, 600, (count, 2))], axis=1)
+    return depth, boxes
+
+
+def time_per_frame(fn, *args):
+    fn(*args)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(*args)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def slice_means(depth, boxes):
+    return [np.nanmean(depth[y1:y2, x1:x2]) for x1, y1, x2, y2 in boxes.tolist()]
+
+
+def slice_medians(depth, boxes):
+    return [np.nanmedian(depth[y1:y2, x1:x2]) for x1, y1, x2, y2 in boxes.tolist()]
+
+
+def index_means(depth, boxes):
+    return DepthStatistics(depth).means(boxes)
+
+
+def index_medians(depth, boxes, bins=64):
+    return DepthStatistics(depth, histogram_bins=bins).medians(boxes)
+
+
+if __name__ == "__main__":
+    depth, _ = make_frame(1)
+    print(f"build at {HEIGHT}x{WIDTH}: summed-area tables {time_per_frame(DepthStatistics, depth):.2f} ms, "
+          f"with 64 bin histogram {time_per_frame(DepthStatistics, depth, 64):.2f} ms")
+    print(f"{'boxes':>5}  {'nanmean':>10} {'index mean':>11} {'box_depths':>11}   {'nanmedian':>10} {'index median':>13} {'box_depths':>11}")
+    for count in (1, 10, 50, 100, 200):
+        depth, boxes = make_frame(count)
+        print(
+            f"{count:>5}  {time_per_frame(slice_means, depth, boxes):7.2f} ms {time_per_frame(index_means, depth, boxes):8.2f} ms"
+            f" {time_per_frame(box_depths, depth, boxes):8.2f} ms"
+            f"   {time_per_frame(slice_medians, depth, boxes):7.2f} ms {time_per_frame(index_medians, depth, boxes):10.2f} ms"
+            f" {time_per_frame(box_depths, depth, boxes, 'median'):8.2f} ms"
+        )
@@ -0,0 +1,67 @@
+"""
+Post-processing cost per frame of reading the YOLO boxes through
+Results.to_json + json.loads versus the Detections arrays. YOLO drops the other classes
+itself (its classes argument), so the boxes are all of the interesting classes.
+
+Run from the server folder:
+    python -m benchmarks.detections_bench
+"""
+import json
+import time
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from detections import Detections
+
+NAMES = {0: "person", 1: "bicycle", 2: "car", 56: "chair"}
+CLASSES = "person, chair"
+CLASS_IDS = [0, 56]
+REPEATS = 500
+
+
+def make_results(count, tracked=True):
+    rng = np.random.default_rng(count)
+    xy = rng.uniform(0, 1500, (count, 2))
+    wh = rng.uniform(20, 400, (count, 2))
+    columns = [torch.tensor(xy), torch.tensor(xy + wh)]
+    if tracked:
+        columns.append(torch.arange(count, dtype=torch.float64)[:, None])
+    columns.append(torch.tensor(rng.uniform(0.25, 1.0, (count, 1))))
+    columns.append(torch.tensor(rng.choice(CLASS_IDS, (count, 1)), dtype=torch.float64))
+    boxes = torch.cat(columns, dim=1).float()
+    orig_img = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    return [Results(orig_img, path="bench.jpg", names=NAMES, boxes=boxes)]
+
+
+def via_json(results):
+    located = []
+    for detection in results:
+        for det in json.loads(detection.to_json()):
+            if det["name"] in CLASSES:
+                box_values = [int(v) for v in det['box'].values()]
+                located.append((box_values, det.get('track_id', "-1")))
+    return located
+
+
+def via_detections(results):
+    detections = Detections.from_results(results)
+    return list(zip(detections.xyxy.tolist(), detections.track_ids.tolist()))
+
+
+def time_per_frame(fn, results):
+    fn(results)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(results)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+if __name__ == "__main__":
+    for count in (1, 20, 100):
+        results = make_results(count)
+        assert [box for box, _ in via_json(results)] == [box for box, _ in via_detections(results)]
+        json_ms = time_per_frame(via_json, results)
+        detections_ms = time_per_frame(via_detections, results)
+        print(f"{count:>3} detections  to_json {json_ms:7.3f} ms  Detections {detections_ms:7.3f} ms  ({json_ms / detections_ms:.0f}x)")
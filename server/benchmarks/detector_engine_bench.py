@@ -0,0 +1,57 @@
+"""
+YOLO latency per frame for each engine at the server's imgsz, on the letterboxed
+detector input FramePyramid produces for a 960x540 frame.
+
+Run from the server folder:
+    python -m benchmarks.detector_engine_bench [--weights yolov8n.pt] [--imgsz 640]
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from detector_engine import load_detector
+from preprocessing import FramePyramid
+
+
+def latency_ms(model, image, repeats):
+    model.predict(image, verbose=False)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(image, verbose=False)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', default='yolov8n.pt')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--engines', default='torch,onnx,openvino')
+    parser.add_argument('--export-shape', default='384x640')
+    args = parser.parse_args()
+
+    frame = np.random.default_rng(0).integers(0, 255, (540, 960, 3), dtype=np.uint8)
+    image, _ = FramePyramid(frame, imgsz=args.imgsz).detector_input()
+    export_shape = tuple(int(v) for v in args.export_shape.split('x'))
+
+    rows = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for engine in args.engines.split(','):
+            start = time.perf_counter()
+            model, used = load_detector(args.weights, engine, args.imgsz, cache_dir, export_shape)
+            if used != engine:
+                rows.append((engine, None, None))
+                continue
+            export_s = time.perf_counter() - start
+            rows.append((engine, export_s, latency_ms(model, image, args.repeats)))
+
+    print(f"{args.weights}, imgsz {args.imgsz}, input {image.shape[1]}x{image.shape[0]}, export shape {args.export_shape}, {torch.get_num_threads()} threads")
+    print(f"{'engine':<10} {'export+load s':>13} {'ms/frame':>9}")
+    for engine, export_s, ms in rows:
+        if ms is None:
+            print(f"{engine:<10} {'unavailable':>13}")
+        else:
+            print(f"{engine:<10} {export_s:13.1f} {ms:9.1f}")
@@ -0,0 +1,62 @@
+"""
+Critical-path latency of one frame with the GUI color, detection and depth stages run
+sequentially versus in parallel through FrameGraph.
+
+The stand-in stages do a little CPU work and then wait the way the real stages wait on
+the GPU (a sleep, which like a CUDA sync releases the GIL), with durations in the range
+measured for YOLOv8n and DepthAnythingV2-vitb. On a CPU-only box with few cores the
+gain is bounded by the cores the models already use.
+
+Run from the server folder:
+    python -m benchmarks.frame_graph_bench
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from frame_graph import FrameGraph, StageStats
+
+FRAMES = 20
+DETECTION_GPU_MS = 12
+DEPTH_GPU_MS = 35
+
+
+def make_graph(frame):
+    def gui_colors():
+        roi = cv2.flip(frame, -1)[270:810, 480:1440]
+        return cv2.cvtColor(roi, cv2.COLOR_BGR2LAB).mean(axis=(0, 1))
+
+    def detections():
+        cv2.resize(frame, (640, 384))
+        time.sleep(DETECTION_GPU_MS / 1000)
+        return np.array([[100, 100, 300, 400]])
+
+    def depth():
+        cv2.resize(frame, (924, 518), interpolation=cv2.INTER_CUBIC)
+        time.sleep(DEPTH_GPU_MS / 1000)
+        return np.ones(frame.shape[:2], dtype=np.float32)
+
+    return (
+        FrameGraph()
+        .stage("gui_colors", gui_colors)
+        .stage("detections", detections)
+        .stage("depth", depth)
+        .stage("objects", lambda det, dep: [dep[y1:y2, x1:x2].mean() for x1, y1, x2, y2 in det], deps=("detections", "depth"))
+    )
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        for mode, pool in (("sequential", None), ("parallel", executor)):
+            stats = StageStats()
+            for _ in range(FRAMES):
+                _, timings = make_graph(frame).run(pool)
+                stats.record(timings)
+            means = stats.stats()["mean_ms"]
+            stages = "  ".join(f"{name} {means[name]:.1f}" for name in ("gui_colors", "detections", "depth", "objects"))
+            print(f"{mode:<11} total {means['total']:6.1f} ms  |  {stages}")
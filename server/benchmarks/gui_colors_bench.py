@@ -0,0 +1,56 @@
+"""
+Cost per frame of the GUI panel colors: the full resolution computation, which rotates
+the whole frame and converts the exterior region of every panel to LAB, versus
+calculate_panel_colors, which maps the panels into a small LAB integral image built
+once per frame.
+
+Run from the server folder:
+    python -m benchmarks.gui_colors_bench
+"""
+import time
+
+import cv2
+import numpy as np
+
+from image_processing import calculate_panel_colors
+
+REPEATS = 50
+PANELS = [
+    [[0.3, 0.25], [0.7, 0.25], [0.7, 0.75], [0.3, 0.75]],
+    [[0.05, 0.6], [0.2, 0.6], [0.2, 0.9], [0.05, 0.9]],
+    [[0.8, 0.1], [0.95, 0.1], [0.95, 0.3], [0.8, 0.3]],
+    [[0.4, 0.8], [0.6, 0.8], [0.6, 0.95], [0.4, 0.95]],
+]
+
+
+def full_resolution_colors(frame, panels):
+    image = cv2.flip(frame, -1)
+    height, width = image.shape[:2]
+    offset_x, offset_y = int(0.05 * width), int(0.05 * height)
+    colors = []
+    for corners in panels:
+        xs = [int(c[0] * width) for c in corners]
+        ys = [int(c[1] * height) for c in corners]
+        min_x, max_x, min_y, max_y = max(0, min(xs)), min(width, max(xs)), max(0, min(ys)), min(height, max(ys))
+        exterior = image[max(0, min_y - offset_y):min(height, max_y + offset_y), max(0, min_x - offset_x):min(width, max_x + offset_x)]
+        colors.append(cv2.mean(cv2.cvtColor(exterior, cv2.COLOR_BGR2LAB))[:3])
+    return colors
+
+
+def timed(function, *args):
+    function(*args)  # warm up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        function(*args)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    print(f"{'frame':>10} {'panels':>6} {'full res ms':>12} {'integral ms':>12}")
+    for height, width in ((540, 960), (1080, 1920)):
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for count in (1, len(PANELS)):
+            panels = PANELS[:count]
+            print(f"{width:>4}x{height:<5} {count:6d} {timed(full_resolution_colors, frame, panels):12.2f} "
+                  f"{timed(calculate_panel_colors, frame, panels, False):12.2f}")
@@ -0,0 +1,82 @@
+"""
+Accuracy, latency and size of the INT8 dynamically quantized depth encoder against the
+float model on the CPU. Accuracy is eval_depth of the INT8 prediction with the float
+prediction as the target, over a sample set of images.
+
+Pass the trained checkpoint for meaningful accuracy numbers, random weights only show
+the speed and size:
+    python -m benchmarks.int8_depth_bench --encoder vits \\
+        --checkpoint depth_anything_v2_metric_hypersim_vits.pth --images path/to/samples
+"""
+import argparse
+import copy
+import glob
+import io
+import os
+import time
+
+import cv2
+import torch
+
+from benchmarks.depth_batching_bench import MODEL_CONFIGS
+from depth_runtime import quantize_encoder
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+from metric_depth.util.metric import eval_depth
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(__file__), '..', 'metric_depth', 'test.jpg')
+
+
+def load_samples(images_dir):
+    paths = sorted(glob.glob(os.path.join(images_dir, '*.jpg')) + glob.glob(os.path.join(images_dir, '*.png'))) if images_dir else [SAMPLE_IMAGE]
+    samples = [cv2.imread(path) for path in paths]
+    if not images_dir:
+        # One image is a thin sample, add flipped and cropped views of it
+        image = samples[0]
+        h, w = image.shape[:2]
+        samples += [cv2.flip(image, 1), image[h // 4:, :w * 3 // 4], image[:h * 3 // 4, w // 4:]]
+    return samples
+
+
+def serialized_mb(module):
+    buffer = io.BytesIO()
+    torch.save(module.state_dict(), buffer)
+    return len(buffer.getvalue()) / 1e6
+
+
+def timed_predictions(model, samples, input_size):
+    model.infer_image(samples[0], input_size)  # warm up
+    predictions = []
+    start = time.perf_counter()
+    for image in samples:
+        predictions.append(torch.from_numpy(model.infer_image(image, input_size)))
+    return predictions, (time.perf_counter() - start) / len(samples) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--encoder', default='vits', choices=list(MODEL_CONFIGS))
+    parser.add_argument('--checkpoint')
+    parser.add_argument('--images', help="Folder of .jpg/.png samples, metric_depth/test.jpg by default")
+    parser.add_argument('--input-size', type=int, default=518)
+    args = parser.parse_args()
+
+    model = DepthAnythingV2(**MODEL_CONFIGS[args.encoder], max_depth=20)
+    if args.checkpoint:
+        model.load_state_dict(torch.load(args.checkpoint, map_location='cpu'))
+    model = model.eval()
+    int8_model = quantize_encoder(copy.deepcopy(model))
+
+    samples = load_samples(args.images)
+    targets, float_ms = timed_predictions(model, samples, args.input_size)
+    predictions, int8_ms = timed_predictions(int8_model, samples, args.input_size)
+
+    metrics = {}
+    for pred, target in zip(predictions, targets):
+        valid = (pred > 0) & (target > 0)
+        for name, value in eval_depth(pred[valid], target[valid]).items():
+            metrics[name] = metrics.get(name, 0.0) + value / len(samples)
+
+    print(f"{args.encoder}, {len(samples)} samples, input size {args.input_size}, {torch.get_num_threads()} threads")
+    print(f"float32  {float_ms:8.1f} ms/frame  encoder {serialized_mb(model.pretrained):6.1f} MB")
+    print(f"int8     {int8_ms:8.1f} ms/frame  encoder {serialized_mb(int8_model.pretrained):6.1f} MB")
+    print(f"int8 vs float32: abs_rel {metrics['abs_rel']:.4f}  d1 {metrics['d1']:.4f}")
@@ -0,0 +1,53 @@
+"""
+Event loop lag with several simulated clients, running the per-frame work inline in
+the coroutine (as before) versus on the inference executor.
+
+Run from the server folder:
+    python -m benchmarks.loop_lag_bench
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from executor import run_blocking
+from loop_monitor import LoopLagMonitor
+
+CLIENTS = 4
+FRAMES_PER_CLIENT = 10
+
+
+def fake_inference(matrix):
+    # Stand-in for model.track + infer_image: a GIL-releasing numpy workload
+    for _ in range(4):
+        matrix = np.tanh(matrix @ matrix)
+    return matrix
+
+
+async def client(offload, matrix):
+    for _ in range(FRAMES_PER_CLIENT):
+        if offload:
+            await run_blocking(fake_inference, matrix)
+        else:
+            fake_inference(matrix)
+        await asyncio.sleep(0)
+
+
+async def run(offload):
+    monitor = LoopLagMonitor(interval=0.005)
+    monitor_task = asyncio.create_task(monitor.run())
+    matrix = np.random.default_rng(0).random((600, 600), dtype=np.float32) / 600
+    start = time.perf_counter()
+    await asyncio.gather(*(client(offload, matrix) for _ in range(CLIENTS)))
+    elapsed = time.perf_counter() - start
+    monitor_task.cancel()
+    return elapsed, monitor.stats()
+
+
+if __name__ == "__main__":
+    print(f"{CLIENTS} clients x {FRAMES_PER_CLIENT} frames")
+    print(f"{'mode':<10}{'wall s':>10}{'lag mean ms':>14}{'lag p99 ms':>13}{'lag max ms':>13}")
+    for offload in (False, True):
+        elapsed, stats = asyncio.run(run(offload))
+        mode = "executor" if offload else "inline"
+        print(f"{mode:<10}{elapsed:>10.2f}{stats['mean_ms']:>14.2f}{stats['p99_ms']:>13.2f}{stats['max_ms']:>13.2f}")
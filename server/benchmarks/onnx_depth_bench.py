@@ -0,0 +1,50 @@
+"""
+Per-frame depth latency on the CPU: PyTorch eager against ONNX Runtime, on one shape
+bucket. Uses randomly initialized weights, which cost the same as the trained checkpoint.
+
+Run from the server folder:
+    python -m benchmarks.onnx_depth_bench [--encoder vits] [--bucket 518x924]
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.depth_batching_bench import MODEL_CONFIGS
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+from onnx_depth import OnnxDepthModel, parse_buckets
+
+
+def latency_ms(model, frame, input_size, repeats):
+    model.infer_image(frame, input_size)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        depth = model.infer_image(frame, input_size)
+    return (time.perf_counter() - start) / repeats * 1000, depth
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--encoder', default='vits', choices=list(MODEL_CONFIGS))
+    parser.add_argument('--bucket', default='518x924')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    bucket = parse_buckets(args.bucket)
+    height, width = bucket[0]
+    model = DepthAnythingV2(**MODEL_CONFIGS[args.encoder], max_depth=20).eval()
+    frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    input_size = min(height, width)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        onnx_model = OnnxDepthModel.load(lambda: model, cache_dir, bucket)
+        print(f"{args.encoder} {height}x{width}, {torch.get_num_threads()} threads, export + load {time.perf_counter() - start:.1f} s")
+
+        torch_ms, torch_depth = latency_ms(model, frame, input_size, args.repeats)
+        onnx_ms, onnx_depth = latency_ms(onnx_model, frame, input_size, args.repeats)
+
+    print(f"pytorch      {torch_ms:8.1f} ms/frame")
+    print(f"onnxruntime  {onnx_ms:8.1f} ms/frame  max abs diff {np.abs(onnx_depth - torch_depth).max():.2e} m")
@@ -0,0 +1,114 @@
+"""
+Accuracy and latency of the DPT head output strides against the full resolution head,
+on the Hypersim or KITTI validation loaders of metric_depth/dataset. Predictions are
+upsampled to the ground truth and scored with eval_depth, like the validation in
+metric_depth/train.py.
+
+Needs the validation data listed in the split files (or --filelist), h5py for Hypersim
+and the trained checkpoint:
+    python -m benchmarks.output_stride_bench --dataset hypersim --encoder vits \\
+        --checkpoint depth_anything_v2_metric_hypersim_vits.pth --limit 200
+Without --checkpoint and data, --latency-only times the model on a dummy input.
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+
+from benchmarks.depth_batching_bench import MODEL_CONFIGS
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+from metric_depth.util.metric import eval_depth
+
+METRIC_DEPTH = os.path.join(os.path.dirname(__file__), '..', 'metric_depth')
+# Same depth ranges as metric_depth/train.py
+DATASETS = {
+    'hypersim': {'min_depth': 0.001, 'max_depth': 20},
+    'kitti': {'min_depth': 0.001, 'max_depth': 80},
+}
+
+
+def val_loader(dataset, filelist, size):
+    # The dataset modules import their transforms as a top-level "dataset" package
+    sys.path.insert(0, METRIC_DEPTH)
+    if dataset == 'hypersim':
+        from dataset.hypersim import Hypersim
+        valset = Hypersim(filelist, 'val', size=size)
+    else:
+        from dataset.kitti import KITTI
+        valset = KITTI(filelist, 'val', size=size)
+    return DataLoader(valset, batch_size=1, num_workers=2)
+
+
+@torch.no_grad()
+def evaluate(model, loader, min_depth, max_depth, limit):
+    totals, samples, forward_ms = {}, 0, 0.0
+    for i, sample in enumerate(loader):
+        if limit and i >= limit:
+            break
+        image, depth, valid_mask = sample['image'].float(), sample['depth'][0], sample['valid_mask'][0]
+
+        start = time.perf_counter()
+        pred = model(image)
+        forward_ms += (time.perf_counter() - start) * 1000
+        pred = F.interpolate(pred[:, None], depth.shape[-2:], mode='bilinear', align_corners=True)[0, 0]
+
+        valid_mask = (valid_mask == 1) & (depth >= min_depth) & (depth <= max_depth)
+        if valid_mask.sum() < 10:
+            continue
+        for name, value in eval_depth(pred[valid_mask], depth[valid_mask]).items():
+            totals[name] = totals.get(name, 0.0) + value
+        samples += 1
+    return {name: value / max(samples, 1) for name, value in totals.items()}, forward_ms / max(i + 1, 1), samples
+
+
+@torch.no_grad()
+def latency_ms(fn, *args, repeats=3):
+    fn(*args)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(*args)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset', default='hypersim', choices=list(DATASETS))
+    parser.add_argument('--filelist', help="Validation split, metric_depth/dataset/splits/<dataset>/val.txt by default")
+    parser.add_argument('--encoder', default='vits', choices=list(MODEL_CONFIGS))
+    parser.add_argument('--checkpoint')
+    parser.add_argument('--strides', default="1,2,4")
+    parser.add_argument('--input-size', type=int, default=518)
+    parser.add_argument('--limit', type=int, default=0, help="Number of validation samples, 0 for all")
+    parser.add_argument('--latency-only', action='store_true')
+    args = parser.parse_args()
+
+    depth_range = DATASETS[args.dataset]
+    model = DepthAnythingV2(**MODEL_CONFIGS[args.encoder], max_depth=depth_range['max_depth']).eval()
+    if args.checkpoint:
+        model.load_state_dict(torch.load(args.checkpoint, map_location='cpu'))
+    strides = [int(s) for s in args.strides.split(',')]
+
+    if args.latency_only:
+        shape = (args.input_size, args.input_size * 16 // 9 // 14 * 14)
+        image = torch.randn(1, 3, *shape)
+        patch_h, patch_w = shape[0] // 14, shape[1] // 14
+        with torch.no_grad():
+            features = model.pretrained.get_intermediate_layers(image, model.intermediate_layer_idx[args.encoder], return_class_token=True)
+        print(f"{args.encoder}, input {shape}, {torch.get_num_threads()} threads")
+        for stride in strides:
+            model.depth_head.output_stride = stride
+            print(f"stride {stride}  model {latency_ms(model, image):8.1f} ms  head {latency_ms(model.depth_head, features, patch_h, patch_w):7.1f} ms")
+        sys.exit()
+
+    filelist = args.filelist or os.path.join(METRIC_DEPTH, 'dataset', 'splits', args.dataset, 'val.txt')
+    loader = val_loader(args.dataset, filelist, (args.input_size, args.input_size))
+    print(f"{args.encoder} on {args.dataset}, {torch.get_num_threads()} threads")
+    print(f"{'stride':>6} {'forward ms':>11} {'abs_rel':>8} {'rmse':>7} {'d1':>7}")
+    for stride in strides:
+        model.depth_head.output_stride = stride
+        metrics, forward_ms, samples = evaluate(model, loader, depth_range['min_depth'], depth_range['max_depth'], args.limit)
+        print(f"{stride:>6} {forward_ms:11.1f} {metrics['abs_rel']:8.4f} {metrics['rmse']:7.3f} {metrics['d1']:7.4f}  ({samples} samples)")
@@ -0,0 +1,62 @@
+"""
+Parse cost per frame for the legacy JSON + base64 format and the binary format.
+
+Run from the server folder:
+    python -m benchmarks.protocol_bench
+"""
+import base64
+import json
+import time
+
+import cv2
+import numpy as np
+
+import protocol
+
+
+def make_frame_jpeg(width=1920, height=1080, quality=90):
+    rng = np.random.default_rng(0)
+    # Smooth gradients plus noise compress to roughly the size of a real camera frame
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    image += rng.normal(0, 25, image.shape)
+    ok, jpeg = cv2.imencode(".jpg", np.clip(image, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return jpeg.tobytes()
+
+
+def make_messages(jpeg):
+    inv_mat = np.arange(16, dtype=np.float32).reshape(4, 4)
+    corners = [[0.25, 0.25], [0.25, 0.75], [0.75, 0.75], [0.75, 0.25]]
+    json_text = json.dumps({
+        "type": "color",
+        "data": {"x": 1.0, "y": 2.0, "z": 3.0, "id": "Null", "height": 0, "width": 0},
+        "invMat": {f"e{r}{c}": float(inv_mat[r, c]) for r in range(4) for c in range(4)},
+        "imageData": base64.b64encode(jpeg).decode("ascii"),
+        "UIScreenCorners": [{"x": x, "y": y, "z": 0.0} for x, y in corners],
+        "flipColors": False,
+    })
+    binary = protocol.encode_binary_message("color", 1, time.time(), [1.0, 2.0, 3.0], inv_mat, corners, False, jpeg)
+    return json_text, binary
+
+
+def time_per_call(fn, repeat=200):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    jpeg = make_frame_jpeg()
+    json_text, binary = make_messages(jpeg)
+    print(f"JPEG payload: {len(jpeg) / 1e6:.2f} MB, JSON message: {len(json_text) / 1e6:.2f} MB, binary message: {len(binary) / 1e6:.2f} MB")
+
+    json_parse = time_per_call(lambda: protocol.parse_message({"text": json_text}))
+    binary_parse = time_per_call(lambda: protocol.parse_message({"bytes": binary}))
+    json_total = time_per_call(lambda: protocol.decode_image(protocol.parse_message({"text": json_text})), repeat=20)
+    binary_total = time_per_call(lambda: protocol.decode_image(protocol.parse_message({"bytes": binary})), repeat=20)
+    print(f"{'format':<10}{'parse ms/frame':>16}{'parse + decode ms/frame':>26}")
+    print(f"{'json':<10}{json_parse * 1e3:>16.3f}{json_total * 1e3:>26.3f}")
+    print(f"{'binary':<10}{binary_parse * 1e3:>16.3f}{binary_total * 1e3:>26.3f}")
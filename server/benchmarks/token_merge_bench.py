@@ -0,0 +1,63 @@
+"""
+Speed/accuracy sweep of token merging in the depth encoder: encoder and full frame
+latency for every merge ratio, and eval_depth of the merged prediction with the
+unmerged prediction as the target, over a sample set of images.
+
+Pass the trained checkpoint for meaningful accuracy numbers, random weights only show
+the speed:
+    python -m benchmarks.token_merge_bench --encoder vits \\
+        --checkpoint depth_anything_v2_metric_hypersim_vits.pth --images path/to/samples
+"""
+import argparse
+import time
+
+import torch
+
+from benchmarks.depth_batching_bench import MODEL_CONFIGS
+from benchmarks.int8_depth_bench import load_samples, timed_predictions
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+from metric_depth.util.metric import eval_depth
+
+
+@torch.no_grad()
+def encoder_ms(model, image, repeats=3):
+    layers = model.intermediate_layer_idx[model.encoder]
+    model.pretrained.get_intermediate_layers(image, layers, return_class_token=True)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.pretrained.get_intermediate_layers(image, layers, return_class_token=True)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--encoder', default='vits', choices=list(MODEL_CONFIGS))
+    parser.add_argument('--checkpoint')
+    parser.add_argument('--images', help="Folder of .jpg/.png samples, metric_depth/test.jpg by default")
+    parser.add_argument('--input-size', type=int, default=518)
+    parser.add_argument('--ratios', default="0,0.1,0.2,0.3,0.4,0.5")
+    args = parser.parse_args()
+
+    model = DepthAnythingV2(**MODEL_CONFIGS[args.encoder], max_depth=20)
+    if args.checkpoint:
+        model.load_state_dict(torch.load(args.checkpoint, map_location='cpu'))
+    model = model.eval()
+
+    samples = load_samples(args.images)
+    image, _ = model.image2tensor(samples[0], args.input_size)
+    image = image.clone()
+
+    targets, _ = timed_predictions(model, samples, args.input_size)
+
+    print(f"{args.encoder}, {len(samples)} samples, input {tuple(image.shape[-2:])}, {torch.get_num_threads()} threads")
+    print(f"{'ratio':>5} {'encoder ms':>11} {'frame ms':>9} {'abs_rel':>8} {'d1':>7}")
+    for ratio in (float(r) for r in args.ratios.split(',')):
+        model.pretrained.set_token_merging(ratio)
+        predictions, frame_ms = timed_predictions(model, samples, args.input_size)
+
+        metrics = {}
+        for pred, target in zip(predictions, targets):
+            valid = (pred > 0) & (target > 0)
+            for name, value in eval_depth(pred[valid], target[valid]).items():
+                metrics[name] = metrics.get(name, 0.0) + value / len(samples)
+        print(f"{ratio:5.2f} {encoder_ms(model, image):11.1f} {frame_ms:9.1f} {metrics['abs_rel']:8.4f} {metrics['d1']:7.4f}")
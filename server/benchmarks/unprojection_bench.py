@@ -0,0 +1,67 @@
+"""
+Cost per frame of locating the detections in world space one at a time, with three
+get_world_position_from_screen_space calls each, versus all boxes at once with
+locate_boxes. Also times the whole process_image loop against process_boxes, which
+include the mean depth per box.
+
+Run from the server folder:
+    python -m benchmarks.unprojection_bench
+"""
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from image_processing import get_world_position_from_screen_space, locate_boxes, process_boxes, process_image
+
+HEIGHT, WIDTH = 1080, 1920
+REPEATS = 200
+
+
+def make_frame(count, seed=0):
+    rng = np.random.default_rng(seed)
+    xy = rng.integers(0, [WIDTH - 400, HEIGHT - 400], (count, 2))
+    boxes = np.concatenate([xy, xy + rng.integers(20, 400, (count, 2))], axis=1).astype(np.int32)
+    depth = rng.uniform(0.5, 20.0, (HEIGHT, WIDTH)).astype(np.float32)
+    inv_mat = np.linalg.inv(rng.normal(size=(4, 4)) + np.eye(4) * 4)
+    camera_pos = rng.normal(size=3)
+    return boxes, depth, inv_mat, camera_pos
+
+
+def per_object(boxes, depths, inv_mat, camera_pos):
+    located = []
+    for (x1, y1, x2, y2), depth in zip(boxes.tolist(), depths.tolist()):
+        center = get_world_position_from_screen_space(WIDTH - (x1 + x2) / 2.0, (y1 + y2) / 2.0, depth, inv_mat, camera_pos, WIDTH, HEIGHT)
+        p1 = get_world_position_from_screen_space(x1, y1, depth, inv_mat, camera_pos, WIDTH, HEIGHT)
+        p2 = get_world_position_from_screen_space(x2, y2, depth, inv_mat, camera_pos, WIDTH, HEIGHT)
+        located.append((center, np.linalg.norm(p1[[0, 2]] - p2[[0, 2]]), abs(p1[1] - p2[1])))
+    return located
+
+
+def time_per_frame(fn, *args):
+    fn(*args)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(*args)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def process_each(frame, depth, boxes, inv_mat, camera_pos):
+    return [process_image(frame, depth, box_values, inv_mat, camera_pos) for box_values in boxes.tolist()]
+
+
+if __name__ == "__main__":
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    print(f"{'boxes':>5}  {'geometry per object':>19} {'batched':>8}   {'process_image loop':>18} {'process_boxes':>13}")
+    for count in (1, 10, 50, 100, 200):
+        boxes, depth, inv_mat, camera_pos = make_frame(count)
+        depths = np.random.default_rng(count).uniform(0.5, 20.0, count)
+
+        loop_ms = time_per_frame(per_object, boxes, depths, inv_mat, camera_pos)
+        batched_ms = time_per_frame(locate_boxes, boxes, depths, inv_mat, camera_pos, WIDTH, HEIGHT)
+        # Both print every object, keep that out of the timings
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_loop_ms = time_per_frame(process_each, frame, depth, boxes, inv_mat, camera_pos)
+            process_boxes_ms = time_per_frame(process_boxes, frame, depth, boxes, inv_mat, camera_pos)
+        print(f"{count:>5}  {loop_ms:16.3f} ms {batched_ms:5.3f} ms   {process_loop_ms:15.3f} ms {process_boxes_ms:10.3f} ms")
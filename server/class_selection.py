@@ -0,0 +1,72 @@
+import json
+import re
+
+# Separators and decorations an LLM may wrap a list of class names in
+_SPLIT_PATTERN = re.compile(r"[,;\n]+")
+_STRIP_CHARS = " \t\"'`[](){}-*.:"
+
+
+def _candidate_names(response):
+    try:
+        parsed = json.loads(response)
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, dict):
+        parsed = parsed.get('classes')
+    if isinstance(parsed, list):
+        return [str(item) for item in parsed]
+    return _SPLIT_PATTERN.split(response)
+
+
+def parse_class_names(response, names):
+    """
+    Turn the LLM answer (or any user supplied list) into the detector class ids it names.
+
+    Parameters:
+    - response: A JSON list, a {"classes": [...]} object, or comma/newline separated text.
+    - names: The detector's {class_id: name} mapping.
+
+    Returns:
+    - tuple: (class_ids, unknown) with the sorted list of matched class ids and the
+      entries that are not classes of the detector.
+    """
+    ids_by_name = {name.lower(): class_id for class_id, name in names.items()}
+
+    class_ids = set()
+    unknown = []
+    for candidate in _candidate_names(response):
+        name = candidate.strip(_STRIP_CHARS).lower()
+        if not name:
+            continue
+        if name in ids_by_name:
+            class_ids.add(ids_by_name[name])
+        elif name.isdigit() and int(name) in names:
+            class_ids.add(int(name))
+        else:
+            unknown.append(candidate.strip())
+
+    if not class_ids:
+        raise ValueError(f"No detector classes found in {response!r}")
+    return sorted(class_ids), unknown
+
+
+def select_classes(response, names, fallback="person"):
+    """
+    The detector class ids to start with: those the LLM answer names, else the fallback
+    class, else every class (None), for weights that do not have it.
+
+    Returns:
+    - list or None: Sorted class ids for YOLO's classes argument, None for all classes.
+    """
+    try:
+        class_ids, unknown = parse_class_names(response, names)
+        if unknown:
+            print(f"Ignoring unknown classes: {unknown}")
+        return class_ids
+    except ValueError as e:
+        print(f"{e}, detecting {fallback} only")
+    try:
+        return parse_class_names(fallback, names)[0]
+    except ValueError:
+        print(f"Warning: the detector has no {fallback!r} class, detecting every class")
+        return None
@@ -0,0 +1,104 @@
+import os
+
+# Server settings, overridable through environment variables.
+
+# Ingest queue: how many pending color frames to keep per connection, and how
+# old (in seconds since the client captured them) they may get before being dropped
+INGEST_MAX_FRAMES = int(os.environ.get("INGEST_MAX_FRAMES", 1))
+INGEST_MAX_AGE = float(os.environ.get("INGEST_MAX_AGE", 1.0))
+
+# Worker threads running decoding and inference off the event loop
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 2))
+
+# Worker threads running the independent stages of a frame in parallel
+STAGE_WORKERS = int(os.environ.get("STAGE_WORKERS", 3 * INFERENCE_WORKERS))
+
+# How often (in seconds) the event loop lag is sampled
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", 0.05))
+
+# YOLO engine: "torch", "onnx", "openvino", or "auto" for PyTorch on a GPU and the fastest
+# installed CPU engine otherwise. Exported engines are cached in YOLO_CACHE_DIR, keyed by
+# the weights hash and YOLO_IMGSZ, and loaded directly on later starts.
+YOLO_ENGINE = os.environ.get("YOLO_ENGINE", "auto")
+YOLO_IMGSZ = int(os.environ.get("YOLO_IMGSZ", 640))
+YOLO_CACHE_DIR = os.environ.get("YOLO_CACHE_DIR", "yolo_cache")
+# Exported engines have a fixed input shape (height x width). The default is what 16:9
+# frames letterbox to at imgsz 640, frames of other aspect ratios are padded into it.
+YOLO_EXPORT_SHAPE = tuple(int(v) for v in os.environ.get("YOLO_EXPORT_SHAPE", "384x640").split("x"))
+
+# Depth Anything model and where it runs. DEPTH_DEVICE is "auto" (CUDA, then MPS, then
+# CPU) or a torch device name.
+DEPTH_ENCODER = os.environ.get("DEPTH_ENCODER", "vitb")
+DEPTH_DEVICE = os.environ.get("DEPTH_DEVICE", "auto")
+
+# CPU inference: intra-op and inter-op torch threads (0 keeps torch's defaults), and
+# whether to pick the fastest of channels-last / bfloat16 autocast / torch.compile with
+# a short benchmark at startup. bfloat16 is only tried where the CPU supports it, and
+# torch.compile only when DEPTH_CPU_COMPILE is set, as it takes a while to warm up.
+# The benchmark also picks the intra-op thread count, on a DEPTH_CPU_AUTOTUNE_SHAPE
+# (height x width) network input, 518x924 being what 16:9 frames are resized to. Inter-op
+# threads stay as set: torch only accepts them once per process, and the depth forward
+# runs no inter-op parallel work.
+CPU_THREADS = int(os.environ.get("CPU_THREADS", 0))
+CPU_INTEROP_THREADS = int(os.environ.get("CPU_INTEROP_THREADS", 0))
+DEPTH_CPU_AUTOTUNE = os.environ.get("DEPTH_CPU_AUTOTUNE", "1") == "1"
+DEPTH_CPU_AUTOTUNE_SHAPE = os.environ.get("DEPTH_CPU_AUTOTUNE_SHAPE", "518x924")
+DEPTH_CPU_BF16 = os.environ.get("DEPTH_CPU_BF16", "1") == "1"
+DEPTH_CPU_COMPILE = os.environ.get("DEPTH_CPU_COMPILE", "0") == "1"
+
+# Run the depth encoder with dynamically quantized INT8 linear layers on the CPU. The
+# quantized weights are cached next to the checkpoint and loaded directly on later starts.
+DEPTH_INT8 = os.environ.get("DEPTH_INT8", "0") == "1"
+
+# "torch" runs Depth Anything in PyTorch, "onnx" through ONNX Runtime on the CPU, with one
+# graph per network input (height x width) bucket. Frames go to the bucket nearest their
+# aspect ratio. Graphs are exported to DEPTH_ONNX_DIR on first use.
+DEPTH_BACKEND = os.environ.get("DEPTH_BACKEND", "torch")
+DEPTH_ONNX_BUCKETS = os.environ.get("DEPTH_ONNX_BUCKETS", "518x924,518x686,518x518,924x518")
+DEPTH_ONNX_DIR = os.environ.get("DEPTH_ONNX_DIR", "onnx_cache")
+
+# Attention kernel of the depth encoder when xFormers is not installed: "sdpa" (PyTorch's
+# fused scaled_dot_product_attention), "chunked" (query chunks, bounded memory), "math"
+# (the original matmul-softmax-matmul), or "auto" for SDPA, chunked only for long token
+# sequences on devices without a fused SDPA kernel.
+DEPTH_ATTENTION = os.environ.get("DEPTH_ATTENTION", "auto")
+
+# Fraction (0 to 0.5) of similar patch tokens merged inside every encoder block of the
+# PyTorch depth model, trading a little accuracy for lower latency on flat walls and
+# floors. 0 disables it. See benchmarks/token_merge_bench.py for the tradeoff.
+DEPTH_TOKEN_MERGE = float(os.environ.get("DEPTH_TOKEN_MERGE", "0"))
+
+# Depth map resolution as a fraction of the network input: 1 for the full head, 2 or 4
+# to skip its final upsample and run the last convolutions at 1/2 or 1/4 per side, which
+# is plenty for object distances. See benchmarks/output_stride_bench.py.
+DEPTH_OUTPUT_STRIDE = int(os.environ.get("DEPTH_OUTPUT_STRIDE", 1))
+
+# Depth micro-batching across connections: largest batch per forward (1 disables
+# batching) and how long (ms) to wait for more frames before running a partial batch.
+# Each inference worker has at most one depth request in flight, so batches never grow
+# past INFERENCE_WORKERS, and stop waiting once every frame being processed is in one.
+DEPTH_MAX_BATCH = int(os.environ.get("DEPTH_MAX_BATCH", INFERENCE_WORKERS))
+DEPTH_MAX_WAIT_MS = float(os.environ.get("DEPTH_MAX_WAIT_MS", 5.0))
+
+# Device depth sent by the client alongside each color frame. When a frame has one with
+# at least DEVICE_DEPTH_MIN_VALID of its pixels (overall and inside every box) measured,
+# it is used instead of running Depth Anything. DEVICE_DEPTH_SCALE is meters per unit
+# for integer depth images (the Unity client sends millimetres).
+USE_DEVICE_DEPTH = os.environ.get("USE_DEVICE_DEPTH", "1") == "1"
+DEVICE_DEPTH_MIN_VALID = float(os.environ.get("DEVICE_DEPTH_MIN_VALID", 0.5))
+DEVICE_DEPTH_SCALE = float(os.environ.get("DEVICE_DEPTH_SCALE", 0.001))
+
+# Depth of a detected object: "mean" over its box, or "median", which is robust to the
+# background showing around thin objects. With many or large boxes both come from a
+# per-frame index (summed-area tables, and an integral histogram for the median).
+DEPTH_BOX_STATISTIC = os.environ.get("DEPTH_BOX_STATISTIC", "mean")
+
+# Smallest short side color frames are decoded to. Larger JPEGs are decoded at 1/2, 1/4
+# or 1/8 scale, as long as that stays above it. The default is the depth model's input
+# size; YOLO letterboxes to 640 on the long side, which is still covered. 0 decodes at
+# full resolution.
+DECODE_MIN_SIZE = int(os.environ.get("DECODE_MIN_SIZE", 518))
+
+# Frames per second per session rendered for /debug subscribers. The server is headless:
+# without a subscriber no annotation or visualization work runs at all.
+DEBUG_STREAM_FPS = float(os.environ.get("DEBUG_STREAM_FPS", 2.0))
@@ -0,0 +1,86 @@
+import base64
+import json
+import threading
+import time
+import traceback
+
+import cv2
+import numpy as np
+
+from depth_map import DepthMap
+from image_processing import draw_detection
+
+
+class DebugStream:
+    """
+    Opt-in debug views for the /debug WebSocket. Annotated color and colorized depth
+    frames are only rendered while someone is subscribed, and at most max_fps times a
+    second per session, so the server does no visualization work otherwise.
+    """
+
+    def __init__(self, max_fps=2.0, jpeg_quality=70):
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else float('inf')
+        self.jpeg_quality = jpeg_quality
+        self.subscribers = set()
+        self._last_render = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, websocket):
+        self.subscribers.add(websocket)
+
+    def unsubscribe(self, websocket):
+        self.subscribers.discard(websocket)
+
+    def should_render(self, session_id):
+        """
+        Whether this session's current frame should be rendered. Claims the slot, so
+        call it once per frame.
+        """
+        if not self.subscribers:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_render.get(session_id, float('-inf')) < self.min_interval:
+                return False
+            self._last_render[session_id] = now
+            return True
+
+    def forget(self, session_id):
+        with self._lock:
+            self._last_render.pop(session_id, None)
+
+    def render(self, session_id, current_frame, boxes, depth_frame):
+        """
+        Draw the detections on the frame and colorize the depth map. Blocking, runs on
+        the inference executor.
+
+        Returns:
+        - str: The JSON message to publish.
+        """
+        for box_values in boxes:
+            draw_detection(current_frame, box_values)
+
+        if isinstance(depth_frame, DepthMap):
+            # The view is colorized, network resolution is plenty
+            depth_frame = depth_frame.values
+        depth_frame_normalized = cv2.normalize(np.nan_to_num(depth_frame), None, 0, 255, cv2.NORM_MINMAX)
+        depth_colored = cv2.applyColorMap(np.uint8(depth_frame_normalized), cv2.COLORMAP_INFERNO)
+
+        return json.dumps({
+            "type": "debug_frame",
+            "session": session_id,
+            "color": self._encode(current_frame),
+            "depth": self._encode(depth_colored),
+        })
+
+    def _encode(self, image):
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return base64.b64encode(jpeg.tobytes()).decode('ascii')
+
+    async def publish(self, message):
+        for websocket in list(self.subscribers):
+            try:
+                await websocket.send_text(message)
+            except Exception as e:
+                print(traceback.format_exc())
+                self.unsubscribe(websocket)
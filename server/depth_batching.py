@@ -0,0 +1,182 @@
+import contextlib
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+import torch.nn.functional as F
+
+
+# Queued when a frame gives up its slot without submitting, to end a batch's wait early
+_WAKE = object()
+
+
+class ProducerSlot:
+    """
+    A frame's claim on the depth batcher, from DepthBatcher.producer().
+    """
+
+    __slots__ = ("_batcher", "_released")
+
+    def __init__(self, batcher):
+        self._batcher = batcher
+        self._released = False
+        with batcher._pending_lock:
+            batcher._pending += 1
+            batcher._tracked = True
+
+    def release(self, submitted=False):
+        """
+        Give up the slot, for a frame that will not submit. Only the first call counts.
+        """
+        if self._released:
+            return
+        self._released = True
+        self._batcher._release(submitted)
+
+
+class DepthBatcher:
+    """
+    Shared DepthAnythingV2 inference service. Frames from every connection are collected
+    for up to max_wait_ms, grouped by input shape (the 14-multiple size image2tensor
+    resizes to) and run through the model as one batched forward.
+
+    infer_image has the same signature and output as DepthAnythingV2.infer_image, so it
+    can be used in its place.
+
+    Frames that wrap their work in producer() hold a slot until they submit, or release
+    it when they will not (e.g. they use device depth). A batch stops waiting as soon as
+    no slot is left that could still submit, so a frame that is alone never waits.
+    """
+
+    def __init__(self, model, max_batch=4, max_wait_ms=5.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+
+        self.batches = 0
+        self.frames = 0
+        self.largest_batch = 0
+
+        # Slots of frames that may still submit, counted once producer() has been used
+        self._pending = 0
+        self._tracked = False
+        self._pending_lock = threading.Lock()
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="depth-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, image, producer=None):
+        """
+        Queue a preprocessed (1, 3, H, W) tensor.
+
+        Parameters:
+        - producer: The ProducerSlot of the frame submitting, released once queued.
+
+        Returns:
+        - Future: Resolves to the (1, H, W) depth tensor at network resolution.
+        """
+        future = Future()
+        self._requests.put((image, future))
+        if producer is not None:
+            producer.release(submitted=True)
+        return future
+
+    @contextlib.contextmanager
+    def producer(self):
+        """
+        Hold a slot for a frame in flight that may submit a request. The slot is released
+        by submit, by ProducerSlot.release, or at the latest when the context closes.
+        """
+        slot = ProducerSlot(self)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def _release(self, submitted):
+        with self._pending_lock:
+            self._pending -= 1
+        if not submitted:
+            # Wake a batch that may be waiting for this frame
+            self._requests.put(_WAKE)
+
+    def infer_image(self, raw_image, input_size=518):
+        # Pre- and postprocessing run on the calling thread, only the forward is batched
+        image, (h, w) = self.model.image2tensor(raw_image, input_size)
+
+        depth = self.submit(image).result()
+
+        depth = F.interpolate(depth[:, None], (h, w), mode="bilinear", align_corners=True)[0, 0]
+
+        return depth.cpu().numpy()
+
+    def close(self):
+        self._requests.put(None)
+        self._worker.join()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "mean_batch_size": self.frames / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                # No other request can come when no frame in flight may still submit
+                if self._tracked and self._pending <= 0:
+                    break
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if request is _WAKE:
+                continue
+            if request is None:
+                # Finish this batch, then stop
+                self._requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._requests.get()
+            if first is None:
+                return
+            if first is _WAKE:
+                continue
+
+            groups = {}
+            for image, future in self._collect(first):
+                groups.setdefault(tuple(image.shape), []).append((image, future))
+
+            for requests in groups.values():
+                self._forward(requests)
+
+    @torch.no_grad()
+    def _forward(self, requests):
+        try:
+            images = torch.cat([image for image, _ in requests])
+            depth = self.model.forward(images)
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.frames += len(requests)
+        self.largest_batch = max(self.largest_batch, len(requests))
+        for i, (_, future) in enumerate(requests):
+            future.set_result(depth[i:i + 1])
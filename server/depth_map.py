@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+class DepthMap:
+    """
+    A depth prediction kept at the network resolution, with the mapping to the frame it
+    was predicted for. Box statistics are computed on the small map, with the boxes
+    mapped into it. The frame resolution map is only interpolated if something asks for
+    it, instead of on every frame.
+
+    The mapping is the one F.interpolate(align_corners=True) upsampling uses, so full()
+    is the map infer_image used to return.
+    """
+
+    __slots__ = ("values", "frame_shape", "_full", "_lock")
+
+    def __init__(self, values, frame_shape):
+        """
+        Parameters:
+        - values: (h, w) float32 depth in meters at the network resolution.
+        - frame_shape: (height, width) of the frame.
+        """
+        self.values = values
+        self.frame_shape = tuple(frame_shape)
+        self._full = None
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self):
+        return self.frame_shape
+
+    def scale(self):
+        """
+        Returns:
+        - tuple: (scale_y, scale_x) network pixels per frame pixel.
+        """
+        (h, w), (height, width) = self.values.shape, self.frame_shape
+        return (h - 1) / max(height - 1, 1), (w - 1) / max(width - 1, 1)
+
+    def to_network(self, boxes):
+        """
+        Map (N, 4) frame pixel boxes (x1, y1, x2, y2) to the network pixels nearest to
+        their first and last rows and columns. Non-empty boxes stay at least one pixel.
+        """
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        scale_y, scale_x = self.scale()
+        h, w = self.values.shape
+        x1 = np.clip(np.floor(boxes[:, 0] * scale_x + 0.5), 0, w - 1)
+        y1 = np.clip(np.floor(boxes[:, 1] * scale_y + 0.5), 0, h - 1)
+        # The last frame pixel of the box is x2 - 1
+        x2 = np.clip(np.floor((boxes[:, 2] - 1) * scale_x + 0.5) + 1, x1 + 1, w)
+        y2 = np.clip(np.floor((boxes[:, 3] - 1) * scale_y + 0.5) + 1, y1 + 1, h)
+        empty = (boxes[:, 2] <= boxes[:, 0]) | (boxes[:, 3] <= boxes[:, 1])
+        x2 = np.where(empty, x1, x2)
+        return np.stack([x1, y1, x2, y2], axis=1).astype(np.int64)
+
+    def full(self):
+        """
+        Returns:
+        - numpy.ndarray: The depth at the frame resolution, interpolated on the first
+          call only.
+        """
+        with self._lock:
+            if self._full is None:
+                values = torch.from_numpy(self.values)[None, None]
+                self._full = F.interpolate(values, self.frame_shape, mode="bilinear", align_corners=True)[0, 0].numpy()
+            return self._full
@@ -0,0 +1,194 @@
+import os
+import time
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import quantize_dynamic
+
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+
+
+def resolve_device(device="auto"):
+    if device != "auto":
+        return torch.device(device)
+    if torch.cuda.is_available():
+        return torch.device("cuda")
+    if torch.backends.mps.is_available():
+        return torch.device("mps")
+    return torch.device("cpu")
+
+
+def cpu_supports_bf16():
+    # True on CPUs with AVX512-BF16 or AMX, where oneDNN runs bf16 natively
+    try:
+        return torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def quantize_encoder(model):
+    """
+    Swap the nn.Linear layers of the DINOv2 encoder (attention qkv and proj, MLP) for
+    dynamically quantized INT8 ones, in place. They are nearly all of the CPU time. The
+    DPTHead stays in float: it is convolutions, which dynamic quantization has no
+    kernels for.
+    """
+    model.pretrained = quantize_dynamic(model.pretrained, {nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def load_int8_model(model, checkpoint_path, cache_path):
+    """
+    Load DepthAnythingV2 with an INT8 encoder, from cache_path when it is newer than the
+    float checkpoint, otherwise by quantizing the checkpoint and writing the cache.
+
+    Parameters:
+    - model: A freshly built DepthAnythingV2, its weights are replaced.
+
+    Returns:
+    - tuple: (the quantized model in eval mode on the CPU, whether the cache was used).
+    """
+    model = model.cpu().eval()
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(checkpoint_path):
+        # Quantize the random weights only to get the module structure the cache was saved from
+        quantize_encoder(model)
+        model.load_state_dict(torch.load(cache_path, map_location='cpu'))
+        return model, True
+
+    model.load_state_dict(torch.load(checkpoint_path, map_location='cpu'))
+    quantize_encoder(model)
+    torch.save(model.state_dict(), cache_path)
+    return model, False
+
+
+class CpuDepthConfig:
+    """
+    One way of running DepthAnythingV2 on the CPU.
+    """
+
+    __slots__ = ("threads", "channels_last", "bf16", "compiled")
+
+    def __init__(self, threads, channels_last=True, bf16=False, compiled=False):
+        self.threads = threads
+        self.channels_last = channels_last
+        self.bf16 = bf16
+        self.compiled = compiled
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"CpuDepthConfig({', '.join(f'{k}={v}' for k, v in self.as_dict().items())})"
+
+
+class CpuDepthModel(nn.Module):
+    """
+    DepthAnythingV2 prepared for CPU inference according to a CpuDepthConfig. It has the
+    forward, image2tensor and infer_image of the wrapped model, so DepthBatcher and the
+    server use it in its place.
+
+    config.threads is not applied here: intra-op threads are process wide and forwards
+    run on several threads at once, so the server sets them once after loading.
+    """
+
+    def __init__(self, model, config):
+        super().__init__()
+        self.model = model
+        self.config = config
+
+        if config.channels_last:
+            # Only the patch embedding and the DPT head are convolutions, the ViT blocks are unaffected
+            self.model = self.model.to(memory_format=torch.channels_last)
+        self._forward = torch.compile(self.model, dynamic=False) if config.compiled else self.model
+
+    def forward(self, x):
+        if self.config.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        with torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.config.bf16):
+            depth = self._forward(x)
+        return depth.float()
+
+    def image2tensor(self, raw_image, input_size=518):
+        image, (h, w) = DepthAnythingV2.image2tensor(self.model, raw_image, input_size)
+        if image.device.type != "cpu":
+            image = image.cpu()
+        return image, (h, w)
+
+    infer_image = DepthAnythingV2.infer_image
+
+
+def candidate_configs(max_threads, allow_bf16=True, allow_compile=False):
+    threads = sorted({max_threads, max(1, max_threads // 2)}, reverse=True)
+    precisions = (False, True) if allow_bf16 and cpu_supports_bf16() else (False,)
+    compiled = (False, True) if allow_compile else (False,)
+    return [
+        CpuDepthConfig(thread_count, channels_last, bf16, compile_model)
+        for thread_count in threads
+        for channels_last in (False, True)
+        for bf16 in precisions
+        for compile_model in compiled
+    ]
+
+
+@torch.no_grad()
+def _time_forward(model, image, repeats):
+    torch.set_num_threads(model.config.threads)
+    model(image)  # warm up, and compile
+    start = time.perf_counter()
+    for _ in range(repeats):
+        depth = model(image)
+    return (time.perf_counter() - start) / repeats * 1000, depth
+
+
+def autotune_cpu_model(model, input_shape=(518, 924), max_threads=None,
+                       allow_bf16=True, allow_compile=False, repeats=3, max_relative_error=0.02):
+    """
+    Time every candidate configuration on a dummy input and keep the fastest one whose
+    output stays within max_relative_error of the float32 result.
+
+    Only intra-op threads are tuned. torch.set_num_interop_threads can only be called
+    once per process, before any inter-op work, and the forward does not use them.
+
+    Parameters:
+    - model: DepthAnythingV2 in eval mode, on the CPU.
+    - input_shape: (height, width) network input to time, multiples of 14, what the
+      server's frames are resized to.
+    - max_threads: Upper bound for intra-op threads, the current torch setting by default.
+    - allow_compile: Also try torch.compile, which takes a while to warm up.
+
+    Returns:
+    - tuple: (CpuDepthModel with the chosen config, list of result dicts for every candidate,
+      with its latency, error and whether it was chosen).
+    """
+    max_threads = max_threads or torch.get_num_threads()
+    image = torch.randn(1, 3, *input_shape)
+
+    torch.set_num_threads(max_threads)
+    with torch.no_grad():
+        reference = model(image)
+
+    results = []
+    best = None
+    for config in candidate_configs(max_threads, allow_bf16, allow_compile):
+        try:
+            candidate = CpuDepthModel(model, config)
+            latency_ms, depth = _time_forward(candidate, image, repeats)
+        except Exception as e:
+            # torch.compile needs a working C++ toolchain, skip it when there is none
+            print(f"Skipping {config}: {e}")
+            continue
+        finally:
+            model.to(memory_format=torch.contiguous_format)
+
+        relative_error = float((depth - reference).abs().mean() / reference.abs().mean().clamp(min=1e-6))
+        accepted = relative_error <= max_relative_error
+        result = {**config.as_dict(), "latency_ms": latency_ms, "relative_error": relative_error, "accepted": accepted, "chosen": False}
+        results.append(result)
+        if accepted and (best is None or latency_ms < best[0]["latency_ms"]):
+            best = (result, config)
+
+    torch.set_num_threads(max_threads)
+    if best is None:
+        return CpuDepthModel(model, CpuDepthConfig(max_threads, channels_last=False)), results
+    best[0]["chosen"] = True
+    return CpuDepthModel(model, best[1]), results
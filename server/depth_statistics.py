@@ -0,0 +1,236 @@
+import cv2
+import numpy as np
+
+from depth_map import DepthMap
+
+
+class DepthStatistics:
+    """
+    Per-frame index of a depth map answering box queries in constant time, however large
+    or overlapping the boxes are. Built once per frame, then shared by all detections.
+
+    - Summed-area tables of the depth and of the valid (non-NaN) pixels give the exact
+      mean and valid fraction of any box from four lookups each.
+    - Optionally, an integral histogram over cell_size x cell_size cells gives robust
+      percentiles (e.g. the median) of any box from four lookups per bin. Boxes are
+      snapped to the cell grid and values are interpolated within a bin, so percentiles
+      are approximate, to within about a cell of box edge and a bin width of depth.
+    """
+
+    def __init__(self, depth, histogram_bins=0, cell_size=8, max_depth=None):
+        """
+        Parameters:
+        - depth: (H, W) depth map in meters, NaN where there is no measurement.
+        - histogram_bins: Depth bins of the integral histogram, 0 to skip building it.
+        - cell_size: Pixel size of the histogram cells.
+        - max_depth: Upper edge of the histogram bins, the largest depth of the frame by
+          default. Deeper pixels are counted in the last bin.
+        """
+        depth = np.asarray(depth, dtype=np.float32)
+        self.shape = depth.shape
+        valid = ~np.isnan(depth)
+
+        # Model depth has no holes, the count of a box is then its area
+        self._all_valid = bool(valid.all())
+        if self._all_valid:
+            self._sum = cv2.integral(depth, sdepth=cv2.CV_64F)
+            self._count = None
+        else:
+            self._sum = cv2.integral(np.where(valid, depth, np.float32(0)), sdepth=cv2.CV_64F)
+            self._count = cv2.integral(valid.view(np.uint8), sdepth=cv2.CV_32S)
+
+        self.histogram_bins = histogram_bins
+        self.cell_size = cell_size
+        if histogram_bins:
+            self._build_histogram(depth, valid, max_depth)
+
+    def _build_histogram(self, depth, valid, max_depth):
+        height, width = self.shape
+        cells_y, cells_x = -(-height // self.cell_size), -(-width // self.cell_size)
+        if max_depth is None:
+            max_depth = float(np.nanmax(depth)) if valid.any() else 1.0
+        self.bin_width = max(max_depth, 1e-6) / self.histogram_bins
+
+        # A regular sample of 16 pixels per cell is plenty for its histogram, and a
+        # quarter of the work at the default cell size
+        stride = max(1, self.cell_size // 4)
+        depth, valid = depth[::stride, ::stride], valid[::stride, ::stride]
+        bins = np.minimum(np.where(valid, depth, np.float32(0)) * np.float32(1 / self.bin_width), self.histogram_bins - 1).astype(np.intp)
+        rows = np.arange(0, height, stride) // self.cell_size
+        columns = np.arange(0, width, stride) // self.cell_size
+        cells = (rows[:, None] * cells_x + columns[None, :]) * self.histogram_bins + bins
+        counts = np.bincount((cells if self._all_valid else cells[valid]).ravel(), minlength=cells_y * cells_x * self.histogram_bins)
+
+        # (cells_y + 1, cells_x + 1, bins) integral histogram, zero first row and column
+        histogram = np.zeros((cells_y + 1, cells_x + 1, self.histogram_bins), dtype=np.int32)
+        histogram[1:, 1:] = counts.reshape(cells_y, cells_x, self.histogram_bins)
+        # Row by row and column by column, each step vectorized over the other axis and the
+        # bins, which is several times faster than np.cumsum along the outer axes
+        for row in range(2, cells_y + 1):
+            histogram[row] += histogram[row - 1]
+        for column in range(2, cells_x + 1):
+            histogram[:, column] += histogram[:, column - 1]
+        self._histogram = histogram
+
+    def _corners(self, boxes):
+        height, width = self.shape
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        x1 = np.clip(boxes[:, 0], 0, width)
+        y1 = np.clip(boxes[:, 1], 0, height)
+        # Empty boxes (x2 <= x1) select nothing, like the equivalent slice
+        x2 = np.maximum(np.clip(boxes[:, 2], 0, width), x1)
+        y2 = np.maximum(np.clip(boxes[:, 3], 0, height), y1)
+        return x1, y1, x2, y2
+
+    @staticmethod
+    def _box_sums(table, x1, y1, x2, y2):
+        return table[y2, x2] - table[y1, x2] - table[y2, x1] + table[y1, x1]
+
+    def _counts(self, x1, y1, x2, y2):
+        if self._all_valid:
+            return (x2 - x1) * (y2 - y1)
+        return self._box_sums(self._count, x1, y1, x2, y2)
+
+    def counts(self, boxes):
+        """
+        Returns:
+        - numpy.ndarray: (N,) number of valid pixels in each (x1, y1, x2, y2) box.
+        """
+        return self._counts(*self._corners(boxes))
+
+    def means(self, boxes):
+        """
+        Returns:
+        - numpy.ndarray: (N,) mean depth of the valid pixels in each box, NaN for boxes
+          without any, like np.nanmean over the box.
+        """
+        corners = self._corners(boxes)
+        counts = self._counts(*corners)
+        sums = self._box_sums(self._sum, *corners)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    def valid_fractions(self, boxes):
+        """
+        Returns:
+        - numpy.ndarray: (N,) fraction of the pixels of each box with a measurement, 0
+          for empty boxes.
+        """
+        x1, y1, x2, y2 = self._corners(boxes)
+        areas = (x2 - x1) * (y2 - y1)
+        counts = self._counts(x1, y1, x2, y2)
+        return np.where(areas > 0, counts / np.maximum(areas, 1), 0.0)
+
+    def percentiles(self, boxes, q):
+        """
+        Approximate q-th percentile (0 to 100) of the valid depth in each box, from the
+        integral histogram.
+
+        Returns:
+        - numpy.ndarray: (N,) depths, NaN for empty boxes and boxes without valid pixels.
+        """
+        if not self.histogram_bins:
+            raise ValueError("DepthStatistics was built without a histogram, pass histogram_bins")
+
+        x1, y1, x2, y2 = self._corners(boxes)
+        # Snap to the cells nearest the box edges, keeping at least one cell
+        cells_y, cells_x = self._histogram.shape[0] - 1, self._histogram.shape[1] - 1
+        cx1 = np.clip(np.rint(x1 / self.cell_size).astype(np.int64), 0, cells_x - 1)
+        cy1 = np.clip(np.rint(y1 / self.cell_size).astype(np.int64), 0, cells_y - 1)
+        cx2 = np.clip(np.rint(x2 / self.cell_size).astype(np.int64), cx1 + 1, cells_x)
+        cy2 = np.clip(np.rint(y2 / self.cell_size).astype(np.int64), cy1 + 1, cells_y)
+
+        histograms = self._box_sums(self._histogram, cx1, cy1, cx2, cy2)  # (N, bins)
+        cumulative = histograms.cumsum(axis=1)
+        totals = cumulative[:, -1]
+        targets = q / 100.0 * totals
+
+        # First bin whose cumulative count reaches the target, then interpolate inside it
+        bins = np.minimum((cumulative < targets[:, None]).sum(axis=1), self.histogram_bins - 1)
+        rows = np.arange(len(bins))
+        below = cumulative[rows, bins] - histograms[rows, bins]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            within = np.clip((targets - below) / histograms[rows, bins], 0.0, 1.0)
+        depths = (bins + np.nan_to_num(within)) * self.bin_width
+        return np.where((totals > 0) & (x2 > x1) & (y2 > y1), depths, np.nan)
+
+    def medians(self, boxes):
+        return self.percentiles(boxes, 50)
+
+
+# Total box area, as a fraction of the frame, from which building a DepthStatistics beats
+# reducing every box slice: around a frame's worth of pixels for the summed-area tables,
+# more for the histogram, as np.nanmedian of a slice is costlier than np.nanmean (see
+# benchmarks/depth_statistics_bench.py)
+INDEX_MIN_COVERAGE = {"mean": 0.75, "valid_fraction": 0.75, "median": 1.5}
+
+
+def _box_slices(depth, boxes):
+    height, width = depth.shape[:2]
+    for x1, y1, x2, y2 in np.asarray(boxes).reshape(-1, 4).tolist():
+        yield depth[max(y1, 0):max(min(y2, height), 0), max(x1, 0):max(min(x2, width), 0)]
+
+
+def _use_index(depth, boxes, statistic):
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    areas = np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+    return areas.sum() >= INDEX_MIN_COVERAGE[statistic] * depth.shape[0] * depth.shape[1]
+
+
+def box_depths(depth, boxes, statistic="mean", histogram_bins=64):
+    """
+    Depth of every box, "mean" or "median" of its valid pixels, NaN without any. Reduces
+    each box slice when the boxes are small, builds a DepthStatistics when they cover
+    enough of the frame for it to pay off.
+
+    Parameters:
+    - depth: Depth map, a DepthMap at network resolution, whose boxes are mapped into it,
+      or a DepthStatistics already built from a map (with a histogram for the median).
+    """
+    if isinstance(depth, DepthMap):
+        depth, boxes = depth.values, depth.to_network(boxes)
+    if isinstance(depth, DepthStatistics):
+        return depth.medians(boxes) if statistic == "median" else depth.means(boxes)
+    if _use_index(depth, boxes, statistic):
+        stats = DepthStatistics(depth, histogram_bins if statistic == "median" else 0)
+        return stats.medians(boxes) if statistic == "median" else stats.means(boxes)
+
+    reduce = np.nanmedian if statistic == "median" else np.nanmean
+    depths = []
+    for box in _box_slices(depth, boxes):
+        valid = box.size and not np.isnan(box).all()
+        depths.append(reduce(box) if valid else np.nan)
+    return np.array(depths, dtype=np.float64)
+
+
+def box_index(depth, boxes, statistic="mean", histogram_bins=64):
+    """
+    A DepthStatistics of a frame resolution depth map to share between box_valid_fractions
+    and box_depths, or None when the boxes cover too little of the frame for it to pay
+    off. It has a histogram only if the boxes cover enough for the median as well.
+    """
+    if not _use_index(depth, boxes, "valid_fraction"):
+        return None
+    median = statistic == "median" and _use_index(depth, boxes, "median")
+    return DepthStatistics(depth, histogram_bins if median else 0)
+
+
+def box_valid_fractions(depth, boxes):
+    """
+    Fraction of the pixels of every box with a measurement, 0 for empty boxes, the
+    batched device_depth.valid_fraction.
+
+    Parameters:
+    - depth: Depth map, a DepthMap at network resolution, or a DepthStatistics already
+      built from a map.
+    """
+    if isinstance(depth, DepthStatistics):
+        return depth.valid_fractions(boxes)
+    if isinstance(depth, DepthMap):
+        depth, boxes = depth.values, depth.to_network(boxes)
+    if _use_index(depth, boxes, "valid_fraction"):
+        return DepthStatistics(depth).valid_fractions(boxes)
+    return np.array([
+        np.count_nonzero(~np.isnan(box)) / box.size if box.size else 0.0
+        for box in _box_slices(depth, boxes)
+    ])
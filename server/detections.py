@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class Detections:
+    """
+    The boxes of one frame as flat arrays, read once from the ultralytics result
+    tensors instead of going through Results.to_json and json.loads.
+
+    - xyxy: (N, 4) int32 pixel boxes (x1, y1, x2, y2).
+    - class_ids: (N,) int32 class ids.
+    - track_ids: (N,) int32 track ids, -1 for boxes the tracker did not match.
+    - confidences: (N,) float32 scores.
+    """
+
+    __slots__ = ("xyxy", "class_ids", "track_ids", "confidences")
+
+    def __init__(self, xyxy, class_ids, track_ids, confidences):
+        self.xyxy = xyxy
+        self.class_ids = class_ids
+        self.track_ids = track_ids
+        self.confidences = confidences
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.empty((0, 4), dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.float32),
+        )
+
+    @classmethod
+    def from_results(cls, results, letterbox=None):
+        """
+        Build the detections of a frame from the list returned by predict/track.
+
+        Parameters:
+        - results: The ultralytics Results, usually a single one per frame.
+        - letterbox: The Letterbox the detector input was made with, if any, to map the
+          boxes back to frame pixels.
+
+        Returns:
+        - Detections: All boxes of all results, in order.
+        """
+        parts = []
+        for result in results:
+            if result is None or result.boxes is None:
+                continue
+            boxes = result.boxes
+            if len(boxes) == 0:
+                continue
+            # One device to host copy for the whole (N, 6|7) tensor instead of one per field
+            data = boxes.data.cpu().numpy()
+            track_ids = data[:, -3] if boxes.is_track else np.full(len(data), -1)
+            parts.append((data[:, :4], data[:, -1], track_ids, data[:, -2]))
+
+        if not parts:
+            return cls.empty()
+
+        xyxy, class_ids, track_ids, confidences = (np.concatenate(field) for field in zip(*parts))
+        if letterbox is not None:
+            xyxy = letterbox.to_frame(xyxy)
+        return cls(
+            # Truncate like the int(v) the boxes always went through
+            xyxy.astype(np.int32),
+            class_ids.astype(np.int32),
+            track_ids.astype(np.int32),
+            confidences.astype(np.float32),
+        )
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def __getitem__(self, index):
+        """
+        Select detections with a boolean mask, an index array or a slice.
+        """
+        return Detections(
+            self.xyxy[index],
+            self.class_ids[index],
+            self.track_ids[index],
+            self.confidences[index],
+        )
@@ -0,0 +1,103 @@
+import hashlib
+import importlib.util
+import os
+import shutil
+import traceback
+
+import torch
+from ultralytics import YOLO
+
+# File or folder ultralytics' export writes next to the weights, per format
+ENGINE_ARTIFACTS = {
+    "onnx": "{stem}.onnx",
+    "openvino": "{stem}_openvino_model",
+}
+
+
+def weights_hash(path, length=16):
+    digest = hashlib.sha256()
+    with open(path, "rb") as weights:
+        for chunk in iter(lambda: weights.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def pick_engine(engine="auto"):
+    """
+    Resolve "auto" to the fastest engine available here: PyTorch when there is a GPU,
+    otherwise OpenVINO, then ONNX Runtime.
+    """
+    if engine != "auto":
+        return engine
+    if torch.cuda.is_available():
+        return "torch"
+    if importlib.util.find_spec("openvino") is not None:
+        return "openvino"
+    if importlib.util.find_spec("onnxruntime") is not None:
+        return "onnx"
+    return "torch"
+
+
+def export_cached(weights_path, engine, shape, cache_dir):
+    """
+    Path of the exported detector, exporting it on the first call. Artifacts are cached
+    in one folder per weights hash, input shape and engine, so retrained weights or a
+    new shape export again.
+    """
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    entry = os.path.join(cache_dir, f"{stem}_{weights_hash(weights_path)}_{shape[0]}x{shape[1]}_{engine}")
+    artifact = os.path.join(entry, ENGINE_ARTIFACTS[engine].format(stem=stem))
+    if os.path.exists(artifact):
+        return artifact
+
+    # Export from a copy inside a temporary folder, so every file the exporter writes
+    # lands in the cache entry, which appears atomically
+    staging = entry + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    staged_weights = os.path.join(staging, os.path.basename(weights_path))
+    shutil.copyfile(weights_path, staged_weights)
+    try:
+        YOLO(staged_weights).export(format=engine, imgsz=shape, half=False, dynamic=False, simplify=False)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    os.remove(staged_weights)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.rename(staging, entry)
+    return artifact
+
+
+def load_detector(weights, engine="auto", imgsz=640, cache_dir="yolo_cache", export_shape=None):
+    """
+    Load the YOLO detector, on an exported CPU engine when one is selected.
+
+    Parameters:
+    - weights: The PyTorch weights, downloaded by ultralytics if missing.
+    - engine: "torch", "onnx", "openvino" or "auto" (see pick_engine).
+    - imgsz: Detector input size for PyTorch.
+    - cache_dir: Where exported engines are kept between starts.
+    - export_shape: (height, width) exported graphs are fixed to. Ideally the letterboxed
+      shape of the frames, e.g. (384, 640) for 16:9 at imgsz 640, so no padding is run
+      through the network. Defaults to a square imgsz.
+
+    Returns:
+    - tuple: (YOLO model, name of the engine actually used). Export failures fall back
+      to PyTorch.
+    """
+    model = YOLO(weights)
+    engine = pick_engine(engine)
+    model.overrides["imgsz"] = imgsz
+    if engine != "torch":
+        shape = tuple(export_shape or (imgsz, imgsz))
+        try:
+            artifact = export_cached(model.ckpt_path or weights, engine, shape, cache_dir)
+            # Class names come from the metadata ultralytics stores in the export
+            model = YOLO(artifact, task="detect")
+            model.overrides["imgsz"] = list(shape)
+        except Exception as e:
+            print(traceback.format_exc())
+            print(f"Could not load the {engine} detector, running it in PyTorch")
+            engine = "torch"
+
+    return model, engine
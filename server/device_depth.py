@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class DepthPairing:
+    """
+    Holds the device depth frames of one session until the color frame with the same
+    frame id is processed. Nothing is decoded here: depth frames that cannot be paired,
+    or whose color frame was dropped, are discarded as raw bytes.
+    """
+
+    def __init__(self, max_pending=4):
+        self.max_pending = max_pending
+        self._pending = OrderedDict()
+        self._last_taken = -1
+        # Frames are added by the receiver on the event loop and taken by a stage thread
+        self._lock = threading.Lock()
+
+        self.received = 0
+        self.paired = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def add(self, frame):
+        """
+        Returns:
+        - bool: Whether the depth frame was kept for pairing.
+        """
+        with self._lock:
+            self.received += 1
+            # Legacy clients send no frame id, and frames older than the last processed color frame are useless
+            if frame.frame_id is None or frame.frame_id <= self._last_taken:
+                self.rejected += 1
+                return False
+
+            self._pending[frame.frame_id] = frame
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+                self.evicted += 1
+            return True
+
+    def take(self, frame_id):
+        """
+        Get the depth frame paired with a color frame, discarding every older one.
+
+        Returns:
+        - The depth FrameMessage, or None if none arrived for this frame id.
+        """
+        if frame_id is None:
+            return None
+
+        with self._lock:
+            self._last_taken = max(self._last_taken, frame_id)
+
+            for pending_id in [pending_id for pending_id in self._pending if pending_id < frame_id]:
+                del self._pending[pending_id]
+                self.evicted += 1
+
+            frame = self._pending.pop(frame_id, None)
+            if frame is not None:
+                self.paired += 1
+            return frame
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "paired": self.paired,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "pending": len(self._pending),
+        }
+
+
+def decode_device_depth(frame, output_shape, depth_scale=0.001):
+    """
+    Decode a device depth frame to meters at the color frame resolution.
+
+    Parameters:
+    - frame: The depth FrameMessage. The payload is a single channel image, 16-bit PNG in
+      millimetres from the Unity client, or a float EXR already in meters.
+    - output_shape: (height, width) of the color frame.
+    - depth_scale: Meters per unit for integer depth images.
+
+    Returns:
+    - numpy.ndarray: float32 depth in meters, NaN where the device had no measurement,
+      or None if the payload could not be decoded.
+    """
+    buffer = np.frombuffer(frame.payload(), dtype=np.uint8)
+    depth = cv2.imdecode(buffer, cv2.IMREAD_UNCHANGED | cv2.IMREAD_ANYDEPTH)
+    if depth is None:
+        return None
+    if depth.ndim == 3:
+        depth = depth[:, :, 0]
+
+    if np.issubdtype(depth.dtype, np.integer):
+        depth = depth.astype(np.float32) * depth_scale
+    else:
+        depth = depth.astype(np.float32)
+    depth[~(depth > 0)] = np.nan
+
+    height, width = output_shape
+    if depth.shape != (height, width):
+        # Nearest keeps invalid pixels from bleeding into their neighbours
+        depth = cv2.resize(depth, (width, height), interpolation=cv2.INTER_NEAREST)
+    return depth
+
+
+def valid_fraction(depth, box_values=None):
+    """
+    Fraction of pixels with a depth measurement, over the whole map or inside a box (x1, y1, x2, y2).
+    """
+    if box_values is not None:
+        depth = depth[box_values[1]:box_values[3], box_values[0]:box_values[2]]
+    if depth.size == 0:
+        return 0.0
+    return float(np.count_nonzero(~np.isnan(depth))) / depth.size
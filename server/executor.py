@@ -0,0 +1,21 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+# Threads rather than processes: the models live on the GPU and are shared by every
+# connection, and PyTorch, OpenCV and the JPEG decoder all release the GIL while working.
+inference_executor = ThreadPoolExecutor(max_workers=config.INFERENCE_WORKERS, thread_name_prefix="inference")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run a blocking function on the inference executor and wait for it without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, functools.partial(fn, *args, **kwargs))
+
+# Stages of a single frame (GUI colors, YOLO, depth) run here in parallel. Kept apart from
+# inference_executor so a frame waiting on its stages can never starve them of threads.
+stage_executor = ThreadPoolExecutor(max_workers=config.STAGE_WORKERS, thread_name_prefix="stage")
@@ -0,0 +1,86 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+class FrameGraph:
+    """
+    Per-frame execution graph. Each stage is a function of the results of the stages it
+    depends on; stages whose dependencies are done are submitted to the executor right
+    away, so independent stages run at the same time.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def stage(self, name, fn, deps=()):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = (fn, tuple(deps))
+        return self
+
+    def run(self, executor=None):
+        """
+        Run every stage, in parallel on the executor or one after another if executor is None.
+
+        Returns:
+        - results: Dictionary of stage name to its return value.
+        - timings: Dictionary of stage name to its duration in ms, plus 'total' for the wall time
+          of the whole graph (the critical path when running in parallel).
+        """
+        results = {}
+        timings = {}
+        graph_start = time.perf_counter()
+
+        def timed(name, fn, args):
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timings[name] = (time.perf_counter() - start) * 1000
+
+        if executor is None:
+            for name, (fn, deps) in self.stages.items():
+                results[name] = timed(name, fn, [results[dep] for dep in deps])
+        else:
+            pending = dict(self.stages)
+            running = {}
+            while pending or running:
+                for name, (fn, deps) in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        running[executor.submit(timed, name, fn, [results[dep] for dep in deps])] = name
+                        del pending[name]
+                if not running:
+                    raise RuntimeError(f"Stages {list(pending)} can never run")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # Re-raises the stage's exception, the remaining stages are abandoned
+                    results[running.pop(future)] = future.result()
+
+        timings['total'] = (time.perf_counter() - graph_start) * 1000
+        return results, timings
+
+
+class StageStats:
+    """
+    Running mean and max of the per-stage timings returned by FrameGraph.run.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.total_ms = {}
+        self.max_ms = {}
+
+    def record(self, timings):
+        self.frames += 1
+        for name, ms in timings.items():
+            self.total_ms[name] = self.total_ms.get(name, 0.0) + ms
+            self.max_ms[name] = max(self.max_ms.get(name, 0.0), ms)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "mean_ms": {name: total / self.frames for name, total in self.total_ms.items()},
+            "max_ms": dict(self.max_ms),
+        }
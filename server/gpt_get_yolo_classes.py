@@ -100,7 +100,7 @@ def run_analyzer(chat):
     response = chain.invoke({})
     print(response)
 
-def get_classes_from_prompt(chat):
+def get_classes_from_prompt(chat, input_str=None, classes=None):
     prompt = ChatPromptTemplate.from_messages([
             ("system", """
                 Your task is to aid in the selection of the adequet classes for a vision detection program. 
@@ -112,8 +112,10 @@ def get_classes_from_prompt(chat):
             ("user", "{input}")
             ])
 
-    input_str = input("Describe what you want YOLO to identify on the scene.")
-    classes = YOLO('yolov9c.pt').names
+    if input_str is None:
+        input_str = input("Describe what you want YOLO to identify on the scene.")
+    if classes is None:
+        classes = YOLO('yolov9c.pt').names
 
     output_parser = StrOutputParser()
     chain = prompt | chat | output_parser
@@ -3,6 +3,8 @@ import numpy as np
 import json
 import traceback
 
+from depth_statistics import box_depths
+
 def quaternion_to_rotation_matrix(qx, qy, qz, qw):
     return np.array([
         [1 - 2*(qy**2 + qz**2),     2*(qx*qy - qz*qw),     2*(qx*qz + qy*qw)],
@@ -59,15 +61,85 @@ def get_world_position_from_screen_space(x,y,depth, inv_mat, camera_pos,width,he
 
     return world_position
 
-def process_image(current_frame, depth_image, detection, inv_mat, camera_pos):
-    try:
-        box = detection.get('box')
-        if not box:
-            print("No bounding box found in detection.")
-            return None
+def _norms(vectors):
+    # Row norms computed like np.linalg.norm does for a single vector
+    return np.sqrt(np.matmul(vectors[:, None, :], vectors[:, :, None])[:, 0, 0])
+
+
+def get_world_positions_from_screen_space(points, depths, inv_mat, camera_pos, width, height):
+    """
+    get_world_position_from_screen_space for many points at once.
+
+    Parameters:
+    - points: (M, 2) screen positions (x, y) in pixels.
+    - depths: (M,) world space distances from the camera.
+
+    Returns:
+    - numpy.ndarray: (M, 3) world positions.
+    """
+    points = np.asarray(points, dtype=np.float64)
+
+    # Near clip plane points in NDC, one per row
+    near_clip_points = np.empty((len(points), 4))
+    near_clip_points[:, 0] = (points[:, 0] - (width * 0.5)) / (width * 0.5)
+    near_clip_points[:, 1] = -((points[:, 1] - (height * 0.5)) / (height * 0.5))
+    near_clip_points[:, 2] = -1.0
+    near_clip_points[:, 3] = 1.0
+
+    # Stacked matrix-vector products go through the same BLAS kernel as np.dot, so the
+    # results are bit-identical to the per-point version
+    world_near = np.matmul(inv_mat, near_clip_points[:, :, None])[:, :, 0]
+    world_near_pos = world_near[:, :3] / world_near[:, 3:]
+
+    ray_directions = world_near_pos - camera_pos
+    ray_directions /= _norms(ray_directions)[:, None]
+    return camera_pos + ray_directions * np.asarray(depths, dtype=np.float64)[:, None]
+
+
+def locate_boxes(boxes, depths, inv_mat, camera_pos, width, height):
+    """
+    World space centers and sizes of all boxes of a frame, unprojecting each box center
+    (mirrored horizontally) and its two corners at the box depth.
+
+    Parameters:
+    - boxes: (N, 4) pixel boxes (x1, y1, x2, y2).
+    - depths: (N,) depth of each box.
+    - width, height: Frame size in pixels.
+
+    Returns:
+    - tuple: ((N, 3) centers, (N,) widths in the X-Z plane, (N,) heights along Y).
+    """
+    boxes = np.asarray(boxes)
+    n = len(boxes)
+    centers = np.empty((n, 2))
+    centers[:, 0] = width - (boxes[:, 0] + boxes[:, 2]) / 2.0
+    centers[:, 1] = (boxes[:, 1] + boxes[:, 3]) / 2.0
+
+    # Centers, top-left corners and bottom-right corners in one pass
+    points = np.concatenate([centers, boxes[:, 0:2], boxes[:, 2:4]])
+    world = get_world_positions_from_screen_space(points, np.tile(depths, 3), inv_mat, camera_pos, width, height)
+    center_wp, w_box_p1, w_box_p2 = world[:n], world[n:2 * n], world[2 * n:]
 
-        box_values = [int(v) for v in box.values()]
-        cv2.rectangle(current_frame, (box_values[0], box_values[1]), (box_values[2], box_values[3]), (0, 255, 0), 2)
+    xz = w_box_p1[:, [0, 2]] - w_box_p2[:, [0, 2]]
+    object_widths = _norms(xz)
+    object_heights = np.abs(w_box_p1[:, 1] - w_box_p2[:, 1])
+    return center_wp, object_widths, object_heights
+
+
+def draw_detection(current_frame, box_values):
+    """
+    Draw a detection's bounding box and the (mirrored) center used for unprojection.
+    """
+    image_width = current_frame.shape[1]
+    cv2.rectangle(current_frame, (box_values[0], box_values[1]), (box_values[2], box_values[3]), (0, 255, 0), 2)
+    x_center = image_width - (box_values[0] + box_values[2]) / 2.0
+    y_center = (box_values[1] + box_values[3]) / 2.0
+    cv2.circle(current_frame, (int(x_center), int(y_center)), 5, (0, 0, 255), -1)
+
+def process_image(current_frame, depth_image, box_values, inv_mat, camera_pos, annotate=False):
+    try:
+        if annotate:
+            draw_detection(current_frame, box_values)
 
         # Compute the center of the bounding box
         image_height, image_width, channels = current_frame.shape
@@ -78,12 +150,10 @@ def process_image(current_frame, depth_image, detection, inv_mat, camera_pos):
 
         # x_center = image_width - x_center  # Invert x coordinate
         # y_center = image_height - y_center  # Invert y coordinate
-        cv2.circle(current_frame, (int(x_center), int(y_center)), 5, (0, 0, 255), -1)
 
-        
 
-        # Calculate mean depth over the bounding box
-        depth = np.mean(depth_image[box_values[1]:box_values[3], box_values[0]:box_values[2]])
+        # Calculate mean depth over the bounding box, ignoring pixels without a measurement
+        depth = np.nanmean(depth_image[box_values[1]:box_values[3], box_values[0]:box_values[2]])
 
         # Project the center point to world coordinates
         center_wp = get_world_position_from_screen_space(x_center, y_center, depth, inv_mat, camera_pos, image_width, image_height)
@@ -115,6 +185,47 @@ def process_image(current_frame, depth_image, detection, inv_mat, camera_pos):
         print(traceback.format_exc())
         return None
 
+def process_boxes(current_frame, depth_image, boxes, inv_mat, camera_pos, annotate=False, depth_statistic="mean"):
+    """
+    process_image for all detections of a frame at once.
+
+    Parameters:
+    - depth_image: The depth frame, or its DepthStatistics when already built.
+    - boxes: (N, 4) int pixel boxes (x1, y1, x2, y2).
+    - depth_statistic: "mean" of the box depth, like process_image, or "median", which
+      ignores background pixels around thin objects.
+
+    Returns:
+    - list: The obj_data dict of every box, in order, None for the boxes that could not
+      be located (empty box, no valid depth in it, or degenerate geometry).
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    if annotate:
+        for box_values in boxes.tolist():
+            draw_detection(current_frame, box_values)
+
+    try:
+        image_height, image_width = current_frame.shape[:2]
+        depths = box_depths(depth_image, boxes, depth_statistic)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            centers, widths, heights = locate_boxes(boxes, depths, inv_mat, camera_pos, image_width, image_height)
+    except Exception as e:
+        # Inputs shared by every box, such as the matrix, are broken
+        print(traceback.format_exc())
+        return [None] * len(boxes)
+
+    # Checked per box, so one bad detection does not drop the others
+    located = (
+        (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+        & np.isfinite(centers).all(axis=1) & np.isfinite(widths) & np.isfinite(heights)
+    )
+    objects = [
+        {'x': x, 'y': y, 'z': z, 'width': width, 'height': height} if ok else None
+        for (x, y, z), width, height, ok in zip(centers.tolist(), widths.tolist(), heights.tolist(), located.tolist())
+    ]
+    print(f"Object positions: {objects}")
+    return objects
+
 def LAB_to_RGB(L, a, b):
     """
     Converts LAB color space to RGB color space.
@@ -184,115 +295,148 @@ def adjust_colors(a, b, flip_colors=False):
 # a, b = adjust_colors(a, b, flip_colors=True)
 
 
-def calculate_background_colors(image, UIScreenCorners,flip_colors):
-    """
-    Calculate the background and text colors for a graphical user interface (GUI) based on the specified corners of the screen.
+# Long side of the downsampled copy panel colors are measured on. Panels span a good part
+# of the frame, so a few hundred pixels hold plenty of samples for a mean color
+COLOR_STATISTICS_SIZE = 256
 
-    Parameters:
-    - image: A NumPy array representing the input image from which colors will be calculated.
-    - UIScreenCorners: A list of dictionaries containing the screen corner coordinates with 'x' and 'y' keys.
-
-    Returns:
-    - gui_back_color: A tuple representing the calculated background color in BGR format.
-    - gui_text_color: A tuple representing the calculated text color in BGR format.
-    - exterior_roi: A NumPy array representing the external region of interest around the screen corners.
-    """
-
-    image = cv2.flip(image, -1)
-    # Extract the coordinates of the screen corners
-    UIScreenCorners = [
-        [UIScreenCorners[0]['x'], UIScreenCorners[0]['y']],
-        [UIScreenCorners[1]['x'], UIScreenCorners[1]['y']],
-        [UIScreenCorners[2]['x'], UIScreenCorners[2]['y']],
-        [UIScreenCorners[3]['x'], UIScreenCorners[3]['y']]
-    ]
-
-    print(f"UIScreenCorners: {UIScreenCorners}")
-
-    height, width = image.shape[:2]
-
-    # Convert normalized coordinates to pixel coordinates
-    pixel_corners = [[int(c[0] * width), int(c[1] * height)] for c in UIScreenCorners]
+# Fraction of the frame width / height the region around a panel extends past it
+EXTERIOR_ROI_OFFSET = 0.05
 
-    xs = [p[0] for p in pixel_corners]
-    ys = [p[1] for p in pixel_corners]
 
-    min_x = max(0, min(xs))
-    max_x = min(width, max(xs))
-    min_y = max(0, min(ys))
-    max_y = min(height, max(ys))
-
-    print(f"min_x: {min_x}, max_x: {max_x}, min_y: {min_y}, max_y: {max_y}")
-    print(f"width: {width}, height: {height}")
-
-    # Define the interior region of interest (ROI) based on the calculated corners
-    interior_roi = image[min_y:max_y, min_x:max_x]
-
-    # Define an offset for the exterior ROI to capture surrounding areas
-    interior_roi_offset = 0.05
-
-    # Calculate the exterior ROI, clamping values to the image dimensions
-    offset_x = int(interior_roi_offset * width)
-    offset_y = int(interior_roi_offset * height)
+class ColorStatistics:
+    """
+    Integral images of a small LAB copy of a frame, giving the mean LAB color of any
+    number of rectangles in one lookup each.
 
-    exterior_min_x = max(0, min_x - offset_x)
-    exterior_max_x = min(width, max_x + offset_x)
-    exterior_min_y = max(0, min_y - offset_y)
-    exterior_max_y = min(height, max_y + offset_y)
+    The copy is a regular sample of the frame, one pixel in the middle of every step x
+    step block. Region means barely move for the sizes of UI panels, and sampling is
+    much cheaper than an area resize, whose cost is that of the full frame.
+    """
 
-    # Extract the exterior ROI
-    exterior_roi = image[exterior_min_y:exterior_max_y, exterior_min_x:exterior_max_x]
+    def __init__(self, image, max_side=COLOR_STATISTICS_SIZE):
+        height, width = image.shape[:2]
+        self.frame_size = (height, width)
+        self.step = max(1, -(-max(height, width) // max_side))
+        self.offset = self.step // 2
+        sample = np.ascontiguousarray(image[self.offset::self.step, self.offset::self.step, :3])
+        self.size = sample.shape[:2]
+        self._integral = cv2.integral(cv2.cvtColor(sample, cv2.COLOR_BGR2LAB), sdepth=cv2.CV_64F)
+
+    def mean_lab(self, rects):
+        """
+        Parameters:
+        - rects: (N, 4) frame pixel rectangles (x1, y1, x2, y2).
+
+        Returns:
+        - numpy.ndarray: (N, 3) mean 8-bit LAB (L, a, b) of each rectangle, over the
+          sampled pixels inside it, at least the one nearest.
+        """
+        rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        small_height, small_width = self.size
+        # Sample i is frame pixel offset + i * step, take those in [x1, x2)
+        first = -(-(rects - self.offset) // self.step)
+        x1 = np.clip(first[:, 0], 0, small_width - 1)
+        y1 = np.clip(first[:, 1], 0, small_height - 1)
+        x2 = np.clip(first[:, 2], x1 + 1, small_width)
+        y2 = np.clip(first[:, 3], y1 + 1, small_height)
+
+        table = self._integral
+        sums = table[y2, x2] - table[y1, x2] - table[y2, x1] + table[y1, x1]
+        return sums / ((x2 - x1) * (y2 - y1))[:, None]
+
+
+def panel_rects(panels, width, height):
+    """
+    Interior and exterior rectangles of UI panels in frame pixels.
 
-    # Calculate the mean colors for the exterior ROI
-    exterior_roi_lab = cv2.cvtColor(exterior_roi[:3], cv2.COLOR_BGR2LAB)
+    The corners are normalized coordinates in the frame rotated by 180 degrees, which is
+    how the client sends them. Instead of flipping the pixels, the rectangles are
+    flipped back into the frame.
 
-    # Calculate the mean color in LAB color space
-    mean_color_lab = np.array(cv2.mean(exterior_roi_lab)[:3])
+    Parameters:
+    - panels: Iterable of panels, each four (x, y) normalized corners.
 
-    #print(f"Mean color LAB: {mean_color_lab}")
+    Returns:
+    - tuple: ((N, 4) interior, (N, 4) exterior) int rectangles (x1, y1, x2, y2).
+    """
+    offset_x = int(EXTERIOR_ROI_OFFSET * width)
+    offset_y = int(EXTERIOR_ROI_OFFSET * height)
+    interiors, exteriors = [], []
+    for corners in panels:
+        # Same truncation and clamping as the pixel corners always had
+        xs = [int(float(corner[0]) * width) for corner in corners]
+        ys = [int(float(corner[1]) * height) for corner in corners]
+        min_x, max_x = max(0, min(xs)), min(width, max(xs))
+        min_y, max_y = max(0, min(ys)), min(height, max(ys))
+        interior = (min_x, min_y, max_x, max_y)
+        exterior = (
+            max(0, min_x - offset_x), max(0, min_y - offset_y),
+            min(width, max_x + offset_x), min(height, max_y + offset_y),
+        )
+        # Rotated rectangles back to the frame's own pixels
+        interiors.append([width - interior[2], height - interior[3], width - interior[0], height - interior[1]])
+        exteriors.append([width - exterior[2], height - exterior[3], width - exterior[0], height - exterior[1]])
+    return np.array(interiors, dtype=np.int64).reshape(-1, 4), np.array(exteriors, dtype=np.int64).reshape(-1, 4)
+
+
+def calculate_panel_colors(image, panels, flip_colors, statistics=None):
+    """
+    Background and text colors for any number of UI panels, from the mean LAB color of
+    the region around each panel, all in one pass over a downsampled frame.
 
-    L, a, b = mean_color_lab
+    Parameters:
+    - image: The BGR frame.
+    - panels: Iterable of panels, each four (x, y) normalized screen corners.
+    - flip_colors: Whether to flip the a and b color channels.
+    - statistics: ColorStatistics of the frame, when it is already built.
 
-    # Scale L for further processing
-    L_scaled = L * (100 / 255)
+    Returns:
+    - list: (gui_back_color, gui_text_color) of every panel, RGB tuples.
+    """
+    height, width = image.shape[:2]
+    _, exteriors = panel_rects(panels, width, height)
+    if len(exteriors) == 0:
+        return []
+    statistics = statistics or ColorStatistics(image)
+    L, a, b = statistics.mean_lab(exteriors).T
 
+    # Darken light backgrounds by delta_L on the 0-100 scale, dark ones go black
     delta_L = 27
-    # Adjust the lightness based on its current value
-    if L_scaled > 50:
-        L_new = max(0, L_scaled - delta_L)
-    else:
-        # If L_mean is less than delta_L, set background to 0 (black)
-        L_new = 0
-
-    # Scale the adjusted L back to the range suitable for LAB
+    L_scaled = L * (100 / 255)
+    L_new = np.where(L_scaled > 50, np.maximum(0, L_scaled - delta_L), 0)
     L_new_scaled = L_new * (255 / 100)
 
-    # Flip the colors if specified
     a, b = adjust_colors(a, b, flip_colors=flip_colors)
 
-    # Create a new LAB color using the adjusted lightness
-    new_color_lab = np.uint8([[[L_new_scaled, a, b]]])
+    # One LAB to BGR conversion for all panels
+    new_color_lab = np.stack([L_new_scaled, a, b], axis=1)[None].astype(np.uint8)
+    new_color_bgr = cv2.cvtColor(new_color_lab, cv2.COLOR_LAB2BGR)[0]
 
-    # Convert the new LAB color back to BGR format
-    new_color_bgr = cv2.cvtColor(new_color_lab, cv2.COLOR_LAB2BGR)
-
-    # Define the GUI background color in BGR format
-    gui_back_color = (
-        int(new_color_bgr[0, 0, 2]),  # R
-        int(new_color_bgr[0, 0, 1]),  # G
-        int(new_color_bgr[0, 0, 0])   # B
-    )
-
-    """ if L_new > 50:
-        # Use a dark text color for light backgrounds
-        gui_text_color = (0, 0, 0)
-    else:
-        # Use a light text color for dark backgrounds
-        gui_text_color = (255, 255, 255) """ # Ficou estranho
-    
     # Use a light text color for all backgrounds
     gui_text_color = (255, 255, 255)
+    return [((int(r), int(g), int(b)), gui_text_color) for b, g, r in new_color_bgr.tolist()]
 
-    # Return the calculated GUI background and text colors, along with the ROI
-    return gui_back_color, gui_text_color, interior_roi
 
+def calculate_background_colors(image, UIScreenCorners, flip_colors):
+    """
+    Calculate the background and text colors for a graphical user interface (GUI) based on the specified corners of the screen.
+
+    Parameters:
+    - image: A NumPy array representing the input image from which colors will be calculated.
+    - UIScreenCorners: The four normalized screen corner coordinates as (x, y) pairs.
+
+    Returns:
+    - gui_back_color: A tuple representing the calculated background color in RGB format.
+    - gui_text_color: A tuple representing the calculated text color in RGB format.
+    - interior_roi: A NumPy array with the region inside the screen corners, rotated by 180 degrees like the corners.
+    """
+    height, width = image.shape[:2]
+    interiors, _ = panel_rects([UIScreenCorners], width, height)
+    gui_back_color, gui_text_color = calculate_panel_colors(image, [UIScreenCorners], flip_colors)[0]
+
+    # Only the panel itself is rotated, not the whole frame
+    x1, y1, x2, y2 = interiors[0].tolist()
+    interior_roi = image[y1:y2, x1:x2]
+    if interior_roi.size:
+        interior_roi = cv2.flip(interior_roi, -1)
+    return gui_back_color, gui_text_color, interior_roi
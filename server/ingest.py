@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import deque
+
+
+class FrameIngestQueue:
+    """
+    Per-connection buffer between the WebSocket receiver and the frame processing.
+
+    Only the newest max_frames frames are kept, older ones are replaced as new frames
+    arrive. Frames older than max_age seconds are dropped before anyone decodes them.
+    """
+
+    def __init__(self, max_frames=1, max_age=1.0):
+        self.max_frames = max_frames
+        self.max_age = max_age
+
+        self._frames = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+        # Smallest (server receive time - client timestamp) seen so far, absorbs the clock skew
+        self._clock_offset = None
+
+        self.received = 0
+        self.processed = 0
+        self.dropped_stale = 0
+        self.dropped_replaced = 0
+        self.queue_age_last = 0.0
+        self.queue_age_max = 0.0
+        self._queue_age_total = 0.0
+
+    def frame_age(self, frame, received_at, now):
+        """
+        Seconds since the client captured the frame. Clients without timestamps are
+        measured from the moment the server received the frame.
+        """
+        if not frame.timestamp:
+            return now - received_at
+        return now - frame.timestamp - self._clock_offset
+
+    def put(self, frame, received_at=None):
+        """
+        Add a frame, dropping it if it is already stale or replacing the oldest pending one.
+
+        Returns:
+        - bool: Whether the frame was queued.
+        """
+        now = time.time() if received_at is None else received_at
+        self.received += 1
+
+        if frame.timestamp:
+            offset = now - frame.timestamp
+            if self._clock_offset is None or offset < self._clock_offset:
+                self._clock_offset = offset
+
+        if self.frame_age(frame, now, now) > self.max_age:
+            self.dropped_stale += 1
+            return False
+
+        self._frames.append((now, frame))
+        while len(self._frames) > self.max_frames:
+            self._frames.popleft()
+            self.dropped_replaced += 1
+
+        self._ready.set()
+        return True
+
+    async def get(self):
+        """
+        Wait for the next frame that is still within the deadline.
+
+        Returns:
+        - The frame, or None once the queue is closed and empty.
+        """
+        # Let the receiver drain whatever arrived while we were busy processing
+        await asyncio.sleep(0)
+
+        while True:
+            now = time.time()
+            while self._frames:
+                received_at, frame = self._frames.popleft()
+                if self.frame_age(frame, received_at, now) > self.max_age:
+                    self.dropped_stale += 1
+                    continue
+
+                queue_age = now - received_at
+                self.queue_age_last = queue_age
+                self.queue_age_max = max(self.queue_age_max, queue_age)
+                self._queue_age_total += queue_age
+                self.processed += 1
+                return frame
+
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped_stale": self.dropped_stale,
+            "dropped_replaced": self.dropped_replaced,
+            "pending": len(self._frames),
+            "queue_age_last_ms": self.queue_age_last * 1000,
+            "queue_age_mean_ms": self._queue_age_total / self.processed * 1000 if self.processed else 0.0,
+            "queue_age_max_ms": self.queue_age_max * 1000,
+        }
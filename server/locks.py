@@ -1,4 +1,8 @@
 import asyncio
+import threading
 
 file_lock = asyncio.Lock()
 websocket_lock = asyncio.Lock()
+
+# The YOLO predictor keeps per-call state and is not safe to share between worker threads
+detector_lock = threading.Lock()
@@ -1,27 +1,42 @@
 from langchain_openai.chat_models import AzureChatOpenAI
 from datetime import datetime
 import traceback
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, WebSocket, HTTPException
 import uvicorn
 from PIL import Image
-import numpy as np
-import cv2
 import io
-from ultralytics import YOLO
 import json
-import base64
 import aiofiles
 import os
 import locks
+import protocol
+import config
 import gpt_get_yolo_classes
 
 import asyncio
-from image_processing import process_image, calculate_background_colors
+import contextlib
+import time
+from session import ClientSession
+from executor import run_blocking, stage_executor
+from frame_graph import FrameGraph, StageStats
+from depth_batching import DepthBatcher
+from device_depth import decode_device_depth, valid_fraction
+from depth_statistics import box_index, box_valid_fractions
+from depth_map import DepthMap
+from debug_stream import DebugStream
+from detections import Detections
+from detector_engine import load_detector
+from preprocessing import FramePyramid
+from class_selection import parse_class_names, select_classes
+from loop_monitor import LoopLagMonitor
+from depth_runtime import CpuDepthConfig, CpuDepthModel, autotune_cpu_model, load_int8_model, resolve_device
+from image_processing import process_boxes, calculate_background_colors
 
 from transformers import pipeline
 from PIL import Image
 
-from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2, input_shape
+from metric_depth.depth_anything_v2.dinov2_layers.attention import set_attention_backend
 import torch
 
 def load_depth_model():
@@ -31,24 +46,94 @@ def load_depth_model():
         'vitl': {'encoder': 'vitl', 'features': 256, 'out_channels': [256, 512, 1024, 1024]}
     }
 
-    encoder = 'vitb' # or 'vits', 'vitb'
+    encoder = config.DEPTH_ENCODER # 'vits', 'vitb' or 'vitl'
     dataset = 'hypersim' # 'hypersim' for indoor model, 'vkitti' for outdoor model
     max_depth = 20 # 20 for indoor model, 80 for outdoor model
 
-    model = DepthAnythingV2(**{**model_configs[encoder], 'max_depth': max_depth}).cuda()
-    model.load_state_dict(torch.load(f'depth_anything_v2_metric_{dataset}_{encoder}.pth', map_location='cpu'))
-    model.eval()
+    model = DepthAnythingV2(**{**model_configs[encoder], 'max_depth': max_depth, 'output_stride': config.DEPTH_OUTPUT_STRIDE})
+    checkpoint = f'depth_anything_v2_metric_{dataset}_{encoder}.pth'
+
+    if config.DEPTH_BACKEND == "onnx":
+        def build_model():
+            model.load_state_dict(torch.load(checkpoint, map_location='cpu'))
+            return model.eval()
+
+        from onnx_depth import OnnxDepthModel, parse_buckets
+        buckets = parse_buckets(config.DEPTH_ONNX_BUCKETS)
+        stride = f'_stride{config.DEPTH_OUTPUT_STRIDE}' if config.DEPTH_OUTPUT_STRIDE != 1 else ''
+        cache_dir = os.path.join(config.DEPTH_ONNX_DIR, f'{dataset}_{encoder}_{max_depth}{stride}')
+        depth_runtime_report.update({"backend": "onnx", "encoder": encoder, "buckets": buckets, "output_stride": config.DEPTH_OUTPUT_STRIDE})
+        print(f"Depth model: {depth_runtime_report}")
+        return OnnxDepthModel.load(build_model, cache_dir, buckets, checkpoint, config.CPU_THREADS)
+
+    device = resolve_device(config.DEPTH_DEVICE)
+    int8 = config.DEPTH_INT8 and device.type == "cpu"
+    if config.DEPTH_INT8 and not int8:
+        print(f"INT8 quantization only runs on the CPU, ignoring DEPTH_INT8 on {device}")
+
+    if int8:
+        model, from_cache = load_int8_model(model, checkpoint, checkpoint.replace('.pth', '.int8.pth'))
+        print(f"INT8 depth encoder {'loaded from cache' if from_cache else 'quantized and cached'}")
+    else:
+        model.load_state_dict(torch.load(checkpoint, map_location='cpu'))
+    model = model.to(device).eval()
+    model.pretrained.set_token_merging(config.DEPTH_TOKEN_MERGE)
+    depth_runtime_report.update({
+        "backend": "torch", "device": str(device), "encoder": encoder, "int8": int8,
+        "token_merge": config.DEPTH_TOKEN_MERGE, "output_stride": config.DEPTH_OUTPUT_STRIDE,
+    })
+
+    if device.type == "cpu":
+        if config.DEPTH_CPU_AUTOTUNE:
+            model, candidates = autotune_cpu_model(
+                model,
+                tuple(int(v) for v in config.DEPTH_CPU_AUTOTUNE_SHAPE.lower().split('x')),
+                # Quantized linears take float32 input
+                allow_bf16=config.DEPTH_CPU_BF16 and not int8,
+                allow_compile=config.DEPTH_CPU_COMPILE,
+            )
+            for candidate in candidates:
+                print(f"Depth CPU candidate: {candidate}")
+            depth_runtime_report["candidates"] = candidates
+        else:
+            model = CpuDepthModel(model, CpuDepthConfig(torch.get_num_threads()))
+        depth_runtime_report["cpu_config"] = model.config.as_dict()
+        # Process wide, so applied once here rather than on every forward
+        torch.set_num_threads(model.config.threads)
+
+    print(f"Depth model: {depth_runtime_report}")
     return model
 
 
+if config.CPU_THREADS:
+    torch.set_num_threads(config.CPU_THREADS)
+if config.CPU_INTEROP_THREADS:
+    torch.set_num_interop_threads(config.CPU_INTEROP_THREADS)
+set_attention_backend(config.DEPTH_ATTENTION)
+
+# How the depth model runs, for /stats
+depth_runtime_report = {}
 
 
 # import danger_analysis
 
 app = FastAPI()
-model = YOLO("yolov8n.pt")
+model, detector_engine = load_detector(
+    "yolov8n.pt", config.YOLO_ENGINE, config.YOLO_IMGSZ, config.YOLO_CACHE_DIR, config.YOLO_EXPORT_SHAPE
+)
+print(f"Detector engine: {detector_engine}")
 
 depth_model = load_depth_model()
+depth_device = depth_model.device if config.DEPTH_BACKEND == "onnx" else next(depth_model.parameters()).device
+# Input shape of the depth model for a frame, ONNX graphs only take their bucket shapes
+depth_input_shape = depth_model.input_shape if config.DEPTH_BACKEND == "onnx" else input_shape
+# The DINOv2 encoder, for its positional embedding cache stats. ONNX graphs have the embedding folded in
+depth_encoder = None if config.DEPTH_BACKEND == "onnx" else getattr(depth_model, "model", depth_model).pretrained
+# Frames from all connections share batched forwards, unless batching is turned off
+depth_service = (
+    DepthBatcher(depth_model, config.DEPTH_MAX_BATCH, config.DEPTH_MAX_WAIT_MS)
+    if config.DEPTH_MAX_BATCH > 1 else depth_model
+)
 
 now = datetime.now()
 
@@ -57,10 +142,22 @@ chat = AzureChatOpenAI(
     openai_api_version="2023-03-15-preview",
     model="gpt-4o"
 )
-classes = gpt_get_yolo_classes.get_classes_from_prompt(chat)
-
 PERSON_CLASS_NAME = "person"
 
+classes = gpt_get_yolo_classes.get_classes_from_prompt(chat, classes=model.names)
+# Sorted class ids handed to YOLO, so every other class is dropped inside its NMS. None
+# detects every class
+detection_classes = select_classes(classes, model.names, PERSON_CLASS_NAME)
+if detection_classes is not None:
+    print(f"Detecting classes: {[model.names[class_id] for class_id in detection_classes]}")
+
+# Session of every open connection, created on connect and dropped on disconnect
+sessions = {}
+
+loop_lag_monitor = LoopLagMonitor(config.LOOP_LAG_INTERVAL)
+stage_stats = StageStats()
+debug_stream = DebugStream(config.DEBUG_STREAM_FPS)
+
 async def write_to_file_async(path, image_data):
     async with locks.file_lock:
         temp_path = path + '.tmp'
@@ -84,129 +181,333 @@ async def websocket_danger_detection(websocket: WebSocket):
 
 
 
+async def receive_frames(websocket: WebSocket, session: ClientSession):
+    """
+    Keep reading from the socket while frames are being processed, so the client never
+    waits on us and stale frames are dropped in the queue instead of piling up in the socket.
+    """
+    wire_protocol = protocol.PROTOCOL_JSON
+    try:
+        while True:
+            raw_message = await websocket.receive()
+            if raw_message['type'] == 'websocket.disconnect':
+                break
+
+            received_at = time.time()
+            try:
+                message = protocol.parse_message(raw_message, wire_protocol)
+            except protocol.ProtocolError as e:
+                print(f"Dropping message: {e}")
+                continue
+            except Exception as e:
+                print(traceback.format_exc())
+                continue
+
+            if isinstance(message, protocol.FrameMessage):
+                if message.type == "color":
+                    session.ingest_queue.put(message, received_at)
+                elif message.type == "depth" and config.USE_DEVICE_DEPTH:
+                    # Kept encoded until its color frame is processed
+                    session.depth_pairing.add(message)
+                continue
+
+            # Clients that support the binary format say so before sending any frame
+            if message and message.get('type') == 'hello':
+                wire_protocol = protocol.negotiate_protocol(message)
+                print(f"Negotiated protocol: {wire_protocol}")
+                async with locks.websocket_lock:
+                    await websocket.send_text(json.dumps({"type": "hello_ack", "protocol": wire_protocol}))
+    except Exception as e:
+        print(traceback.format_exc())
+    finally:
+        session.ingest_queue.close()
+
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    asyncio.create_task(loop_lag_monitor.run())
+
+
+@app.get("/stats")
+async def get_stats():
+    return {
+        "event_loop_lag": loop_lag_monitor.stats(),
+        "stages": stage_stats.stats(),
+        "detector_engine": detector_engine,
+        "depth_runtime": depth_runtime_report,
+        "depth_batching": depth_service.stats() if isinstance(depth_service, DepthBatcher) else None,
+        "pos_embed_cache": depth_encoder.pos_embed_cache_info() if depth_encoder is not None else None,
+        "sessions": {session_id: session.stats() for session_id, session in sessions.items()},
+    }
+
+
+@app.post("/classes")
+async def reload_classes(request: dict):
+    """
+    Change the detected classes without restarting. The body is either
+    {"prompt": "..."} to ask the LLM again, or {"classes": ["person", ...]}.
+    """
+    global classes, detection_classes
+
+    if request.get('prompt'):
+        # A network call, kept off the inference workers so frames are not stuck behind it
+        response = await asyncio.to_thread(gpt_get_yolo_classes.get_classes_from_prompt, chat, request['prompt'], model.names)
+    elif request.get('classes'):
+        response = json.dumps(request['classes'])
+    else:
+        raise HTTPException(status_code=400, detail="Expected a 'prompt' or a 'classes' list")
+
+    try:
+        class_ids, unknown = parse_class_names(response, model.names)
+    except ValueError as e:
+        # Keep detecting the previous classes
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # Frames already being processed finish with the old set
+    classes, detection_classes = response, class_ids
+    return {
+        "classes": [model.names[class_id] for class_id in class_ids],
+        "unknown": unknown,
+    }
+
+
+def infer_depth(pyramid, depth_slot=None):
+    """
+    Depth Anything on the frame's shared depth level.
+
+    Parameters:
+    - depth_slot: The frame's ProducerSlot on the depth batcher, if it holds one.
+
+    Returns:
+    - DepthMap: Depth in meters at the network resolution, mapped to the frame. Box
+      statistics run on it directly, DepthMap.full() upsamples it if ever needed.
+    """
+    image = pyramid.depth_tensor(depth_device)
+    if isinstance(depth_service, DepthBatcher):
+        depth = depth_service.submit(image, depth_slot).result()
+    else:
+        with torch.no_grad():
+            depth = depth_model.forward(image)
+    return DepthMap(depth[0].cpu().numpy(), pyramid.shape)
+
+
+def detect(session, pyramid):
+    """
+    Detect and track on the frame's letterboxed detector level.
+
+    Returns:
+    - Detections: The boxes, mapped back to frame pixels.
+    """
+    image, letterbox = pyramid.detector_input()
+    results = session.track(model, image, detection_classes)
+    return Detections.from_results(results, letterbox)
+
+
+def estimate_depth(session, message, pyramid, depth_slot=None):
+    """
+    Depth for a color frame: the device depth frame sent with it when there is one with
+    enough valid pixels, otherwise Depth Anything.
+
+    Returns:
+    - tuple: (depth in meters, "device" or "model"). Device depth is a frame resolution
+      array, model depth a DepthMap at the network resolution.
+    """
+    if config.USE_DEVICE_DEPTH:
+        device_frame = session.depth_pairing.take(message.frame_id)
+        if device_frame is not None:
+            depth_frame = decode_device_depth(device_frame, pyramid.shape, config.DEVICE_DEPTH_SCALE)
+            if depth_frame is not None and valid_fraction(depth_frame) >= config.DEVICE_DEPTH_MIN_VALID:
+                if depth_slot is not None:
+                    # This frame will not submit, batches need not wait for it
+                    depth_slot.release()
+                return depth_frame, "device"
+
+    # Depth estimation using Depth anything
+    return infer_depth(pyramid, depth_slot), "model"
+
+
+def locate_objects(pyramid, detections, depth, inv_mat, camera_position):
+    """
+    Join of the detection and depth stages: project every detection of an
+    interesting class into world space.
+
+    Returns:
+    - objects_data: The objects to send to the client.
+    - boxes: The detections that were located, for annotating the debug view.
+    - depth: The (depth_frame, source) actually used.
+    """
+    # Initialize list to hold positions of all detected persons
+    objects_data = []
+    boxes = []
+
+    depth_frame, depth_source = depth
+    if len(detections) == 0:
+        return objects_data, boxes, (depth_frame, depth_source)
+
+    box_depth_source = depth_frame
+    if depth_source == "device":
+        # Built once for the frame, shared by the valid fractions and the box depths
+        index = box_index(depth_frame, detections.xyxy, config.DEPTH_BOX_STATISTIC)
+        if box_valid_fractions(depth_frame if index is None else index, detections.xyxy).min() < config.DEVICE_DEPTH_MIN_VALID:
+            # The device has no measurement for some of the objects
+            depth_frame, depth_source = infer_depth(pyramid), "model"
+            box_depth_source = depth_frame
+        elif index is not None and (config.DEPTH_BOX_STATISTIC != "median" or index.histogram_bins):
+            box_depth_source = index
+
+    located = process_boxes(
+        pyramid.image, box_depth_source, detections.xyxy, inv_mat, camera_position,
+        depth_statistic=config.DEPTH_BOX_STATISTIC,
+    )
+    for box_values, track_id, obj_data in zip(detections.xyxy.tolist(), detections.track_ids.tolist(), located):
+        if obj_data is None:
+            continue
+        obj_id = "-1"
+        if track_id >= 0:
+            obj_id = track_id
+
+        objects_data.append({
+            "x": obj_data['x'],
+            "y": obj_data['y'],
+            "z": obj_data['z'],
+            "id": obj_id,
+            "width": obj_data['width'],
+            "height": obj_data['height']
+        })
+        boxes.append(box_values)
+
+    return objects_data, boxes, (depth_frame, depth_source)
+
+
+def process_color_frame(session, message):
+    """
+    Run the whole vision pipeline for one color frame. Blocking, meant to run on the
+    inference executor so the event loop stays free for I/O.
+
+    GUI colors, YOLO and depth only share the decoded image, so they run in parallel on
+    the stage executor and only join where the objects are located.
+
+    Returns:
+    - tuple: (frame_data_message, debug_message), or None if the image could not be
+      decoded. debug_message is None unless a /debug subscriber is due a frame.
+    """
+    ui_screen_corners = message.ui_screen_corners
+    flip_colors = message.flip_colors
+    camera_position = message.camera_position
+    inv_mat = message.inv_mat
+    print("Camera Position: ", camera_position)
+
+    # Decode the image data straight to BGR for OpenCV
+    try:
+        current_frame = protocol.decode_image(message, config.DECODE_MIN_SIZE)
+        if current_frame is None:
+            raise ValueError("Could not decode the JPEG payload.")
+    except Exception as e:
+        print(traceback.format_exc())
+        return None
+
+    # Scaled copies for the detector and the depth model, shared by their stages
+    pyramid = FramePyramid(current_frame, imgsz=config.YOLO_IMGSZ, depth_shape=depth_input_shape)
+
+    # A slot on the depth batcher until this frame submits its depth request or takes
+    # device depth, so batches only wait for frames that can still submit
+    with depth_service.producer() if isinstance(depth_service, DepthBatcher) else contextlib.nullcontext() as depth_slot:
+        graph = (
+            FrameGraph()
+            .stage("gui_colors", lambda: calculate_background_colors(current_frame, ui_screen_corners, flip_colors))
+            # Object detection using YOLO, tracked with the session's own tracker
+            .stage("detections", lambda: detect(session, pyramid))
+            .stage("depth", lambda: estimate_depth(session, message, pyramid, depth_slot))
+            .stage("objects",
+                   lambda detections, depth: locate_objects(pyramid, detections, depth, inv_mat, camera_position),
+                   deps=("detections", "depth"))
+        )
+        stage_results, timings = graph.run(stage_executor)
+    stage_stats.record(timings)
+
+    gui_back_color, gui_text_color, interior_roi = stage_results["gui_colors"]
+    objects_data, boxes, (depth_frame, depth_source) = stage_results["objects"]
+    session.depth_sources[depth_source] += 1
+
+    # Prepare the combined JSON message
+    '''DELETAR: PORQUE NÃO COLOCAR A INFORMAÇÃO DO GPT AQUI:
+    ELE É ASINCRONO EM RELAÇÃO AO RESTO DO PROGRAMA.
+    esperar ele pra mandar nesse mesmo request daria um problema, 
+    já que teria que esperar a resposta da openai pra mandar o resto.
+    vou tentar criar um endpoint novo só pra stream de dados do caso 3, já 
+    que não faz sentido tratar dele aqui'''
+    frame_data_message = {
+        "type": "frame_data",
+        "gui_colors": {
+            "background_color": {
+                "r": gui_back_color[0],
+                "g": gui_back_color[1],
+                "b": gui_back_color[2]
+            },
+            "text_color": {
+                "r": gui_text_color[0],
+                "g": gui_text_color[1],
+                "b": gui_text_color[2]
+            }
+        },
+        "objects": objects_data if objects_data else None  # List or None
+    }
+
+    session.last_result = frame_data_message
+
+    # No annotation or visualization work at all unless someone is watching
+    debug_message = None
+    if debug_stream.should_render(session.session_id):
+        debug_message = debug_stream.render(session.session_id, current_frame, boxes, depth_frame)
+
+    return frame_data_message, debug_message
+
+
+@app.websocket("/debug")
+async def debug_endpoint(websocket: WebSocket):
+    """
+    Streams annotated color and colorized depth frames of every session, throttled to
+    DEBUG_STREAM_FPS, for as long as the socket stays open.
+    """
+    await websocket.accept()
+    debug_stream.subscribe(websocket)
+    try:
+        while True:
+            # Nothing is expected from the viewer, this only notices the disconnect
+            await websocket.receive_text()
+    except Exception as e:
+        pass
+    finally:
+        debug_stream.unsubscribe(websocket)
+
+
 @app.websocket("/")
 async def websocket_endpoint(websocket: WebSocket):
     print("WebSocket connection starting...")
     await websocket.accept()
 
+    session_id = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else str(id(websocket))
+    session = ClientSession(session_id, config.INGEST_MAX_FRAMES, config.INGEST_MAX_AGE)
+    sessions[session_id] = session
+    receiver = asyncio.create_task(receive_frames(websocket, session))
+
     try:
         # loop = asyncio.get_running_loop()
         # asyncio.create_task(danger_analysis.run_analyzer(websocket))
         while True:
 
-            json_message = await websocket.receive_text()
-            message = json.loads(json_message)
-
-            image_type = message.get('type')
-            image_data_base64 = message.get('imageData')
-            data_message = message.get('data')
-            inv_mat_message = message.get('invMat')
-            ui_screen_corners = message.get('UIScreenCorners')
-            flip_colors = message.get('flipColors')
-
-            camera_position = np.array([data_message['x'], data_message['y'], data_message['z']])
-            print("Camera Position: ", camera_position)
-            inv_mat = np.array([
-                [inv_mat_message['e00'], inv_mat_message['e01'], inv_mat_message['e02'], inv_mat_message['e03']],
-                [inv_mat_message['e10'], inv_mat_message['e11'], inv_mat_message['e12'], inv_mat_message['e13']],
-                [inv_mat_message['e20'], inv_mat_message['e21'], inv_mat_message['e22'], inv_mat_message['e23']],
-                [inv_mat_message['e30'], inv_mat_message['e31'], inv_mat_message['e32'], inv_mat_message['e33']]
-            ])
-
-            # Validate essential fields
-            if image_type is None or image_data_base64 is None:
-                print("Missing 'type' or 'imageData' in the received message.")
-                continue
+            message = await session.ingest_queue.get()
+            if message is None:
+                break
 
-            # Decode the image data
-            try:
-                image_data_bytes = base64.b64decode(image_data_base64)
-                image = Image.open(io.BytesIO(image_data_bytes))
-                # asyncio.create_task(write_to_file_async(f"./gpt/captured_image_{now.strftime('%m-%d-%Y-%H-%M-%S')}.jpg", image))
-
-                image_np = np.array(image)
-            except Exception as e:
-                print(traceback.format_exc())
-                continue
-
-            if image_type == "color":
-                # Convert RGB to BGR for OpenCV
-                current_frame = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
-
-                # Calculate GUI colors
-                gui_back_color, gui_text_color, interior_roi = (
-                    calculate_background_colors(
-                        current_frame,
-                        ui_screen_corners,
-                        flip_colors    
-                    ))
-
-                # Initialize list to hold positions of all detected persons
-                objects_data = []
-
-                # Object detection using YOLO
-                results = model.track(current_frame, verbose=False,persist=True)
-
-                # Depth estimation using Depth anything
-                depth_frame = depth_model.infer_image(image_np)
-                
-                for detection in results:
-                    if detection is not None:
-                        detection_json = detection.to_json()
-                        result_json = json.loads(detection_json)
-                        # print("Result JSON: ", result_json) 
-                        # Assuming result_json is a list of detections      
-                        for det in result_json:
-                            print("Det: ", det)
-                            # Check if the detected class is in the list of classes
-                            if(det["name"] in classes):
-                                print("Person detected")
-                                obj_data = process_image(
-                                    current_frame,
-                                    depth_frame,
-                                    det,  # Single detection
-                                    inv_mat,
-                                    camera_position
-                                )
-                                # print("Object Position: ", obj_data)
-                                if obj_data:
-                                    obj_id = "-1"
-                                    if det.get('track_id') is not None:
-                                        obj_id = det['track_id'] 
-                                    
-                                    objects_data.append({
-                                        "x": obj_data['x'],
-                                        "y": obj_data['y'],
-                                        "z": obj_data['z'],
-                                        "id": obj_id,
-                                        "width": obj_data['width'], 
-                                        "height": obj_data['height']
-                                    })
-                            
-
-                # Prepare the combined JSON message
-                '''DELETAR: PORQUE NÃO COLOCAR A INFORMAÇÃO DO GPT AQUI:
-                ELE É ASINCRONO EM RELAÇÃO AO RESTO DO PROGRAMA.
-                esperar ele pra mandar nesse mesmo request daria um problema, 
-                já que teria que esperar a resposta da openai pra mandar o resto.
-                vou tentar criar um endpoint novo só pra stream de dados do caso 3, já 
-                que não faz sentido tratar dele aqui'''
-                frame_data_message = {
-                    "type": "frame_data",
-                    "gui_colors": {
-                        "background_color": {
-                            "r": gui_back_color[0],
-                            "g": gui_back_color[1],
-                            "b": gui_back_color[2]
-                        },
-                        "text_color": {
-                            "r": gui_text_color[0],
-                            "g": gui_text_color[1],
-                            "b": gui_text_color[2]
-                        }
-                    },
-                    "objects": objects_data if objects_data else None  # List or None
-                }
+            if message.type == "color":
+                result = await run_blocking(process_color_frame, session, message)
+                if result is None:
+                    # The frame could not be decoded, repeat the last objects rather than nothing
+                    result = session.stale_result(), None
+                    if result[0] is None:
+                        continue
+                frame_data_message, debug_message = result
 
                 # Send the response back to the client
                 print("frame_data_message")
@@ -217,26 +518,18 @@ async def websocket_endpoint(websocket: WebSocket):
                 except Exception as e:
                     print(traceback.format_exc())
 
-                # Display the color image (optional, useful for debugging)
-
-                width, height = interior_roi.shape[:2]
-                if(width > 0 and height > 0):
-                    cv2.imshow("Color Image", current_frame)
-                # depth_frame_normalized = cv2.normalize(depth_frame, None, 0, 255, cv2.NORM_MINMAX)
-                # depth_frame_normalized = np.uint8(depth_frame_normalized)
-
-                # Normalize depth frame for visualization
-                depth_frame_normalized = cv2.normalize(depth_frame, None, 0, 255, cv2.NORM_MINMAX)
-                depth_frame_normalized = np.uint8(depth_frame_normalized)
-
-                # Display the normalized depth image
-                cv2.imshow("Depth Image", depth_frame_normalized)
-                cv2.waitKey(1)
+                # Annotated color and depth views for /debug subscribers
+                if debug_message is not None:
+                    await debug_stream.publish(debug_message)
 
     except Exception as e:
         print(traceback.format_exc())
     finally:
-        cv2.destroyAllWindows()
+        receiver.cancel()
+        print(f"Session {session_id} closed: {session.stats()}")
+        del sessions[session_id]
+        session.close()
+        debug_stream.forget(session_id)
 
 if __name__ == "__main__":
     port = 8000
@@ -7,9 +7,11 @@
 #   https://github.com/facebookresearch/dino/blob/main/vision_transformer.py
 #   https://github.com/rwightman/pytorch-image-models/tree/master/timm/models/vision_transformer.py
 
+from collections import OrderedDict
 from functools import partial
 import math
 import logging
+import threading
 from typing import Sequence, Tuple, Union, Callable
 
 import torch
@@ -22,6 +24,9 @@ from .dinov2_layers import Mlp, PatchEmbed, SwiGLUFFNFused, MemEffAttention, Nes
 
 logger = logging.getLogger("dinov2")
 
+# Guards the positional embedding caches of all models. Module level so models stay deep-copyable
+_pos_embed_cache_lock = threading.Lock()
+
 
 def named_apply(fn: Callable, module: nn.Module, name="", depth_first=True, include_root=False) -> nn.Module:
     if not depth_first and include_root:
@@ -65,6 +70,7 @@ class DinoVisionTransformer(nn.Module):
         num_register_tokens=0,
         interpolate_antialias=False,
         interpolate_offset=0.1,
+        pos_embed_cache_size=8,
     ):
         """
         Args:
@@ -90,6 +96,7 @@ class DinoVisionTransformer(nn.Module):
             num_register_tokens: (int) number of extra cls tokens (so-called "registers")
             interpolate_antialias: (str) flag to apply anti-aliasing when interpolating positional embeddings
             interpolate_offset: (float) work-around offset to apply when interpolating positional embeddings
+            pos_embed_cache_size: (int) number of interpolated positional embeddings kept, per input size, dtype and device
         """
         super().__init__()
         norm_layer = partial(nn.LayerNorm, eps=1e-6)
@@ -103,6 +110,12 @@ class DinoVisionTransformer(nn.Module):
         self.interpolate_antialias = interpolate_antialias
         self.interpolate_offset = interpolate_offset
 
+        # LRU of interpolated positional embeddings, see interpolate_pos_encoding
+        self.pos_embed_cache_size = pos_embed_cache_size
+        self._pos_embed_cache = OrderedDict()
+        self._pos_embed_cache_weights = None
+        self._pos_embed_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
         self.patch_embed = embed_layer(img_size=img_size, patch_size=patch_size, in_chans=in_chans, embed_dim=embed_dim)
         num_patches = self.patch_embed.num_patches
 
@@ -176,12 +189,78 @@ class DinoVisionTransformer(nn.Module):
             nn.init.normal_(self.register_tokens, std=1e-6)
         named_apply(init_weights_vit_timm, self)
 
+    def set_token_merging(self, ratio):
+        """
+        Merge this fraction (0 to 0.5) of the patch tokens in every block at inference,
+        see dinov2_layers/token_merge.py. 0 disables merging.
+        """
+        if not 0.0 <= ratio <= 0.5:
+            raise ValueError(f"Token merge ratio must be between 0 and 0.5, got {ratio}")
+        for module in self.modules():
+            if isinstance(module, Block):
+                module.merge_ratio = ratio
+                module.num_prefix_tokens = 1 + self.num_register_tokens
+
     def interpolate_pos_encoding(self, x, w, h):
-        previous_dtype = x.dtype
         npatch = x.shape[1] - 1
         N = self.pos_embed.shape[1] - 1
         if npatch == N and w == h:
             return self.pos_embed
+
+        # Recompute when gradients flow into pos_embed, or while tracing / compiling, so the
+        # interpolation stays part of the graph
+        if (
+            not self.pos_embed_cache_size
+            or (torch.is_grad_enabled() and self.pos_embed.requires_grad)
+            or torch.jit.is_tracing()
+            or torch.compiler.is_compiling()
+        ):
+            return self._interpolate_pos_encoding(x, w, h)
+
+        key = (w, h, x.dtype, x.device)
+        # load_state_dict copies in place, which bumps the version, .to() allocates new storage
+        weights = (self.pos_embed._version, self.pos_embed.data_ptr())
+        with _pos_embed_cache_lock:
+            if weights != self._pos_embed_cache_weights:
+                if self._pos_embed_cache:
+                    self._pos_embed_cache_stats["invalidations"] += 1
+                self._pos_embed_cache.clear()
+                self._pos_embed_cache_weights = weights
+            pos_embed = self._pos_embed_cache.get(key)
+            if pos_embed is not None:
+                self._pos_embed_cache.move_to_end(key)
+                self._pos_embed_cache_stats["hits"] += 1
+                return pos_embed
+            self._pos_embed_cache_stats["misses"] += 1
+
+        pos_embed = self._interpolate_pos_encoding(x, w, h).detach()
+        with _pos_embed_cache_lock:
+            if weights == self._pos_embed_cache_weights:
+                self._pos_embed_cache[key] = pos_embed
+                while len(self._pos_embed_cache) > self.pos_embed_cache_size:
+                    self._pos_embed_cache.popitem(last=False)
+        return pos_embed
+
+    def pos_embed_cache_info(self):
+        """
+        Hits, misses and invalidations of the interpolated positional embedding cache,
+        its hit rate, and the (height, width) input sizes it currently holds.
+        """
+        with _pos_embed_cache_lock:
+            stats = dict(self._pos_embed_cache_stats)
+            sizes = [key[:2] for key in self._pos_embed_cache]
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "hit_rate": stats["hits"] / lookups if lookups else None,
+            "size": len(sizes),
+            "max_size": self.pos_embed_cache_size,
+            "entries": sizes,
+        }
+
+    def _interpolate_pos_encoding(self, x, w, h):
+        previous_dtype = x.dtype
+        N = self.pos_embed.shape[1] - 1
         pos_embed = self.pos_embed.float()
         class_pos_embed = pos_embed[:, 0]
         patch_pos_embed = pos_embed[:, 1:]
@@ -10,6 +10,8 @@
 
 import logging
 
+import torch
+import torch.nn.functional as F
 from torch import Tensor
 from torch import nn
 
@@ -17,6 +19,58 @@ from torch import nn
 logger = logging.getLogger("dinov2")
 
 
+# How Attention computes softmax(q k^T) v without xFormers:
+#   "sdpa":    torch's fused scaled_dot_product_attention, never materializes the N x N matrix
+#   "chunked": queries in chunks of ATTENTION_CHUNK_SIZE, memory bounded by chunk x N
+#   "math":    the original explicit q @ k^T, softmax, @ v
+#   "auto":    "sdpa" on CPU and CUDA, which have fused kernels for it. Elsewhere (e.g. MPS)
+#              SDPA may fall back to the full matrix, so "chunked" from CHUNKED_MIN_TOKENS on
+ATTENTION_BACKENDS = ("auto", "sdpa", "chunked", "math")
+
+_attention_backend = "auto"
+ATTENTION_CHUNK_SIZE = 1024
+CHUNKED_MIN_TOKENS = 8192
+
+
+def set_attention_backend(backend: str, chunk_size: int = None, chunked_min_tokens: int = None) -> None:
+    global _attention_backend, ATTENTION_CHUNK_SIZE, CHUNKED_MIN_TOKENS
+    if backend not in ATTENTION_BACKENDS:
+        raise ValueError(f"Unknown attention backend {backend!r}, expected one of {ATTENTION_BACKENDS}")
+    _attention_backend = backend
+    if chunk_size is not None:
+        ATTENTION_CHUNK_SIZE = chunk_size
+    if chunked_min_tokens is not None:
+        CHUNKED_MIN_TOKENS = chunked_min_tokens
+
+
+def get_attention_backend() -> str:
+    return _attention_backend
+
+
+def resolve_attention_backend(num_tokens: int, device_type: str) -> str:
+    if _attention_backend != "auto":
+        return _attention_backend
+    if device_type in ("cpu", "cuda") or num_tokens < CHUNKED_MIN_TOKENS:
+        return "sdpa"
+    return "chunked"
+
+
+def math_attention(q: Tensor, k: Tensor, v: Tensor, scale: float, attn_drop: nn.Module = None) -> Tensor:
+    attn = (q * scale) @ k.transpose(-2, -1)
+    attn = attn.softmax(dim=-1)
+    if attn_drop is not None:
+        attn = attn_drop(attn)
+    return attn @ v
+
+
+def chunked_attention(q: Tensor, k: Tensor, v: Tensor, scale: float, chunk_size: int) -> Tensor:
+    # Softmax is over keys, so every query chunk is exact on its own
+    out = torch.empty_like(q)
+    for start in range(0, q.shape[-2], chunk_size):
+        out[..., start:start + chunk_size, :] = math_attention(q[..., start:start + chunk_size, :], k, v, scale)
+    return out
+
+
 try:
     from xformers.ops import memory_efficient_attention, unbind, fmha
 
@@ -50,13 +104,18 @@ class Attention(nn.Module):
         B, N, C = x.shape
         qkv = self.qkv(x).reshape(B, N, 3, self.num_heads, C // self.num_heads).permute(2, 0, 3, 1, 4)
 
-        q, k, v = qkv[0] * self.scale, qkv[1], qkv[2]
-        attn = q @ k.transpose(-2, -1)
+        q, k, v = qkv[0], qkv[1], qkv[2]
 
-        attn = attn.softmax(dim=-1)
-        attn = self.attn_drop(attn)
+        backend = resolve_attention_backend(N, x.device.type)
+        dropout = self.attn_drop.p if self.training else 0.0
+        if backend == "sdpa":
+            x = F.scaled_dot_product_attention(q, k, v, dropout_p=dropout, scale=self.scale)
+        elif backend == "chunked" and dropout == 0.0:
+            x = chunked_attention(q, k, v, self.scale, ATTENTION_CHUNK_SIZE)
+        else:
+            x = math_attention(q, k, v, self.scale, self.attn_drop)
 
-        x = (attn @ v).transpose(1, 2).reshape(B, N, C)
+        x = x.transpose(1, 2).reshape(B, N, C)
         x = self.proj(x)
         x = self.proj_drop(x)
         return x
@@ -18,6 +18,7 @@ from .attention import Attention, MemEffAttention
 from .drop_path import DropPath
 from .layer_scale import LayerScale
 from .mlp import Mlp
+from .token_merge import merge_prefixed
 
 
 logger = logging.getLogger("dinov2")
@@ -79,6 +80,10 @@ class Block(nn.Module):
 
         self.sample_drop_ratio = drop_path
 
+        # Token merging at inference, set through DinoVisionTransformer.set_token_merging
+        self.merge_ratio = 0.0
+        self.num_prefix_tokens = 1
+
     def forward(self, x: Tensor) -> Tensor:
         def attn_residual_func(x: Tensor) -> Tensor:
             return self.ls1(self.attn(self.norm1(x)))
@@ -101,6 +106,11 @@ class Block(nn.Module):
         elif self.training and self.sample_drop_ratio > 0.0:
             x = x + self.drop_path1(attn_residual_func(x))
             x = x + self.drop_path1(ffn_residual_func(x))  # FIXME: drop_path2
+        elif self.merge_ratio > 0.0:
+            # One matching per block, from its input, for both residual branches
+            merge, unmerge = merge_prefixed(x, self.merge_ratio, self.num_prefix_tokens)
+            x = x + unmerge(attn_residual_func(merge(x)))
+            x = x + unmerge(ffn_residual_func(merge(x)))
         else:
             x = x + attn_residual_func(x)
             x = x + ffn_residual_func(x)
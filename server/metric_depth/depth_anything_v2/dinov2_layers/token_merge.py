@@ -0,0 +1,92 @@
+# Token merging (ToMe), adapted for dense prediction:
+#   Bolya et al., "Token Merging: Your ViT But Faster", ICLR 2023
+#   Bolya & Hoffman, "Token Merging for Fast Stable Diffusion", CVPRW 2023
+#
+# Each block merges its most similar patch tokens before attention and the MLP, and
+# copies the merged results back to every token afterwards. The sequence leaves every
+# block at its full length, so the intermediate outputs DPTHead reshapes into patch
+# grids are unchanged in shape.
+
+from typing import Callable, Tuple
+
+import torch
+from torch import Tensor
+
+
+def _identity(x: Tensor) -> Tensor:
+    return x
+
+
+def bipartite_soft_matching(metric: Tensor, r: int) -> Tuple[Callable[[Tensor], Tensor], Callable[[Tensor], Tensor]]:
+    """
+    Pair up similar tokens: the even tokens (sources) are matched to their most similar
+    odd token (destinations), by cosine similarity of metric, and the r best matched
+    sources are averaged into their destination.
+
+    Parameters:
+    - metric: (B, N, C) features to compare tokens by.
+    - r: How many tokens to remove, at most half of them.
+
+    Returns:
+    - tuple: (merge, unmerge). merge maps (B, N, C) to (B, N - r, C), unmerge maps the
+      result back to (B, N, C), giving every merged source its destination's value.
+    """
+    B, N, _ = metric.shape
+    r = min(r, N // 2)
+    if r <= 0:
+        return _identity, _identity
+
+    with torch.no_grad():
+        metric = metric / metric.norm(dim=-1, keepdim=True)
+        a, b = metric[..., ::2, :], metric[..., 1::2, :]
+        scores = a @ b.transpose(-1, -2)
+
+        node_max, node_idx = scores.max(dim=-1)
+        edge_idx = node_max.argsort(dim=-1, descending=True)[..., None]
+        unm_idx = edge_idx[..., r:, :]  # Sources kept as they are
+        src_idx = edge_idx[..., :r, :]  # Sources merged away
+        dst_idx = node_idx[..., None].gather(dim=-2, index=src_idx)
+
+    def merge(x: Tensor) -> Tensor:
+        src, dst = x[..., ::2, :], x[..., 1::2, :]
+        n, t1, c = src.shape
+        unm = src.gather(dim=-2, index=unm_idx.expand(n, t1 - r, c))
+        src = src.gather(dim=-2, index=src_idx.expand(n, r, c))
+        dst = dst.scatter_reduce(-2, dst_idx.expand(n, r, c), src, reduce="mean")
+        return torch.cat([unm, dst], dim=1)
+
+    def unmerge(x: Tensor) -> Tensor:
+        unm_len = unm_idx.shape[1]
+        unm, dst = x[..., :unm_len, :], x[..., unm_len:, :]
+        n, _, c = unm.shape
+        src = dst.gather(dim=-2, index=dst_idx.expand(n, r, c))
+
+        out = torch.empty(n, N, c, device=x.device, dtype=x.dtype)
+        out[..., 1::2, :] = dst
+        out.scatter_(-2, (2 * unm_idx).expand(n, unm_len, c), unm)
+        out.scatter_(-2, (2 * src_idx).expand(n, r, c), src)
+        return out
+
+    return merge, unmerge
+
+
+def merge_prefixed(x: Tensor, ratio: float, num_prefix_tokens: int) -> Tuple[Callable[[Tensor], Tensor], Callable[[Tensor], Tensor]]:
+    """
+    bipartite_soft_matching over the patch tokens of x only. The class and register
+    tokens in front are never merged.
+
+    Parameters:
+    - ratio: Fraction of the patch tokens to remove, up to 0.5.
+    """
+    patches = x[:, num_prefix_tokens:]
+    merge, unmerge = bipartite_soft_matching(patches, int(patches.shape[1] * ratio))
+    if merge is _identity:
+        return merge, unmerge
+
+    def merge_with_prefix(x: Tensor) -> Tensor:
+        return torch.cat([x[:, :num_prefix_tokens], merge(x[:, num_prefix_tokens:])], dim=1)
+
+    def unmerge_with_prefix(x: Tensor) -> Tensor:
+        return torch.cat([x[:, :num_prefix_tokens], unmerge(x[:, num_prefix_tokens:])], dim=1)
+
+    return merge_with_prefix, unmerge_with_prefix
@@ -1,12 +1,76 @@
+import threading
+from functools import lru_cache
+
 import cv2
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torchvision.transforms import Compose
 
 from .dinov2 import DINOv2
 from .util.blocks import FeatureFusionBlock, _make_scratch
-from .util.transform import Resize, NormalizeImage, PrepareForNet
+from .util.transform import Resize
+
+
+DEVICE = 'cuda' if torch.cuda.is_available() else 'mps' if torch.backends.mps.is_available() else 'cpu'
+
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+_input_buffers = threading.local()
+
+
+@lru_cache(maxsize=16)
+def input_shape(height, width, input_size=518):
+    """
+    (height, width) an image is resized to for the network: the short side at least
+    input_size, keeping the aspect ratio, both sides multiples of 14.
+    """
+    resize = Resize(
+        width=input_size,
+        height=input_size,
+        resize_target=False,
+        keep_aspect_ratio=True,
+        ensure_multiple_of=14,
+        resize_method='lower_bound',
+    )
+    resized_width, resized_height = resize.get_size(width, height)
+    return int(resized_height), int(resized_width)
+
+
+@lru_cache(maxsize=8)
+def _normalization(device):
+    # On the 0-255 scale, so uint8 pixels need no separate division
+    mean = torch.tensor(MEAN, device=device).view(3, 1, 1) * 255
+    std = torch.tensor(STD, device=device).view(3, 1, 1) * 255
+    return mean, std
+
+
+def bgr_to_input(image, device=DEVICE):
+    """
+    Normalize a BGR uint8 image that is already at network resolution into a
+    (1, 3, H, W) float32 RGB tensor.
+
+    The tensor is preallocated once per thread, resolution and device and reused, so it
+    is only valid until the same thread prepares the next image of that resolution.
+    """
+    height, width = image.shape[:2]
+    device = torch.device(device)
+    
+    buffers = getattr(_input_buffers, 'buffers', None)
+    if buffers is None:
+        buffers = _input_buffers.buffers = {}
+    key = (height, width, device)
+    if key not in buffers:
+        buffers[key] = torch.empty((1, 3, height, width), dtype=torch.float32, device=device)
+    out = buffers[key]
+    
+    # Only the uint8 image crosses to the device, the BGR to RGB swap happens in the copy
+    source = torch.from_numpy(image).to(device, non_blocking=True)
+    for channel in range(3):
+        out[0, channel].copy_(source[:, :, 2 - channel])
+    
+    mean, std = _normalization(device)
+    return out.sub_(mean).div_(std)
 
 
 def _make_fusion_block(features, use_bn, size=None):
@@ -35,6 +99,13 @@ class ConvBlock(nn.Module):
         return self.conv_block(x)
 
 
+def output_size(patch_h, patch_w, output_stride=1):
+    """
+    (height, width) of the depth map for a patch_h x patch_w grid of 14 pixel patches.
+    """
+    return max(1, round(patch_h * 14 / output_stride)), max(1, round(patch_w * 14 / output_stride))
+
+
 class DPTHead(nn.Module):
     def __init__(
         self, 
@@ -42,11 +113,15 @@ class DPTHead(nn.Module):
         features=256, 
         use_bn=False, 
         out_channels=[256, 512, 1024, 1024], 
-        use_clstoken=False
+        use_clstoken=False,
+        output_stride=1
     ):
         super(DPTHead, self).__init__()
         
         self.use_clstoken = use_clstoken
+        # The depth map is 1/output_stride of the input resolution per side. Above 1 the
+        # final upsample is skipped and the last convolutions run at the reduced size
+        self.output_stride = output_stride
         
         self.projects = nn.ModuleList([
             nn.Conv2d(
@@ -140,6 +215,15 @@ class DPTHead(nn.Module):
         path_4 = self.scratch.refinenet4(layer_4_rn, size=layer_3_rn.shape[2:])        
         path_3 = self.scratch.refinenet3(path_4, layer_3_rn, size=layer_2_rn.shape[2:])
         path_2 = self.scratch.refinenet2(path_3, layer_2_rn, size=layer_1_rn.shape[2:])
+        
+        if self.output_stride > 1:
+            # Let the last fusion block resample straight to the output size, which is below
+            # its usual 2x upsample, and run the output convolutions there
+            path_1 = self.scratch.refinenet1(path_2, layer_1_rn, size=output_size(patch_h, patch_w, self.output_stride))
+            out = self.scratch.output_conv1(path_1)
+            out = self.scratch.output_conv2(out)
+            return out
+        
         path_1 = self.scratch.refinenet1(path_2, layer_1_rn)
         
         out = self.scratch.output_conv1(path_1)
@@ -157,7 +241,8 @@ class DepthAnythingV2(nn.Module):
         out_channels=[256, 512, 1024, 1024], 
         use_bn=False, 
         use_clstoken=False,
-        max_depth=20.0
+        max_depth=20.0,
+        output_stride=1
     ):
         super(DepthAnythingV2, self).__init__()
         
@@ -173,7 +258,7 @@ class DepthAnythingV2(nn.Module):
         self.encoder = encoder
         self.pretrained = DINOv2(model_name=encoder)
         
-        self.depth_head = DPTHead(self.pretrained.embed_dim, features, use_bn, out_channels=out_channels, use_clstoken=use_clstoken)
+        self.depth_head = DPTHead(self.pretrained.embed_dim, features, use_bn, out_channels=out_channels, use_clstoken=use_clstoken, output_stride=output_stride)
     
     def forward(self, x):
         patch_h, patch_w = x.shape[-2] // 14, x.shape[-1] // 14
@@ -194,29 +279,10 @@ class DepthAnythingV2(nn.Module):
         
         return depth.cpu().numpy()
     
-    def image2tensor(self, raw_image, input_size=518):        
-        transform = Compose([
-            Resize(
-                width=input_size,
-                height=input_size,
-                resize_target=False,
-                keep_aspect_ratio=True,
-                ensure_multiple_of=14,
-                resize_method='lower_bound',
-                image_interpolation_method=cv2.INTER_CUBIC,
-            ),
-            NormalizeImage(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-            PrepareForNet(),
-        ])
-        
+    def image2tensor(self, raw_image, input_size=518):
         h, w = raw_image.shape[:2]
         
-        image = cv2.cvtColor(raw_image, cv2.COLOR_BGR2RGB) / 255.0
-        
-        image = transform({'image': image})['image']
-        image = torch.from_numpy(image).unsqueeze(0)
-        
-        DEVICE = 'cuda' if torch.cuda.is_available() else 'mps' if torch.backends.mps.is_available() else 'cpu'
-        image = image.to(DEVICE)
+        height, width = input_shape(h, w, input_size)
+        image = cv2.resize(raw_image, (width, height), interpolation=cv2.INTER_CUBIC)
         
-        return image, (h, w)
+        return bgr_to_input(image), (h, w)
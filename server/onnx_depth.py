@@ -0,0 +1,134 @@
+import inspect
+import math
+import os
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+import torch
+import torch.nn.functional as F
+
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2, bgr_to_input, input_shape
+
+# Network input (height, width) buckets: 16:9 and 4:3 landscape, square and 16:9 portrait
+DEFAULT_BUCKETS = ((518, 924), (518, 686), (518, 518), (924, 518))
+
+
+def parse_buckets(text):
+    """
+    Parse "518x924,518x686" into ((518, 924), (518, 686)).
+    """
+    buckets = []
+    for bucket in text.split(','):
+        height, width = (int(v) for v in bucket.strip().lower().split('x'))
+        if height % 14 or width % 14:
+            raise ValueError(f"Bucket {bucket} is not a multiple of the 14 pixel patch size")
+        buckets.append((height, width))
+    return tuple(buckets)
+
+
+def nearest_bucket(height, width, buckets):
+    """
+    The bucket closest in aspect ratio, then in size, to a (height, width) input, so
+    frames are stretched as little as possible.
+    """
+    def distance(bucket):
+        aspect = abs(math.log((bucket[1] / bucket[0]) / (width / height)))
+        scale = abs(math.log((bucket[0] * bucket[1]) / (height * width)))
+        return (round(aspect, 3), scale)
+    return min(buckets, key=distance)
+
+
+def export_bucket(model, bucket, path):
+    """
+    Export the model for one input shape. The batch dimension stays dynamic, the spatial
+    size is fixed, which lets position embedding interpolation fold into constants.
+    """
+    height, width = bucket
+    dummy = torch.randn(1, 3, height, width)
+    # The TorchScript exporter. torch 2.5 added the dynamo switch, later versions default it on
+    options = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+    torch.onnx.export(
+        model, dummy, path,
+        input_names=['image'], output_names=['depth'],
+        dynamic_axes={'image': {0: 'batch'}, 'depth': {0: 'batch'}},
+        opset_version=17,
+        **options,
+    )
+
+
+class OnnxDepthModel:
+    """
+    DepthAnythingV2 served through ONNX Runtime on the CPU, one graph per input shape
+    bucket. Has the forward, image2tensor and infer_image of DepthAnythingV2, so it can
+    be used in its place, including behind DepthBatcher.
+    """
+
+    device = torch.device('cpu')
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.buckets = tuple(sessions)
+
+    @classmethod
+    def load(cls, build_model, cache_dir, buckets=DEFAULT_BUCKETS, checkpoint_path=None, threads=0):
+        """
+        Load the ONNX graph of every bucket from cache_dir, exporting the missing or stale
+        ones from the PyTorch model first.
+
+        Parameters:
+        - build_model: Returns the DepthAnythingV2 to export, in eval mode. Only called
+          when a graph has to be (re)exported.
+        - cache_dir: Where the graphs are stored, one file per bucket.
+        - checkpoint_path: Graphs older than this file are exported again.
+        - threads: ONNX Runtime intra-op threads, 0 for its default.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+
+        model = None
+        sessions = {}
+        for bucket in buckets:
+            path = os.path.join(cache_dir, f"depth_{bucket[0]}x{bucket[1]}.onnx")
+            stale = checkpoint_path is not None and os.path.exists(path) and \
+                os.path.getmtime(path) < os.path.getmtime(checkpoint_path)
+            if not os.path.exists(path) or stale:
+                if model is None:
+                    model = build_model()
+                print(f"Exporting depth model for {bucket[0]}x{bucket[1]} to {path}")
+                export_bucket(model, bucket, path)
+            sessions[bucket] = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        return cls(sessions)
+
+    def forward(self, x):
+        """
+        Run a (B, 3, H, W) batch. Inputs that do not match a bucket are resized to the
+        nearest one, the depth comes back at the bucket resolution.
+        """
+        bucket = tuple(x.shape[-2:])
+        if bucket not in self.sessions:
+            bucket = nearest_bucket(*bucket, self.buckets)
+            x = F.interpolate(x, bucket, mode="bilinear", align_corners=False)
+        image = x.detach().cpu().numpy()
+        depth = self.sessions[bucket].run(None, {'image': np.ascontiguousarray(image, dtype=np.float32)})[0]
+        return torch.from_numpy(depth)
+
+    __call__ = forward
+
+    def input_shape(self, height, width, input_size=518):
+        """
+        The bucket a (height, width) frame is resized to, so callers resize it once,
+        straight to a shape forward runs as is.
+        """
+        return nearest_bucket(*input_shape(height, width, input_size), self.buckets)
+
+    def image2tensor(self, raw_image, input_size=518):
+        h, w = raw_image.shape[:2]
+        height, width = self.input_shape(h, w, input_size)
+        image = cv2.resize(raw_image, (width, height), interpolation=cv2.INTER_CUBIC)
+        return bgr_to_input(image, self.device), (h, w)
+
+    infer_image = DepthAnythingV2.infer_image
@@ -0,0 +1,116 @@
+import threading
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from metric_depth.depth_anything_v2.dpt import bgr_to_input, input_shape
+
+YOLO_IMGSZ = 640
+YOLO_STRIDE = 32
+LETTERBOX_COLOR = (114, 114, 114)
+
+DEPTH_INPUT_SIZE = 518
+
+
+class Letterbox:
+    """
+    The resize and padding that fit a frame into the detector input, and the inverse
+    mapping of boxes back to frame pixels. Same geometry as ultralytics' LetterBox with
+    auto=True, so the predictor's own letterbox leaves the image as it is.
+    """
+
+    __slots__ = ("frame_size", "resized_size", "scale_x", "scale_y", "left", "top", "right", "bottom")
+
+    def __init__(self, height, width, imgsz=YOLO_IMGSZ, stride=YOLO_STRIDE):
+        ratio = min(imgsz / height, imgsz / width)
+        resized_width, resized_height = int(round(width * ratio)), int(round(height * ratio))
+        # Pad to the next multiple of the stride only, not to a square
+        pad_x = ((imgsz - resized_width) % stride) / 2
+        pad_y = ((imgsz - resized_height) % stride) / 2
+
+        self.frame_size = (height, width)
+        self.resized_size = (resized_height, resized_width)
+        # The actual per-axis scale after rounding, so the inverse mapping is exact
+        self.scale_x = resized_width / width
+        self.scale_y = resized_height / height
+        self.left, self.right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+        self.top, self.bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+
+    def to_frame(self, xyxy):
+        """
+        Map (N, 4) boxes from letterboxed coordinates back to frame pixels.
+        """
+        boxes = np.asarray(xyxy, dtype=np.float32) - (self.left, self.top, self.left, self.top)
+        boxes /= (self.scale_x, self.scale_y, self.scale_x, self.scale_y)
+        height, width = self.frame_size
+        np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+        np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+        return boxes
+
+
+@lru_cache(maxsize=16)
+def letterbox_for(height, width, imgsz=YOLO_IMGSZ, stride=YOLO_STRIDE):
+    return Letterbox(height, width, imgsz, stride)
+
+
+class FramePyramid:
+    """
+    The scaled copies of one color frame the models need, built lazily and at most once,
+    in uint8, replacing the float copies image2tensor and the predictor each made.
+    The resize parameters are cached per frame resolution.
+
+    Stages running in parallel share one pyramid, levels are built under a lock.
+    """
+
+    def __init__(self, image, depth_input_size=DEPTH_INPUT_SIZE, imgsz=YOLO_IMGSZ, depth_shape=input_shape):
+        """
+        Parameters:
+        - depth_shape: Maps the frame (height, width, depth_input_size) to the depth model's
+          input shape. The ONNX backend passes its own, which picks the bucket.
+        """
+        self.image = image
+        self.shape = image.shape[:2]
+        self.depth_input_size = depth_input_size
+        self.depth_shape = depth_shape
+        self.imgsz = imgsz
+        self._depth_level = None
+        self._detector_level = None
+        self._lock = threading.Lock()
+
+    def depth_level(self):
+        """
+        Returns:
+        - numpy.ndarray: The BGR uint8 frame at the depth model's input resolution.
+        """
+        with self._lock:
+            if self._depth_level is None:
+                height, width = self.depth_shape(*self.shape, self.depth_input_size)
+                self._depth_level = cv2.resize(self.image, (width, height), interpolation=cv2.INTER_CUBIC)
+            return self._depth_level
+
+    def detector_input(self):
+        """
+        Returns:
+        - tuple: (image, letterbox) with the letterboxed BGR uint8 detector input and the
+          Letterbox to map its boxes back to the frame.
+        """
+        letterbox = letterbox_for(*self.shape, self.imgsz)
+        with self._lock:
+            if self._detector_level is None:
+                source = self.image
+                resized_height, resized_width = letterbox.resized_size
+                if source.shape[:2] != letterbox.resized_size:
+                    source = cv2.resize(source, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR)
+                self._detector_level = cv2.copyMakeBorder(
+                    source, letterbox.top, letterbox.bottom, letterbox.left, letterbox.right,
+                    cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR
+                )
+            return self._detector_level, letterbox
+
+    def depth_tensor(self, device):
+        """
+        The normalized (1, 3, H, W) float32 RGB depth model input, in the calling
+        thread's reusable input tensor (see bgr_to_input).
+        """
+        return bgr_to_input(self.depth_level(), device)
@@ -0,0 +1,292 @@
+import base64
+import json
+import struct
+
+import cv2
+import numpy as np
+
+# Binary frame format (version 1), little-endian:
+#
+#   offset  size  field
+#   0       4     magic b"NTTF"
+#   4       1     version
+#   5       1     message type (0 = color, 1 = depth)
+#   6       2     flags (bit 0 = flipColors)
+#   8       4     frame id
+#   12      8     client timestamp in seconds (float64)
+#   20      12    camera position x, y, z (float32)
+#   32      64    inverse view-projection matrix, row major e00..e33 (float32)
+#   96      32    UI screen corners, 4 x (x, y) normalized (float32)
+#   128     ...   raw image bytes (JPEG for color, PNG for device depth)
+#
+# The client asks for it with a {"type": "hello", "protocols": [...]} text
+# message right after connecting. Clients that never send a hello keep
+# talking the old JSON + base64 format, and their binary messages are
+# refused. JSON frames are accepted on either protocol, and responses are
+# JSON text on both.
+
+MAGIC = b"NTTF"
+BINARY_VERSION = 1
+
+PROTOCOL_BINARY = "binary-v1"
+PROTOCOL_JSON = "json"
+SUPPORTED_PROTOCOLS = (PROTOCOL_BINARY, PROTOCOL_JSON)
+
+HEADER_FORMAT = "<4sBBHId3f16f8f"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+_PREFIX_FORMAT = "<4sBBHId"
+_PREFIX_SIZE = struct.calcsize(_PREFIX_FORMAT)
+_CAMERA_OFFSET = _PREFIX_SIZE
+_MATRIX_OFFSET = _CAMERA_OFFSET + 3 * 4
+_CORNERS_OFFSET = _MATRIX_OFFSET + 16 * 4
+
+MESSAGE_TYPES = {0: "color", 1: "depth"}
+MESSAGE_TYPE_IDS = {name: type_id for type_id, name in MESSAGE_TYPES.items()}
+
+FLAG_FLIP_COLORS = 1 << 0
+
+# Start-of-frame markers carrying the image size (every SOFn except DHT, JPG and DAC)
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+class FrameMessage:
+    """
+    A single color or depth frame received from a headset, independent of the
+    wire format it arrived in. The image stays encoded until decode_image is called,
+    and for JSON messages even the base64 decoding waits until the payload is needed.
+    """
+
+    __slots__ = (
+        "type",
+        "frame_id",
+        "timestamp",
+        "camera_position",
+        "inv_mat",
+        "ui_screen_corners",
+        "flip_colors",
+        "image_bytes",
+        "image_base64",
+    )
+
+    def __init__(self, type, frame_id, timestamp, camera_position, inv_mat, ui_screen_corners, flip_colors, image_bytes, image_base64=None):
+        self.type = type
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.camera_position = camera_position
+        self.inv_mat = inv_mat
+        self.ui_screen_corners = ui_screen_corners
+        self.flip_colors = flip_colors
+        self.image_bytes = image_bytes
+        self.image_base64 = image_base64
+
+    def payload(self):
+        """
+        The raw encoded image bytes, base64-decoding them on first use for JSON messages.
+        """
+        if self.image_bytes is None:
+            self.image_bytes = base64.b64decode(self.image_base64)
+            self.image_base64 = None
+        return self.image_bytes
+
+
+def negotiate_protocol(hello):
+    """
+    Pick the wire format for a connection from the client's hello message.
+
+    Parameters:
+    - hello: The parsed hello message, with an optional 'protocols' list in order of preference.
+
+    Returns:
+    - str: The first protocol both sides support, falling back to JSON.
+    """
+    for protocol in hello.get('protocols') or ():
+        if protocol in SUPPORTED_PROTOCOLS:
+            return protocol
+    return PROTOCOL_JSON
+
+
+def parse_json_message(message):
+    """
+    Build a FrameMessage from a message in the legacy JSON format.
+
+    Parameters:
+    - message: The dictionary obtained from json.loads on the received text.
+
+    Returns:
+    - FrameMessage: The frame, with the base64 payload still encoded.
+    """
+    image_type = message.get('type')
+    image_data_base64 = message.get('imageData')
+    if image_type is None or image_data_base64 is None:
+        raise ProtocolError("Missing 'type' or 'imageData' in the received message.")
+
+    data_message = message['data']
+    inv_mat_message = message['invMat']
+    camera_position = np.array([data_message['x'], data_message['y'], data_message['z']])
+    inv_mat = np.array([
+        [inv_mat_message['e00'], inv_mat_message['e01'], inv_mat_message['e02'], inv_mat_message['e03']],
+        [inv_mat_message['e10'], inv_mat_message['e11'], inv_mat_message['e12'], inv_mat_message['e13']],
+        [inv_mat_message['e20'], inv_mat_message['e21'], inv_mat_message['e22'], inv_mat_message['e23']],
+        [inv_mat_message['e30'], inv_mat_message['e31'], inv_mat_message['e32'], inv_mat_message['e33']]
+    ])
+    ui_screen_corners = [[corner['x'], corner['y']] for corner in message.get('UIScreenCorners') or ()]
+
+    return FrameMessage(
+        type=image_type,
+        frame_id=message.get('frameId'),
+        timestamp=message.get('timestamp'),
+        camera_position=camera_position,
+        inv_mat=inv_mat,
+        ui_screen_corners=ui_screen_corners,
+        flip_colors=bool(message.get('flipColors')),
+        image_bytes=None,
+        image_base64=image_data_base64,
+    )
+
+
+def parse_binary_message(data):
+    """
+    Build a FrameMessage from a binary frame. The matrix, camera position and UI
+    corners are numpy views into the received buffer, nothing is copied.
+
+    Parameters:
+    - data: The bytes received from the WebSocket.
+
+    Returns:
+    - FrameMessage: The frame, with image_bytes being a memoryview of the JPEG payload.
+    """
+    if len(data) < HEADER_SIZE:
+        raise ProtocolError(f"Binary frame too short: {len(data)} bytes")
+
+    magic, version, type_id, flags, frame_id, timestamp = struct.unpack_from(_PREFIX_FORMAT, data)
+    if magic != MAGIC:
+        raise ProtocolError(f"Bad magic in binary frame: {magic!r}")
+    if version != BINARY_VERSION:
+        raise ProtocolError(f"Unsupported binary frame version: {version}")
+    if type_id not in MESSAGE_TYPES:
+        raise ProtocolError(f"Unknown binary frame type: {type_id}")
+
+    return FrameMessage(
+        type=MESSAGE_TYPES[type_id],
+        frame_id=frame_id,
+        timestamp=timestamp,
+        camera_position=np.frombuffer(data, dtype='<f4', count=3, offset=_CAMERA_OFFSET),
+        inv_mat=np.frombuffer(data, dtype='<f4', count=16, offset=_MATRIX_OFFSET).reshape(4, 4),
+        ui_screen_corners=np.frombuffer(data, dtype='<f4', count=8, offset=_CORNERS_OFFSET).reshape(4, 2),
+        flip_colors=bool(flags & FLAG_FLIP_COLORS),
+        image_bytes=memoryview(data)[HEADER_SIZE:],
+    )
+
+
+def encode_binary_message(image_type, frame_id, timestamp, camera_position, inv_mat, ui_screen_corners, flip_colors, image_bytes):
+    """
+    Serialize a frame into the binary format. The server never sends frames,
+    this is the reference encoder for clients, tests and benchmarks.
+    """
+    flags = FLAG_FLIP_COLORS if flip_colors else 0
+    header = struct.pack(
+        HEADER_FORMAT,
+        MAGIC,
+        BINARY_VERSION,
+        MESSAGE_TYPE_IDS[image_type],
+        flags,
+        frame_id,
+        timestamp,
+        *np.asarray(camera_position, dtype=np.float32).ravel(),
+        *np.asarray(inv_mat, dtype=np.float32).ravel(),
+        *np.asarray(ui_screen_corners, dtype=np.float32).ravel(),
+    )
+    return header + bytes(image_bytes)
+
+
+def jpeg_size(data):
+    """
+    Read the dimensions from a JPEG's start-of-frame header without decoding it.
+
+    Returns:
+    - tuple: (height, width), or None if data is not a JPEG.
+    """
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length
+            i += 2
+            continue
+        length, = struct.unpack_from(">H", data, i + 2)
+        if marker in _SOF_MARKERS:
+            if i + 9 > len(data):
+                return None
+            return struct.unpack_from(">HH", data, i + 5)
+        i += 2 + length
+    return None
+
+
+def decode_image(frame, min_size=0):
+    """
+    Decode the JPEG payload of a frame.
+
+    Parameters:
+    - frame: The color FrameMessage.
+    - min_size: Smallest acceptable short side. When the JPEG is at least 2, 4 or 8 times
+      larger, it is decoded straight to that fraction of its size with libjpeg's DCT
+      scaling, which is much cheaper than decoding it fully and resizing. 0 always
+      decodes at full resolution.
+
+    Returns:
+    - numpy.ndarray: The image in BGR order, or None if the payload could not be decoded.
+    """
+    payload = frame.payload()
+    buffer = np.frombuffer(payload, dtype=np.uint8)
+
+    flags = cv2.IMREAD_COLOR
+    size = jpeg_size(payload) if min_size else None
+    if size is not None:
+        for factor, reduced_flags in _REDUCED_DECODE_FLAGS:
+            if min(size) // factor >= min_size:
+                flags = reduced_flags
+                break
+    return cv2.imdecode(buffer, flags)
+
+
+def parse_message(message, wire_protocol=PROTOCOL_BINARY):
+    """
+    Parse a raw message from Starlette's websocket.receive().
+
+    Parameters:
+    - wire_protocol: The protocol negotiated for the connection. Binary frames are
+      refused with a ProtocolError unless it is PROTOCOL_BINARY.
+
+    Returns:
+    - FrameMessage for frames, the parsed dictionary for any other JSON message
+      (e.g. a hello), or None for non-data events.
+    """
+    if message.get('bytes') is not None:
+        if wire_protocol != PROTOCOL_BINARY:
+            raise ProtocolError(f"Binary frame on a {wire_protocol} connection, send a hello for {PROTOCOL_BINARY} first")
+        return parse_binary_message(message['bytes'])
+    if message.get('text') is not None:
+        parsed = json.loads(message['text'])
+        if parsed.get('type') in MESSAGE_TYPE_IDS:
+            return parse_json_message(parsed)
+        return parsed
+    return None
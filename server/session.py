@@ -0,0 +1,120 @@
+import time
+from collections import Counter
+
+import torch
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+
+import locks
+from ingest import FrameIngestQueue
+from device_depth import DepthPairing
+
+TRACKER_CONFIG = "bytetrack.yaml"
+
+
+class SessionTracker(BYTETracker):
+    """
+    ByteTrack numbering its tracks with its own counter. ultralytics numbers them from a
+    class-level counter shared by every tracker, and zeroes it whenever a tracker is
+    created or reset, so a headset connecting or leaving would renumber the others.
+    """
+
+    def reset_id(self):
+        self._track_count = 0
+
+    def _next_id(self):
+        self._track_count += 1
+        return self._track_count
+
+    def init_track(self, dets, scores, cls, img=None):
+        tracks = super().init_track(dets, scores, cls, img)
+        for track in tracks:
+            # Shadows the static STrack.next_id used by activate and re_activate
+            track.next_id = self._next_id
+        return tracks
+
+
+def make_tracker(frame_rate=30):
+    tracker_args = IterableSimpleNamespace(**yaml_load(check_yaml(TRACKER_CONFIG)))
+    return SessionTracker(args=tracker_args, frame_rate=frame_rate)
+
+
+class ClientSession:
+    """
+    Everything that belongs to one headset connection: its ingest queue, its own
+    ByteTrack state, its pending device depth frames and its counters. The detector
+    weights are shared by all sessions, only the tracking state is per session, so
+    track IDs never leak between headsets.
+    """
+
+    def __init__(self, session_id, max_frames=1, max_age=1.0):
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.ingest_queue = FrameIngestQueue(max_frames, max_age)
+        self.depth_pairing = DepthPairing()
+        self.tracker = make_tracker()
+        self.frame_count = 0
+        # Last frame_data message sent, answered again for frames that could not be processed
+        self.last_result = None
+        self.stale_results = 0
+        # How many frames used device depth versus Depth Anything
+        self.depth_sources = Counter()
+
+    def track(self, detector, current_frame, classes=None):
+        """
+        Detect with the shared model and associate the detections with this session's tracks.
+        Equivalent to detector.track(current_frame, persist=True), but without the tracker
+        living on the shared predictor.
+
+        Parameters:
+        - detector: The shared YOLO model.
+        - current_frame: The BGR frame.
+        - classes: Class ids to keep, filtered inside the detector's NMS. None keeps all.
+
+        Returns:
+        - list: The ultralytics Results, with track IDs on the boxes that were matched.
+        """
+        # The predictor is shared between sessions and is not thread safe
+        with locks.detector_lock:
+            results = detector.predict(current_frame, classes=classes, verbose=False)
+
+        # Same association as ultralytics' own on_predict_postprocess_end tracking callback
+        for i, result in enumerate(results):
+            det = result.boxes.cpu().numpy()
+            if len(det) == 0:
+                continue
+            tracks = self.tracker.update(det, result.orig_img)
+            if len(tracks) == 0:
+                continue
+            idx = tracks[:, -1].astype(int)
+            results[i] = result[idx]
+            results[i].update(boxes=torch.as_tensor(tracks[:, :-1]))
+
+        self.frame_count += 1
+        return results
+
+    def stale_result(self):
+        """
+        The last frame_data message marked as stale, to answer a frame that could not be
+        processed, or None before the first result.
+        """
+        if self.last_result is None:
+            return None
+        self.stale_results += 1
+        return {**self.last_result, "stale": True}
+
+    def stats(self):
+        return {
+            "frames": self.frame_count,
+            "stale_results": self.stale_results,
+            "connected_for_s": time.time() - self.created_at,
+            "ingest": self.ingest_queue.stats(),
+            "device_depth": self.depth_pairing.stats(),
+            "depth_sources": dict(self.depth_sources),
+        }
+
+    def close(self):
+        self.ingest_queue.close()
+        self.tracker.reset()
+        self.last_result = None
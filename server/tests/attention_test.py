@@ -0,0 +1,38 @@
+import pytest
+import torch
+
+from metric_depth.depth_anything_v2.dinov2_layers import attention
+from metric_depth.depth_anything_v2.dinov2_layers.attention import MemEffAttention
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    saved = attention.get_attention_backend(), attention.ATTENTION_CHUNK_SIZE, attention.CHUNKED_MIN_TOKENS
+    yield
+    backend, chunk_size, chunked_min_tokens = saved
+    attention.set_attention_backend(backend, chunk_size=chunk_size, chunked_min_tokens=chunked_min_tokens)
+
+
+@pytest.mark.parametrize("tokens", [1, 37, 1370])
+def test_backends_match_math_attention(tokens):
+    torch.manual_seed(0)
+    layer = MemEffAttention(384, 6, qkv_bias=True).eval()
+    x = torch.randn(2, tokens, 384)
+
+    outputs = {}
+    for backend in ("math", "sdpa", "chunked", "auto"):
+        attention.set_attention_backend(backend, chunk_size=16)
+        with torch.no_grad():
+            outputs[backend] = layer(x)
+
+    for backend in ("sdpa", "chunked", "auto"):
+        torch.testing.assert_close(outputs[backend], outputs["math"], rtol=1e-5, atol=1e-5)
+
+
+def test_auto_chunks_only_without_a_fused_kernel():
+    attention.set_attention_backend("auto", chunked_min_tokens=100)
+    assert attention.resolve_attention_backend(5000, "cpu") == "sdpa"
+    assert attention.resolve_attention_backend(5000, "mps") == "chunked"
+    assert attention.resolve_attention_backend(50, "mps") == "sdpa"
+    with pytest.raises(ValueError):
+        attention.set_attention_backend("flash")
@@ -0,0 +1,34 @@
+import pytest
+
+from class_selection import parse_class_names, select_classes
+
+NAMES = {0: "person", 2: "car", 51: "carrot", 56: "chair", 58: "potted plant"}
+
+
+def test_exact_names_not_substrings():
+    class_ids, unknown = parse_class_names("carrot", NAMES)
+    assert class_ids == [51]  # "car" must not match
+    assert unknown == []
+
+
+def test_llm_answer_formats():
+    assert parse_class_names('["person", "car"]', NAMES)[0] == [0, 2]
+    assert parse_class_names("['Person', 'Potted Plant']", NAMES)[0] == [0, 58]
+    assert parse_class_names("- chair\n- car.", NAMES)[0] == [2, 56]
+    assert parse_class_names('{"classes": ["chair"]}', NAMES)[0] == [56]
+
+
+def test_unknown_classes_are_reported():
+    class_ids, unknown = parse_class_names("person, dragon", NAMES)
+    assert class_ids == [0]
+    assert unknown == ["dragon"]
+
+    with pytest.raises(ValueError):
+        parse_class_names("dragon, unicorn", NAMES)
+
+
+def test_select_classes_falls_back_to_person_then_everything(capsys):
+    assert select_classes('["car", "boat"]', NAMES) == [2]
+    assert select_classes("nothing useful", NAMES) == [0]
+    assert select_classes("nothing useful", {0: "class0", 1: "class1"}) is None
+    assert "every class" in capsys.readouterr().out
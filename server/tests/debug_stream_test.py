@@ -0,0 +1,65 @@
+import asyncio
+import base64
+import contextlib
+import io
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from debug_stream import DebugStream
+from depth_map import DepthMap
+
+
+class FakeWebSocket:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    async def send_text(self, message):
+        if self.fail:
+            raise ConnectionError("closed")
+        self.sent.append(message)
+
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(base64.b64decode(data), np.uint8), cv2.IMREAD_COLOR)
+
+
+@pytest.mark.parametrize("as_depth_map", [False, True])
+def test_render_annotates_and_colorizes(as_depth_map):
+    stream = DebugStream(max_fps=2.0)
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    depth = np.tile(np.linspace(1.0, 5.0, 80, dtype=np.float32), (60, 1))
+    depth[:10, :10] = np.nan
+    depth_frame = DepthMap(depth, frame.shape[:2]) if as_depth_map else depth
+
+    message = json.loads(stream.render("session", frame, [[20, 20, 60, 80]], depth_frame))
+
+    assert message["type"] == "debug_frame" and message["session"] == "session"
+    assert decode(message["color"]).shape == (120, 160, 3)
+    assert frame.any()  # The box was drawn
+    # Network resolution for a DepthMap, the array as is otherwise
+    assert decode(message["depth"]).shape == (60, 80, 3)
+
+
+def test_publish_drops_failing_subscribers():
+    stream = DebugStream(max_fps=2.0)
+    assert not stream.should_render("session")  # Nobody watching
+
+    working, failing = FakeWebSocket(), FakeWebSocket(fail=True)
+    stream.subscribe(working)
+    stream.subscribe(failing)
+    assert stream.should_render("session")
+    assert not stream.should_render("session")  # Throttled
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(stream.publish("first"))
+    assert stream.subscribers == {working}
+    asyncio.run(stream.publish("second"))
+    assert working.sent == ["first", "second"]
+
+    stream.unsubscribe(working)
+    stream.forget("session")
+    assert not stream.should_render("session")
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import torch
+
+from depth_batching import DepthBatcher
+
+
+class FakeDepthModel:
+    def forward(self, x):
+        return x.mean(dim=1)
+
+
+def test_requests_are_batched_and_scattered_back():
+    batcher = DepthBatcher(FakeDepthModel(), max_batch=4, max_wait_ms=200)
+    images = [torch.full((1, 3, 28, 42), float(i)) for i in range(4)]
+    barrier = threading.Barrier(4)
+    results = [None] * 4
+
+    def client(i):
+        barrier.wait()
+        results[i] = batcher.submit(images[i]).result()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    for i, depth in enumerate(results):
+        assert depth.shape == (1, 28, 42)
+        assert torch.all(depth == i)
+    assert batcher.stats()["frames"] == 4
+    assert batcher.stats()["batches"] < 4
+
+
+def test_mixed_shapes_run_as_separate_groups():
+    batcher = DepthBatcher(FakeDepthModel(), max_batch=2, max_wait_ms=200)
+    small = batcher.submit(torch.zeros(1, 3, 14, 14))
+    large = batcher.submit(torch.ones(1, 3, 28, 14))
+    assert small.result().shape == (1, 14, 14)
+    assert large.result().shape == (1, 28, 14)
+    batcher.close()
+
+
+def test_lone_producer_does_not_wait_for_a_batch():
+    batcher = DepthBatcher(FakeDepthModel(), max_batch=2, max_wait_ms=2000)
+    start = time.perf_counter()
+    with batcher.producer() as slot:
+        batcher.submit(torch.zeros(1, 3, 14, 14), slot).result()
+    assert time.perf_counter() - start < 1.0
+    batcher.close()
+
+
+def test_frames_that_will_not_submit_release_their_slot():
+    batcher = DepthBatcher(FakeDepthModel(), max_batch=2, max_wait_ms=2000)
+    registered, submitted = threading.Event(), threading.Event()
+
+    def device_depth_frame():
+        with batcher.producer() as slot:
+            registered.set()
+            submitted.wait()
+            time.sleep(0.1)
+            # Took device depth, no request from this frame
+            slot.release()
+
+    start = time.perf_counter()
+    with batcher.producer() as slot:
+        other = threading.Thread(target=device_depth_frame)
+        other.start()
+        registered.wait()
+        future = batcher.submit(torch.zeros(1, 3, 14, 14), slot)
+        submitted.set()
+        future.result()
+    other.join()
+    assert time.perf_counter() - start < 1.0
+    batcher.close()
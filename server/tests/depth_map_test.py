@@ -0,0 +1,35 @@
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from depth_map import DepthMap
+from depth_statistics import box_depths, box_valid_fractions
+
+
+def make_depth_map():
+    # Upsampled about 2x, like a 518 px prediction for a 1080p frame
+    rows, columns = np.mgrid[0:259, 0:462]
+    values = (2.0 + columns / 100.0 + np.sin(rows / 20.0)).astype(np.float32)
+    return DepthMap(values, (540, 960))
+
+
+def test_full_is_the_upsampled_map_and_is_cached():
+    depth = make_depth_map()
+    expected = F.interpolate(torch.from_numpy(depth.values)[None, None], (540, 960), mode="bilinear", align_corners=True)[0, 0]
+
+    full = depth.full()
+    assert full.shape == (540, 960)
+    np.testing.assert_array_equal(full, expected.numpy())
+    assert depth.full() is full
+
+
+def test_box_depths_at_network_resolution_match_the_full_map():
+    depth = make_depth_map()
+    full = depth.full()
+    boxes = np.array([[0, 0, 960, 540], [100, 50, 300, 400], [700, 300, 760, 330], [500, 200, 503, 202], [10, 10, 10, 20]])
+
+    depths = box_depths(depth, boxes)
+    expected = [full[y1:y2, x1:x2].mean() for x1, y1, x2, y2 in boxes[:-1]]
+    np.testing.assert_allclose(depths[:-1], expected, rtol=0.01)
+    assert np.isnan(depths[-1])
+    np.testing.assert_array_equal(box_valid_fractions(depth, boxes), [1, 1, 1, 1, 0])
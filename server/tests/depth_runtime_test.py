@@ -0,0 +1,46 @@
+import numpy as np
+import torch
+
+from depth_runtime import CpuDepthConfig, CpuDepthModel, autotune_cpu_model, load_int8_model
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+
+
+def make_model():
+    torch.manual_seed(0)
+    return DepthAnythingV2(encoder='vits', features=64, out_channels=[48, 96, 192, 384], max_depth=20).eval()
+
+
+def test_channels_last_matches_plain_model():
+    model = make_model()
+    image = torch.randn(1, 3, 56, 84)
+    with torch.no_grad():
+        expected = model(image)
+        depth = CpuDepthModel(model, CpuDepthConfig(torch.get_num_threads(), channels_last=True))(image)
+    assert depth.dtype == torch.float32
+    assert torch.allclose(depth, expected, atol=1e-4)
+
+
+def test_autotune_picks_an_accepted_candidate():
+    model, candidates = autotune_cpu_model(make_model(), input_shape=(56, 84), repeats=1)
+
+    chosen = [candidate for candidate in candidates if candidate["chosen"]]
+    assert len(chosen) == 1 and chosen[0]["accepted"]
+    assert chosen[0]["latency_ms"] == min(c["latency_ms"] for c in candidates if c["accepted"])
+    assert model.infer_image(np.zeros((56, 84, 3), dtype=np.uint8), 56).shape == (56, 84)
+
+
+def test_int8_model_is_cached_and_reloaded(tmp_path):
+    checkpoint = tmp_path / "depth.pth"
+    cache = tmp_path / "depth.int8.pth"
+    torch.save(make_model().state_dict(), checkpoint)
+
+    quantized, from_cache = load_int8_model(make_model(), str(checkpoint), str(cache))
+    assert not from_cache and cache.exists()
+    assert not any(type(module) is torch.nn.Linear for module in quantized.pretrained.modules())
+
+    reloaded, from_cache = load_int8_model(make_model(), str(checkpoint), str(cache))
+    assert from_cache
+    image = torch.randn(1, 3, 56, 84)
+    with torch.no_grad():
+        assert torch.equal(quantized(image), reloaded(image))
+        assert torch.allclose(quantized(image), make_model()(image), rtol=0.05, atol=0.05)
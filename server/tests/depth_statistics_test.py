@@ -0,0 +1,70 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from depth_statistics import DepthStatistics, box_depths, box_index, box_valid_fractions
+from device_depth import valid_fraction
+
+
+def make_depth(holes=True):
+    rng = np.random.default_rng(0)
+    columns = np.linspace(1.0, 9.0, 320, dtype=np.float32)
+    depth = np.tile(columns, (240, 1)) + rng.normal(0, 0.1, (240, 320)).astype(np.float32)
+    if holes:
+        depth[20:80, 30:120] = np.nan
+    return depth
+
+
+BOXES = np.array([[0, 0, 320, 240], [25, 10, 140, 90], [32, 24, 120, 80], [200, 100, 260, 230], [50, 50, 50, 60], [300, 200, 400, 300]])
+
+
+@pytest.mark.parametrize("holes", [False, True])
+def test_means_and_valid_fractions_match_slices(holes):
+    depth = make_depth(holes)
+    stats = DepthStatistics(depth)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        expected = np.array([np.nanmean(depth[y1:y2, x1:x2]) for x1, y1, x2, y2 in BOXES])
+
+    np.testing.assert_allclose(stats.means(BOXES), expected, rtol=1e-5)
+    np.testing.assert_allclose(stats.valid_fractions(BOXES), [valid_fraction(depth, box) for box in BOXES])
+
+
+def test_histogram_medians_are_close():
+    depth = make_depth()
+    stats = DepthStatistics(depth, histogram_bins=64)
+    medians = stats.medians(BOXES)
+
+    assert np.isnan(medians[2]) and np.isnan(medians[4])  # Only holes (aligned to the cells), or empty
+    for box, median in zip(BOXES[[0, 1, 3, 5]], medians[[0, 1, 3, 5]]):
+        x1, y1, x2, y2 = box
+        # Within a bin width plus the depth change across a cell of box edge
+        assert abs(median - np.nanmedian(depth[y1:y2, x1:x2])) < 0.25
+
+    with pytest.raises(ValueError):
+        DepthStatistics(depth).medians(BOXES)
+
+
+@pytest.mark.parametrize("statistic", ["mean", "median"])
+def test_box_depths_agree_with_and_without_the_index(statistic):
+    depth = make_depth()
+    small = BOXES[1:]  # Too little area for the index
+    sliced = box_depths(depth, small, statistic)
+    indexed = box_depths(DepthStatistics(depth, histogram_bins=64), small, statistic)
+
+    np.testing.assert_array_equal(np.isnan(sliced), np.isnan(indexed))
+    tolerance = 1e-5 if statistic == "mean" else 0.25
+    np.testing.assert_allclose(sliced[~np.isnan(sliced)], indexed[~np.isnan(indexed)], rtol=tolerance, atol=0)
+    np.testing.assert_allclose(box_valid_fractions(depth, BOXES), box_valid_fractions(depth, np.tile(BOXES, (3, 1)))[:len(BOXES)])
+
+
+def test_box_index_is_shared_by_valid_fractions_and_depths():
+    depth = make_depth()
+    assert box_index(depth, BOXES[1:2]) is None  # Too little area
+
+    boxes = np.tile(BOXES[:1], (2, 1))
+    index = box_index(depth, boxes, "median")
+    assert index.histogram_bins
+    np.testing.assert_allclose(box_valid_fractions(index, boxes), box_valid_fractions(depth, boxes))
+    np.testing.assert_allclose(box_depths(index, boxes, "median"), box_depths(depth, boxes, "median"))
@@ -0,0 +1,41 @@
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from detections import Detections
+
+NAMES = {0: "person", 1: "bicycle", 56: "chair"}
+
+
+def make_results(rows):
+    orig_img = np.zeros((480, 640, 3), dtype=np.uint8)
+    boxes = torch.tensor(rows, dtype=torch.float32) if rows else torch.empty((0, 6))
+    return [Results(orig_img, path="test.jpg", names=NAMES, boxes=boxes)]
+
+
+def test_from_results_matches_to_json():
+    results = make_results([[10.7, 20.2, 110.9, 220.5, 0.9, 0.0], [5.0, 6.0, 50.0, 60.0, 0.4, 56.0]])
+    detections = Detections.from_results(results)
+
+    expected = [[int(v) for v in det["box"].values()] for det in results[0].summary()]
+    assert detections.xyxy.tolist() == expected
+    assert detections.class_ids.tolist() == [0, 56]
+    assert detections.track_ids.tolist() == [-1, -1]
+    assert np.allclose(detections.confidences, [0.9, 0.4])
+
+
+def test_track_ids_and_selection():
+    results = make_results([[0, 0, 10, 10, 7, 0.8, 0.0], [0, 0, 20, 20, 3, 0.7, 1.0], [0, 0, 30, 30, 9, 0.6, 56.0]])
+    detections = Detections.from_results(results)
+    assert detections.track_ids.tolist() == [7, 3, 9]
+
+    people_and_chairs = detections[detections.class_ids != 1]
+    assert len(people_and_chairs) == 2
+    assert people_and_chairs.track_ids.tolist() == [7, 9]
+
+
+def test_no_boxes():
+    detections = Detections.from_results(make_results([]))
+    assert len(detections) == 0
+    assert detections.xyxy.shape == (0, 4)
+    assert len(detections[detections.class_ids == 0]) == 0
@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+from ultralytics import YOLO
+
+pytest.importorskip("onnxruntime")
+
+from detector_engine import load_detector, weights_hash
+from session import ClientSession
+
+
+@pytest.fixture
+def weights(tmp_path):
+    # Untrained yolov8n, so nothing is downloaded
+    model = YOLO("yolov8n.yaml")
+    path = tmp_path / "detector.pt"
+    torch.save({"model": model.model, "train_args": {}}, path)
+    return str(path)
+
+
+def test_onnx_engine_is_exported_once_and_tracks(weights, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    model, engine = load_detector(weights, "onnx", 640, cache_dir, (384, 640))
+    assert engine == "onnx"
+    entries = os.listdir(cache_dir)
+    assert entries == [f"detector_{weights_hash(weights)}_384x640_onnx"]
+
+    mtime = os.path.getmtime(os.path.join(cache_dir, entries[0]))
+    model, engine = load_detector(weights, "onnx", 640, cache_dir, (384, 640))
+    assert os.path.getmtime(os.path.join(cache_dir, entries[0])) == mtime
+
+    results = ClientSession("test").track(model, np.zeros((384, 640, 3), dtype=np.uint8), [0])
+    assert results[0].orig_shape == (384, 640)
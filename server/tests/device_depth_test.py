@@ -0,0 +1,39 @@
+import cv2
+import numpy as np
+
+from device_depth import DepthPairing, decode_device_depth, valid_fraction
+from protocol import FrameMessage
+
+
+def make_depth_frame(frame_id, depth_mm=None):
+    image_bytes = b""
+    if depth_mm is not None:
+        ok, png = cv2.imencode(".png", depth_mm)
+        image_bytes = png.tobytes()
+    return FrameMessage("depth", frame_id, None, None, None, None, False, image_bytes)
+
+
+def test_pairing_by_frame_id():
+    pairing = DepthPairing(max_pending=2)
+    assert not pairing.add(make_depth_frame(None))
+    for frame_id in (1, 2, 3):
+        pairing.add(make_depth_frame(frame_id))
+
+    assert pairing.take(1) is None  # evicted by the bound
+    assert pairing.take(3).frame_id == 3
+    assert not pairing.add(make_depth_frame(2))  # older than the last color frame
+    assert pairing.stats()["paired"] == 1
+    assert pairing.stats()["rejected"] == 2
+
+
+def test_decode_device_depth_to_meters_at_frame_resolution():
+    depth_mm = np.full((4, 6), 1500, dtype=np.uint16)
+    depth_mm[:, :3] = 0
+
+    depth = decode_device_depth(make_depth_frame(1, depth_mm), (8, 12))
+
+    assert depth.shape == (8, 12)
+    assert np.isnan(depth[:, :6]).all()
+    np.testing.assert_allclose(depth[:, 6:], 1.5)
+    assert valid_fraction(depth) == 0.5
+    assert valid_fraction(depth, [6, 0, 12, 8]) == 1.0
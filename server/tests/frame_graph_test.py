@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from frame_graph import FrameGraph
+
+
+def make_graph():
+    return (
+        FrameGraph()
+        .stage("a", lambda: 2)
+        .stage("b", lambda: 3)
+        .stage("product", lambda a, b: a * b, deps=("a", "b"))
+    )
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_stages_join_on_dependencies(parallel):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results, timings = make_graph().run(executor if parallel else None)
+
+    assert results == {"a": 2, "b": 3, "product": 6}
+    assert set(timings) == {"a", "b", "product", "total"}
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError):
+        FrameGraph().stage("product", lambda a: a, deps=("missing",))
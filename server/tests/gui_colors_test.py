@@ -0,0 +1,61 @@
+import contextlib
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+from image_processing import calculate_background_colors, calculate_panel_colors
+
+PANELS = [
+    [[0.3, 0.25], [0.7, 0.25], [0.7, 0.75], [0.3, 0.75]],
+    [[0.05, 0.6], [0.2, 0.6], [0.2, 0.9], [0.05, 0.9]],
+    [[0.8, 0.1], [0.95, 0.1], [0.95, 0.3], [0.8, 0.3]],
+]
+
+
+def make_frame():
+    # Smooth gradients with a little noise, like a camera frame
+    rows, columns = np.mgrid[0:540, 0:960]
+    frame = np.stack([columns * 255 / 960, rows * 255 / 540, 128 + 60 * np.sin(columns / 90)], axis=2)
+    frame += np.random.default_rng(0).normal(0, 8, frame.shape)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def full_resolution_color(frame, corners, flip_colors):
+    # The original computation, on the whole rotated frame and exterior region
+    image = cv2.flip(frame, -1)
+    height, width = image.shape[:2]
+    xs = [int(c[0] * width) for c in corners]
+    ys = [int(c[1] * height) for c in corners]
+    min_x, max_x, min_y, max_y = max(0, min(xs)), min(width, max(xs)), max(0, min(ys)), min(height, max(ys))
+    offset_x, offset_y = int(0.05 * width), int(0.05 * height)
+    exterior = image[max(0, min_y - offset_y):min(height, max_y + offset_y), max(0, min_x - offset_x):min(width, max_x + offset_x)]
+    L, a, b = cv2.mean(cv2.cvtColor(exterior, cv2.COLOR_BGR2LAB))[:3]
+    L_scaled = L * (100 / 255)
+    L_new = max(0, L_scaled - 27) if L_scaled > 50 else 0
+    if flip_colors:
+        a, b = 256 - a, 256 - b
+    bgr = cv2.cvtColor(np.uint8([[[L_new * (255 / 100), a, b]]]), cv2.COLOR_LAB2BGR)[0, 0]
+    return int(bgr[2]), int(bgr[1]), int(bgr[0]), image[min_y:max_y, min_x:max_x]
+
+
+@pytest.mark.parametrize("flip_colors", [False, True])
+def test_panel_colors_match_the_full_resolution_computation(flip_colors):
+    frame = make_frame()
+    colors = calculate_panel_colors(frame, PANELS, flip_colors)
+
+    assert len(colors) == len(PANELS)
+    for corners, (back_color, text_color) in zip(PANELS, colors):
+        *expected, _ = full_resolution_color(frame, corners, flip_colors)
+        assert text_color == (255, 255, 255)
+        assert np.abs(np.subtract(back_color, expected)).max() <= 3
+
+
+def test_background_colors_keep_their_contract():
+    frame = make_frame()
+    with contextlib.redirect_stdout(io.StringIO()):
+        back_color, text_color, interior_roi = calculate_background_colors(frame, PANELS[1], False)
+
+    assert (back_color, text_color) == calculate_panel_colors(frame, [PANELS[1]], False)[0]
+    np.testing.assert_array_equal(interior_roi, full_resolution_color(frame, PANELS[1], False)[3])
@@ -0,0 +1,69 @@
+import contextlib
+import io
+
+import numpy as np
+
+from image_processing import get_world_position_from_screen_space, locate_boxes, process_boxes, process_image
+
+
+def make_scene(count=40, seed=0):
+    rng = np.random.default_rng(seed)
+    depth = rng.uniform(0.5, 10.0, (540, 960)).astype(np.float32)
+    depth[:50, :50] = np.nan
+    inv_mat = rng.normal(size=(4, 4))
+    camera_pos = rng.normal(size=3)
+    xy = rng.integers(0, [900, 500], (count, 2))
+    boxes = np.concatenate([xy, xy + rng.integers(1, 60, (count, 2))], axis=1).astype(np.int32)
+    boxes[0] = (10, 10, 80, 80)  # Partly without measurements
+    return depth, boxes, inv_mat, camera_pos
+
+
+def test_locate_boxes_matches_per_point_unprojection_exactly():
+    depth, boxes, inv_mat, camera_pos = make_scene()
+    depths = np.random.default_rng(1).uniform(0.5, 10.0, len(boxes))
+    centers, widths, heights = locate_boxes(boxes, depths, inv_mat, camera_pos, 960, 540)
+
+    for (x1, y1, x2, y2), d, center, width, height in zip(boxes.tolist(), depths, centers, widths, heights):
+        expected = get_world_position_from_screen_space(960 - (x1 + x2) / 2.0, (y1 + y2) / 2.0, d, inv_mat, camera_pos, 960, 540)
+        p1 = get_world_position_from_screen_space(x1, y1, d, inv_mat, camera_pos, 960, 540)
+        p2 = get_world_position_from_screen_space(x2, y2, d, inv_mat, camera_pos, 960, 540)
+        assert np.array_equal(center, expected)
+        assert width == np.linalg.norm(p1[[0, 2]] - p2[[0, 2]])
+        assert height == abs(p1[1] - p2[1])
+
+
+def test_process_boxes_matches_process_image():
+    depth, boxes, inv_mat, camera_pos = make_scene()
+    frame = np.zeros((540, 960, 3), dtype=np.uint8)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = [process_image(frame, depth, box_values, inv_mat, camera_pos) for box_values in boxes.tolist()]
+        located = process_boxes(frame, depth, boxes, inv_mat, camera_pos)
+
+    assert len(located) == len(expected)
+    for obj_data, reference in zip(located, expected):
+        # Large boxes take their mean from a float64 summed-area table instead of a float32 nanmean
+        for key, value in reference.items():
+            np.testing.assert_allclose(obj_data[key], value, rtol=1e-5)
+
+
+def test_process_boxes_without_boxes():
+    frame = np.zeros((54, 96, 3), dtype=np.uint8)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert process_boxes(frame, np.ones((54, 96)), np.empty((0, 4), np.int32), np.eye(4), np.zeros(3)) == []
+
+
+def test_process_boxes_keeps_the_boxes_it_can_locate():
+    depth, boxes, inv_mat, camera_pos = make_scene(count=4)
+    frame = np.zeros((540, 960, 3), dtype=np.uint8)
+    boxes[1] = (5, 5, 40, 40)  # No depth measurement at all
+    boxes[2] = (300, 300, 300, 340)  # Empty
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        located = process_boxes(frame, depth, boxes, inv_mat, camera_pos)
+        expected = process_image(frame, depth, boxes[3].tolist(), inv_mat, camera_pos)
+
+    assert located[1] is None and located[2] is None
+    assert located[0] is not None
+    for key, value in expected.items():
+        np.testing.assert_allclose(located[3][key], value, rtol=1e-5)
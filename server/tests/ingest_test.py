@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+from ingest import FrameIngestQueue
+
+
+class Frame:
+    def __init__(self, frame_id, timestamp=None):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+
+
+def test_latest_frame_wins():
+    async def run():
+        queue = FrameIngestQueue(max_frames=1, max_age=10.0)
+        for frame_id in range(5):
+            queue.put(Frame(frame_id), received_at=time.time())
+        queue.close()
+        return [(await queue.get()), (await queue.get())], queue.stats()
+
+    (newest, end), stats = asyncio.run(run())
+    assert newest.frame_id == 4
+    assert end is None
+    assert stats["dropped_replaced"] == 4
+    assert stats["processed"] == 1
+
+
+def test_stale_frames_are_dropped_using_client_timestamps():
+    queue = FrameIngestQueue(max_frames=4, max_age=0.5)
+    # The client clock runs 100 s behind, the first frame sets the offset
+    assert queue.put(Frame(0, timestamp=0.0), received_at=100.0)
+    assert queue.put(Frame(1, timestamp=1.0), received_at=101.1)
+    assert not queue.put(Frame(2, timestamp=2.0), received_at=103.0)
+    assert queue.stats()["dropped_stale"] == 1
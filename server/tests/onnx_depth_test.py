@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("onnxruntime")
+
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+from onnx_depth import OnnxDepthModel, nearest_bucket, parse_buckets
+from preprocessing import FramePyramid
+
+BUCKETS = ((56, 98), (56, 56))
+
+
+def make_model():
+    torch.manual_seed(0)
+    return DepthAnythingV2(encoder='vits', features=64, out_channels=[48, 96, 192, 384], max_depth=20).eval()
+
+
+def test_nearest_bucket_by_aspect_ratio():
+    buckets = parse_buckets("518x924, 518x686,518x518,924x518")
+    assert nearest_bucket(518, 924, buckets) == (518, 924)
+    assert nearest_bucket(540, 960, buckets) == (518, 924)
+    assert nearest_bucket(518, 686, buckets) == (518, 686)
+    assert nearest_bucket(700, 400, buckets) == (924, 518)
+    with pytest.raises(ValueError):
+        parse_buckets("500x900")
+
+
+def test_parity_with_pytorch(tmp_path):
+    model = make_model()
+    onnx_model = OnnxDepthModel.load(make_model, str(tmp_path), BUCKETS)
+    assert len(list(tmp_path.glob("*.onnx"))) == len(BUCKETS)
+
+    # A batch on an exact bucket
+    image = torch.randn(2, 3, 56, 98)
+    with torch.no_grad():
+        expected = model(image)
+    np.testing.assert_allclose(onnx_model.forward(image).numpy(), expected.numpy(), rtol=1e-3, atol=1e-3)
+
+    # A frame end to end, routed to the 56x98 bucket
+    frame = np.random.default_rng(0).integers(0, 255, (54, 96, 3), dtype=np.uint8)
+    depth = onnx_model.infer_image(frame, 56)
+    assert depth.shape == (54, 96)
+    np.testing.assert_allclose(depth, model.infer_image(frame, 56), rtol=1e-2, atol=1e-2)
+
+    # The frame pyramid resizes straight to the bucket, which forward runs as is
+    pyramid = FramePyramid(frame, 56, depth_shape=onnx_model.input_shape)
+    image = pyramid.depth_tensor(torch.device('cpu'))
+    assert tuple(image.shape[-2:]) == (56, 98)
+    np.testing.assert_array_equal(image.numpy(), onnx_model.image2tensor(frame, 56)[0].numpy())
+
+    # Graphs are reused from the cache
+    assert OnnxDepthModel.load(lambda: pytest.fail("exported again"), str(tmp_path), BUCKETS).buckets == BUCKETS
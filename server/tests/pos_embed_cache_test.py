@@ -0,0 +1,46 @@
+import copy
+
+import torch
+
+from metric_depth.depth_anything_v2.dinov2 import DINOv2
+
+
+def tokens(encoder, height, width):
+    return torch.zeros(1, (height // 14) * (width // 14) + 1, encoder.embed_dim)
+
+
+def test_cached_embedding_matches_interpolation():
+    encoder = DINOv2('vits').eval()
+    x = tokens(encoder, 70, 98)
+    with torch.no_grad():
+        first = encoder.interpolate_pos_encoding(x, 70, 98)
+        second = encoder.interpolate_pos_encoding(x, 70, 98)
+        torch.testing.assert_close(second, encoder._interpolate_pos_encoding(x, 70, 98))
+
+    assert second is first
+    info = encoder.pos_embed_cache_info()
+    assert (info["hits"], info["misses"], info["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_cache_is_bounded_and_invalidated_by_new_weights():
+    encoder = DINOv2('vits').eval()
+    encoder.pos_embed_cache_size = 2
+    with torch.no_grad():
+        for height in (28, 42, 56):
+            encoder.interpolate_pos_encoding(tokens(encoder, height, 98), height, 98)
+        assert encoder.pos_embed_cache_info()["entries"] == [(42, 98), (56, 98)]
+
+        stale = encoder.interpolate_pos_encoding(tokens(encoder, 56, 98), 56, 98)
+        encoder.load_state_dict({**encoder.state_dict(), "pos_embed": torch.randn_like(encoder.pos_embed)})
+        fresh = encoder.interpolate_pos_encoding(tokens(encoder, 56, 98), 56, 98)
+
+    assert not torch.equal(stale, fresh)
+    assert encoder.pos_embed_cache_info()["invalidations"] == 1
+    copy.deepcopy(encoder)
+
+
+def test_training_bypasses_the_cache():
+    encoder = DINOv2('vits')
+    pos_embed = encoder.interpolate_pos_encoding(tokens(encoder, 70, 98), 70, 98)
+    assert pos_embed.requires_grad
+    assert encoder.pos_embed_cache_info()["misses"] == 0
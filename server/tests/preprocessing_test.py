@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+import pytest
+import torch
+from torchvision.transforms import Compose
+from ultralytics.data.augment import LetterBox
+
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+from metric_depth.depth_anything_v2.util.transform import NormalizeImage, PrepareForNet, Resize
+from preprocessing import FramePyramid
+
+
+@pytest.mark.parametrize("shape", [(540, 960), (480, 640), (333, 517)])
+def test_detector_input_matches_ultralytics_letterbox(shape):
+    image = np.random.default_rng(0).integers(0, 255, shape + (3,), dtype=np.uint8)
+    detector_image, letterbox = FramePyramid(image).detector_input()
+
+    expected = LetterBox(new_shape=(640, 640), auto=True, stride=32)(image=image)
+    np.testing.assert_array_equal(detector_image, expected)
+
+    # A box covering the resized frame maps back to the whole frame
+    top, left = letterbox.top, letterbox.left
+    resized_height, resized_width = letterbox.resized_size
+    box = letterbox.to_frame([[left, top, left + resized_width, top + resized_height]])
+    np.testing.assert_allclose(box, [[0, 0, shape[1], shape[0]]], atol=1e-3)
+
+
+def reference_image2tensor(raw_image, input_size=518):
+    # The original float64 Compose pipeline of DepthAnythingV2.image2tensor
+    transform = Compose([
+        Resize(
+            width=input_size,
+            height=input_size,
+            resize_target=False,
+            keep_aspect_ratio=True,
+            ensure_multiple_of=14,
+            resize_method='lower_bound',
+            image_interpolation_method=cv2.INTER_CUBIC,
+        ),
+        NormalizeImage(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        PrepareForNet(),
+    ])
+    image = cv2.cvtColor(raw_image, cv2.COLOR_BGR2RGB) / 255.0
+    return torch.from_numpy(transform({'image': image})['image']).unsqueeze(0).float()
+
+
+def test_depth_inputs_match_reference_pipeline():
+    rng = np.random.default_rng(0)
+    # Smooth content, the uint8 resize only differs from the float one by rounding
+    image = np.clip(rng.normal(128, 20, (54, 96, 3)), 0, 255).astype(np.uint8)
+    image = np.kron(image, np.ones((10, 10, 1), dtype=np.uint8))
+    expected = reference_image2tensor(image)
+
+    tensor, (h, w) = DepthAnythingV2.image2tensor(None, image)
+    assert (h, w) == image.shape[:2]
+    assert tensor.shape == expected.shape
+    assert tensor.dtype == torch.float32
+    assert torch.allclose(tensor.cpu(), expected, atol=0.1)
+    assert (tensor.cpu() - expected).abs().mean() < 0.01
+
+    pyramid = FramePyramid(image)
+    assert torch.allclose(pyramid.depth_tensor(tensor.device).cpu(), expected, atol=0.1)
+
+
+def test_input_tensor_is_reused_per_resolution():
+    image = np.zeros((540, 960, 3), dtype=np.uint8)
+    first, _ = DepthAnythingV2.image2tensor(None, image)
+    second, _ = DepthAnythingV2.image2tensor(None, image + 255)
+    assert first.data_ptr() == second.data_ptr()
+
+    other, _ = DepthAnythingV2.image2tensor(None, np.zeros((480, 640, 3), dtype=np.uint8))
+    assert other.data_ptr() != first.data_ptr()
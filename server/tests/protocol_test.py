@@ -0,0 +1,84 @@
+import base64
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+import protocol
+
+
+def make_jpeg():
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    image[:, :32] = (255, 0, 0)
+    ok, jpeg = cv2.imencode(".jpg", image)
+    return jpeg.tobytes()
+
+
+def test_binary_round_trip():
+    jpeg = make_jpeg()
+    inv_mat = np.arange(16, dtype=np.float32).reshape(4, 4)
+    corners = [[0.1, 0.2], [0.1, 0.8], [0.9, 0.8], [0.9, 0.2]]
+    data = protocol.encode_binary_message("depth", 42, 123.5, [1, 2, 3], inv_mat, corners, True, jpeg)
+
+    frame = protocol.parse_message({"bytes": data})
+
+    assert protocol.HEADER_SIZE == 128
+    assert frame.type == "depth"
+    assert frame.frame_id == 42
+    assert frame.timestamp == 123.5
+    assert frame.flip_colors
+    np.testing.assert_array_equal(frame.camera_position, [1, 2, 3])
+    np.testing.assert_array_equal(frame.inv_mat, inv_mat)
+    np.testing.assert_allclose(frame.ui_screen_corners, corners, rtol=1e-6)
+    assert bytes(frame.image_bytes) == jpeg
+
+
+def test_json_and_binary_decode_to_same_frame():
+    jpeg = make_jpeg()
+    inv_mat = np.eye(4, dtype=np.float32)
+    json_frame = protocol.parse_message({"text": json.dumps({
+        "type": "color",
+        "data": {"x": 0.0, "y": 1.0, "z": 0.0},
+        "invMat": {f"e{r}{c}": float(inv_mat[r, c]) for r in range(4) for c in range(4)},
+        "imageData": base64.b64encode(jpeg).decode("ascii"),
+        "UIScreenCorners": [{"x": 0.0, "y": 0.0, "z": 0.0}] * 4,
+        "flipColors": False,
+    })})
+    binary_frame = protocol.parse_message({"bytes": protocol.encode_binary_message(
+        "color", 0, 0.0, [0, 1, 0], inv_mat, [[0, 0]] * 4, False, jpeg)})
+
+    np.testing.assert_array_equal(json_frame.inv_mat, binary_frame.inv_mat)
+    np.testing.assert_array_equal(protocol.decode_image(json_frame), protocol.decode_image(binary_frame))
+
+
+def test_binary_rejects_bad_header():
+    with pytest.raises(protocol.ProtocolError):
+        protocol.parse_binary_message(b"XXXX" + bytes(protocol.HEADER_SIZE))
+
+
+def test_negotiate_protocol():
+    assert protocol.negotiate_protocol({"protocols": ["binary-v9", "binary-v1"]}) == protocol.PROTOCOL_BINARY
+    assert protocol.negotiate_protocol({}) == protocol.PROTOCOL_JSON
+
+
+def test_binary_frames_need_the_binary_protocol():
+    data = protocol.encode_binary_message("color", 1, 0.0, [0, 0, 0], np.eye(4), [[0, 0]] * 4, False, make_jpeg())
+    with pytest.raises(protocol.ProtocolError):
+        protocol.parse_message({"bytes": data}, protocol.PROTOCOL_JSON)
+    assert protocol.parse_message({"bytes": data}, protocol.PROTOCOL_BINARY).frame_id == 1
+
+    # JSON messages are accepted either way
+    hello = {"text": json.dumps({"type": "hello"})}
+    assert protocol.parse_message(hello, protocol.PROTOCOL_JSON) == {"type": "hello"}
+
+
+def test_reduced_decode_keeps_short_side_above_min_size():
+    ok, jpeg = cv2.imencode(".jpg", np.zeros((1080, 1920, 3), dtype=np.uint8))
+    frame = protocol.FrameMessage("color", 0, None, None, None, None, False, memoryview(jpeg.tobytes()))
+
+    assert protocol.jpeg_size(frame.payload()) == (1080, 1920)
+    assert protocol.decode_image(frame).shape == (1080, 1920, 3)
+    assert protocol.decode_image(frame, min_size=518).shape == (540, 960, 3)
+    assert protocol.decode_image(frame, min_size=200).shape == (270, 480, 3)
+    assert protocol.jpeg_size(b"\x89PNG\r\n\x1a\n") is None
@@ -0,0 +1,62 @@
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from session import ClientSession
+
+
+class StubDetector:
+    """
+    Stands in for the shared YOLO model, returning the given (x1, y1, x2, y2, conf, cls)
+    boxes for the next frame, so no weights are needed.
+    """
+
+    def __init__(self):
+        self.boxes = None
+
+    def predict(self, frame, classes=None, verbose=False):
+        return [Results(frame, path="", names={0: "person"}, boxes=torch.tensor(self.boxes, dtype=torch.float32))]
+
+
+def test_sessions_keep_their_own_tracks():
+    detector = StubDetector()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    first, second = ClientSession("first"), ClientSession("second")
+
+    # Interleaved frames: one person moving right in the first session, two moving down in the other
+    first_ids, second_ids = [], []
+    for step in range(4):
+        detector.boxes = [[100 + 5 * step, 100, 200 + 5 * step, 300, 0.9, 0]]
+        first_ids.append(first.track(detector, frame)[0].boxes.id.int().tolist())
+
+        detector.boxes = [
+            [300, 50 + 5 * step, 380, 200 + 5 * step, 0.9, 0],
+            [450, 60 + 5 * step, 530, 220 + 5 * step, 0.9, 0],
+        ]
+        second_ids.append(second.track(detector, frame)[0].boxes.id.int().tolist())
+
+    # Each session numbers its own tracks from 1 and keeps them across its frames,
+    # whatever the other session saw in between
+    assert first_ids == [[1]] * 4
+    assert second_ids == [[1, 2]] * 4
+    assert first.frame_count == second.frame_count == 4
+    assert first.stats()["frames"] == 4
+
+    # Another headset connecting and leaving leaves the numbering alone
+    ClientSession("third").close()
+    detector.boxes = [[120, 100, 220, 300, 0.9, 0]]
+    assert first.track(detector, frame)[0].boxes.id.int().tolist() == [1]
+    # and a new track continues the session's own numbering
+    detector.boxes = [[305, 70, 385, 220, 0.9, 0], [455, 80, 535, 240, 0.9, 0], [50, 300, 150, 450, 0.9, 0]]
+    second.track(detector, frame)
+    assert second.track(detector, frame)[0].boxes.id.int().tolist() == [1, 2, 3]
+
+
+def test_last_result_answers_a_frame_that_could_not_be_processed():
+    session = ClientSession("session")
+    assert session.stale_result() is None
+
+    session.last_result = {"type": "frame_data", "objects": None}
+    assert session.stale_result() == {"type": "frame_data", "objects": None, "stale": True}
+    assert session.last_result == {"type": "frame_data", "objects": None}
+    assert session.stats()["stale_results"] == 1
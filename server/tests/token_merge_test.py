@@ -0,0 +1,44 @@
+import pytest
+import torch
+
+from metric_depth.depth_anything_v2.dinov2_layers.token_merge import bipartite_soft_matching, merge_prefixed
+from metric_depth.depth_anything_v2.dpt import DepthAnythingV2
+
+
+def test_merge_and_unmerge_shapes_and_duplicates():
+    # Pairs of identical tokens: every source finds its twin, unmerge restores them exactly
+    torch.manual_seed(0)
+    tokens = torch.randn(2, 8, 16).repeat_interleave(2, dim=1)
+    merge, unmerge = bipartite_soft_matching(tokens, 8)
+
+    merged = merge(tokens)
+    assert merged.shape == (2, 8, 16)
+    torch.testing.assert_close(unmerge(merged), tokens)
+
+
+def test_prefix_tokens_are_never_merged():
+    torch.manual_seed(0)
+    x = torch.randn(1, 1 + 20, 8)
+    merge, unmerge = merge_prefixed(x, 0.5, num_prefix_tokens=1)
+    merged = merge(x)
+    assert merged.shape == (1, 1 + 10, 8)
+    torch.testing.assert_close(merged[:, 0], x[:, 0])
+    torch.testing.assert_close(unmerge(merged)[:, 0], x[:, 0])
+
+
+def test_depth_model_with_token_merging():
+    torch.manual_seed(0)
+    model = DepthAnythingV2(encoder='vits', features=64, out_channels=[48, 96, 192, 384]).eval()
+    image = torch.randn(1, 3, 70, 98)
+    with torch.no_grad():
+        reference = model(image)
+        model.pretrained.set_token_merging(0.3)
+        merged = model(image)
+        model.pretrained.set_token_merging(0.0)
+        unmerged = model(image)
+
+    assert merged.shape == reference.shape
+    assert not torch.equal(merged, reference)
+    torch.testing.assert_close(unmerged, reference)
+    with pytest.raises(ValueError):
+        model.pretrained.set_token_merging(0.8)